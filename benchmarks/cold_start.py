@@ -0,0 +1,91 @@
+"""
+Benchmark of the cold start of the Nimba SMS client.
+
+Every run is a fresh interpreter, as in a serverless function: it times
+the import of nimbasms, the construction of a Client and the first
+request against the local fake API. The interpreter start up is reported
+apart, it does not depend on the client.
+
+Usage
+-----
+    python -m benchmarks.cold_start [--runs 20]
+                                    [--transport requests --transport urllib3]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.fake_server import FakeNimbaProcess
+
+CHILD = '''
+import sys
+import time
+started = time.perf_counter()
+import nimbasms
+imported = time.perf_counter()
+http_client = None
+if sys.argv[2] == 'urllib3':
+    from nimbasms.transports import Urllib3HttpClient
+    http_client = Urllib3HttpClient()
+client = nimbasms.Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=sys.argv[1],
+                         http_client=http_client)
+built = time.perf_counter()
+response = client.accounts.get()
+done = time.perf_counter()
+assert response.ok, response
+print(imported - started, built - imported, done - built)
+'''
+
+
+def run_once(base_url, transport):
+    """
+    Time the phases of one cold start, in seconds.
+
+    :returns: Tuple (interpreter, import, client, first request)
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, base_url, transport],
+        check=True, capture_output=True, text=True, env=env).stdout
+    elapsed = time.perf_counter() - started
+    imported, built, first = (float(value) for value in output.split())
+    return elapsed - imported - built - first, imported, built, first
+
+
+def bench_cold_start(base_url, runs, transport):
+    """
+    Print the median of every phase over runs fresh interpreters.
+    """
+    samples = [run_once(base_url, transport) for _ in range(runs)]
+    medians = [statistics.median(phase) * 1000 for phase in zip(*samples)]
+    interpreter, imported, built, first = medians
+    print(f'{transport:<10}{interpreter:>12.1f}{imported:>10.1f}{built:>10.1f}'
+          f'{first:>10.1f}{imported + built + first:>10.1f}')
+
+
+def main():
+    """
+    Run the cold start benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--transport', action='append',
+                        choices=('requests', 'urllib3'))
+    args = parser.parse_args()
+
+    with FakeNimbaProcess() as fake:
+        print(f'Fake API {fake.base_url}, median of {args.runs} runs, in ms')
+        print(f'{"transport":<10}{"interpreter":>12}{"import":>10}{"client":>10}'
+              f'{"request":>10}{"total":>10}')
+        for transport in args.transport or ('requests', 'urllib3'):
+            bench_cold_start(fake.base_url, args.runs, transport)
+
+
+if __name__ == '__main__':
+    main()
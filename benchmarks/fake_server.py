@@ -0,0 +1,218 @@
+"""
+Local stand-in of the Nimba SMS API for the benchmarks.
+
+The server answers the /v1/accounts, /v1/messages, /v1/contacts,
+/v1/groups and /v1/sendernames endpoints with generated payloads, with a
+configurable latency and a rate of injected 503 errors. It listens on
+127.0.0.1 only, no network is needed.
+
+Usage
+-----
+    python -m benchmarks.fake_server [port]
+"""
+
+import json
+import multiprocessing
+import random
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def make_item(resource, index):
+    """
+    Generated item of a list endpoint.
+    """
+    if resource == 'messages':
+        return {
+            'messageid': f'{index:024x}',
+            'sender_name': 'Nimba',
+            'message': f'Hello from Nimba, message number {index}',
+            'contact': f'2246{index % 100000000:08d}',
+            'numbers': 1,
+            'status': ('pending', 'sent', 'received', 'failure')[index % 4],
+            'sent_at': f'2026-01-{index % 28 + 1:02d}T10:00:00Z',
+        }
+    if resource == 'contacts':
+        return {
+            'contact_id': index,
+            'numero': f'2246{index % 100000000:08d}',
+            'name': f'Contact {index}',
+            'groups': ['API'],
+            'added_at': '2026-01-01T10:00:00Z',
+        }
+    if resource == 'groups':
+        return {'groupe_id': index, 'name': f'Group {index}',
+                'total_contact': index, 'added_at': '2026-01-01T10:00:00Z'}
+    return {'name': f'Sender{index}', 'status': 'accepted',
+            'added_at': '2026-01-01T10:00:00Z'}
+
+
+class FakeNimbaHandler(BaseHTTPRequestHandler):
+    """
+    Request handler of the fake API.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _reply(self, status, payload, extra_headers=()):
+        body = json.dumps(payload).encode('utf-8')
+        head = [f'HTTP/1.1 {status} {self.responses[status][0]}',
+                'Content-Type: application/json',
+                f'Content-Length: {len(body)}']
+        head.extend(f'{key}: {value}' for key, value in extra_headers)
+        self.wfile.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin1') + body)
+
+    def _delay_or_fail(self):
+        server = self.server
+        with server.lock:
+            server.requests[self.command, urlsplit(self.path).path] += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and server.random.random() < server.error_rate:
+            self._reply(503, {'detail': 'Service unavailable'},
+                        [('Retry-After', '0')])
+            return True
+        return False
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Answer the list, retrieve and account endpoints.
+        """
+        if self._delay_or_fail():
+            return
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        if parts == ['v1', 'accounts']:
+            self._reply(200, {'sid': 'ACCOUNT_SID', 'balance': 1000})
+            return
+        if len(parts) == 3 and parts[1] == 'messages':
+            try:
+                index = int(parts[2], 16)
+            except ValueError:
+                index = 0
+            self._reply(200, make_item('messages', index))
+            return
+        if len(parts) != 2 or parts[1] not in self.server.counts:
+            self._reply(404, {'detail': 'Not found'})
+            return
+
+        resource = parts[1]
+        query = parse_qs(url.query)
+        limit = int(query.get('limit', ['20'])[0])
+        offset = int(query.get('offset', ['0'])[0])
+        total = self.server.counts[resource]
+        base = f'http://{self.headers["Host"]}{url.path}'
+        end = min(offset + limit, total)
+        self._reply(200, {
+            'count': total,
+            'next': f'{base}?limit={limit}&offset={end}' if end < total else None,
+            'previous': (f'{base}?limit={limit}&offset={max(0, offset - limit)}'
+                         if offset else None),
+            'results': [make_item(resource, index)
+                        for index in range(offset, end)],
+        })
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Answer the message and contact creations.
+        """
+        length = int(self.headers.get('Content-Length', 0))
+        body = parse_qs(self.rfile.read(length).decode('utf-8'))
+        if self._delay_or_fail():
+            return
+        path = urlsplit(self.path).path.rstrip('/')
+        with self.server.lock:
+            self.server.created += 1
+            index = self.server.created
+        if path == '/v1/messages':
+            self._reply(201, {'messageid': f'{index:024x}',
+                              'url': f'/v1/messages/{index:024x}',
+                              'numbers': len(body.get('to', []))})
+        elif path == '/v1/contacts':
+            self._reply(201, {'contact_id': index,
+                              'numero': body.get('numero', [''])[0]})
+        else:
+            self._reply(404, {'detail': 'Not found'})
+
+
+class FakeNimbaServer(ThreadingHTTPServer):
+    """
+    Threaded fake of the Nimba SMS API.
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0, counts=None,
+                 seed=0):
+        """
+        :param int port: Port to listen on, 0 for any free port
+        :param float latency: Seconds waited before answering
+        :param float error_rate: Fraction of requests answered with 503
+        :param dict counts: Number of items by list resource
+        :param int seed: Seed of the error injection
+        """
+        super().__init__(('127.0.0.1', port), FakeNimbaHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.counts = {'messages': 5000, 'contacts': 5000, 'groups': 50,
+                       'sendernames': 5}
+        self.counts.update(counts or {})
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.created = 0
+        self.requests = Counter()
+
+    @property
+    def base_url(self):
+        """
+        Root url of the fake API
+        """
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+def _serve(ready, options):
+    server = FakeNimbaServer(**options)
+    ready.put(server.base_url)
+    server.serve_forever()
+
+
+class FakeNimbaProcess:
+    """
+    Run the fake API in a child process, so that the server does not share
+    the GIL with the client being measured.
+    """
+    def __init__(self, **options):
+        """
+        :param options: Arguments of FakeNimbaServer
+        """
+        self.options = options
+        self.process = None
+        self.base_url = None
+
+    def __enter__(self):
+        ready = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=_serve, args=(ready, self.options), daemon=True)
+        self.process.start()
+        self.base_url = ready.get(timeout=10)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.join()
+
+
+if __name__ == '__main__':
+    fake = FakeNimbaServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8000)
+    print(f'Fake Nimba SMS API on {fake.base_url}')
+    fake.serve_forever()
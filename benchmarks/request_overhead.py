@@ -0,0 +1,134 @@
+"""
+Micro-benchmark of the per-request client overhead.
+
+The network is replaced by an adapter returning a canned response, so
+the timing only covers the work done by Client and NimbaHttpClient:
+headers, authentication, request preparation and environment settings.
+
+The legacy classes reproduce the request path of nimbasms 1.0.0 to show
+the overhead before and after the fast path.
+
+Usage
+-----
+    python -m benchmarks.request_overhead [iterations]
+"""
+
+import platform
+import sys
+import timeit
+
+from requests import Request, Session
+from requests.adapters import BaseAdapter
+from requests.models import Response as RequestsResponse
+
+from nimbasms import Client, Response, __version__
+from nimbasms.http import NimbaHttpClient
+
+BODY = b'{"messageid": "XXXXXXXXXXXX", "status": "pending"}'
+
+
+class CannedAdapter(BaseAdapter):
+    """
+    Transport adapter answering every request without network.
+    """
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        response = RequestsResponse()
+        response.status_code = 201
+        response.headers['Content-Type'] = 'application/json'
+        response._content = BODY  # pylint: disable=protected-access
+        response.encoding = 'utf-8'
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+class LegacyNimbaHttpClient(NimbaHttpClient):
+    """
+    Request path of nimbasms 1.0.0.
+    """
+    def request(self, method, url, params=None, data=None, headers=None,
+                auth=None, timeout=None):
+        kwargs = {
+            'method': method.upper(),
+            'url': url,
+            'params': params,
+            'data': data,
+            'headers': headers,
+            'auth': auth,
+            'hooks': self.request_hooks
+        }
+        self._log_request(kwargs)
+        session = self.session or Session()
+        prepped_request = session.prepare_request(Request(**kwargs))
+        settings = session.merge_environment_settings(prepped_request.url,
+                                self.proxy, None, None, None)
+        settings['timeout'] = timeout if timeout is not None else self.timeout
+        response = session.send(prepped_request, **settings)
+        self._log_response(response)
+        return Response(int(response.status_code),
+                        response.text, response.headers)
+
+
+class LegacyClient(Client):
+    """
+    Header and authentication handling of nimbasms 1.0.0.
+    """
+    def request(self, method, uri, params=None, data=None,  # pylint: disable=arguments-differ
+                auth=None, headers=None, timeout=None):
+        headers = headers or {}
+        headers['User-Agent'] = (
+            f'nimba-python/{__version__} ({platform.system()} '
+            f'{platform.machine()}) Python/{platform.python_version()}')
+        headers['X-Nimba-Client'] = 'utf-8'
+        if method == 'POST' and 'Content-Type' not in headers:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if 'Accept' not in headers:
+            headers['Accept'] = 'application/json'
+        return self.http_client.request(method, uri, params=params, data=data,
+                                        headers=headers, auth=auth or self.auth,
+                                        timeout=timeout)
+
+
+def build(client_class, http_client_class):
+    """
+    Build a client whose transport never touches the network.
+    """
+    client = client_class('ACCOUNT_SID', 'AUTH_TOKEN')
+    client.http_client = http_client_class()
+    client.http_client.session.mount('https://', CannedAdapter())
+    return client
+
+
+def measure(client, iterations):
+    """
+    Return the mean time in microseconds of the two hot endpoints.
+    """
+    create = timeit.timeit(
+        lambda: client.messages.create(['224XXXXXXXXX'], 'Nimba', 'Hi Nimba!'),
+        number=iterations)
+    retrieve = timeit.timeit(
+        lambda: client.messages.retrieve('XXXXXXXXXXXX'), number=iterations)
+    return create / iterations * 1e6, retrieve / iterations * 1e6
+
+
+def main(iterations=5000):
+    """
+    Print the per-request overhead before and after.
+    """
+    variants = [
+        ('legacy', build(LegacyClient, LegacyNimbaHttpClient)),
+        ('current', build(Client, NimbaHttpClient)),
+    ]
+    print(f'{"client":<10}{"POST /v1/messages":>22}{"GET /v1/messages/{id}":>26}')
+    for name, client in variants:
+        measure(client, iterations // 10)
+        create, retrieve = measure(client, iterations)
+        print(f'{name:<10}{create:>19.1f} us{retrieve:>23.1f} us')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,180 @@
+"""
+Benchmark suite of the Nimba SMS client against the local fake API.
+
+Measures sends per second, pagination throughput, per-request client
+overhead and memory of large pages, for several Client configurations.
+Nothing leaves the machine: the fake API runs in a child process on
+127.0.0.1.
+
+Usage
+-----
+    python -m benchmarks.suite [--latency 0.005] [--error-rate 0.0]
+                               [--sends 500] [--items 5000]
+                               [--transport requests --transport urllib3]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from nimbasms import Client, Response
+from nimbasms.http import NimbaHttpClient
+from nimbasms.records import Message
+from nimbasms.retry import Retry, RetryPolicy
+from nimbasms.transports import Http2Client, Urllib3HttpClient
+
+from benchmarks.fake_server import FakeNimbaProcess
+from benchmarks import request_overhead
+
+
+def make_transport(transport='requests', pooled=True, pool_maxsize=16):
+    """
+    HTTP client of a transport name: requests, urllib3 or http2.
+    """
+    if transport == 'urllib3':
+        return Urllib3HttpClient(pool_maxsize=pool_maxsize)
+    if transport == 'http2':
+        return Http2Client(max_connections=pool_maxsize)
+    return NimbaHttpClient(pool_connections=pooled, pool_maxsize=pool_maxsize)
+
+
+def make_client(base_url, pooled=True, retries=False, pool_maxsize=16,
+                transport='requests'):
+    """
+    Client on the fake API.
+
+    :param str base_url: Root url of the fake API
+    :param bool pooled: Reuse connections
+    :param bool retries: Retry failed requests
+    :param int pool_maxsize: Connections kept alive
+    :param str transport: requests, urllib3 or http2
+    """
+    retry = Retry(RetryPolicy(max_attempts=5, backoff_factor=0.001)) if retries else None
+    return Client('ACCOUNT_SID', 'AUTH_TOKEN', retry=retry, base_url=base_url,
+                  http_client=make_transport(transport, pooled, pool_maxsize))
+
+
+def report(name, count, elapsed, unit, failures=None):
+    """
+    Print one result line.
+    """
+    line = f'{name:<44}{count / elapsed:>12.1f} {unit}/s'
+    if failures is not None:
+        line += f'   failures: {failures}'
+    print(line)
+
+
+def bench_sends(base_url, sends, transports=('requests',)):
+    """
+    Sends per second, sequential and with the bulk thread pool.
+    """
+    print('\n== Sends ==')
+    for name, options in [('sequential, pooled', {}),
+                          ('sequential, unpooled', {'pooled': False}),
+                          ('sequential, pooled, retries', {'retries': True})] + [
+                              (f'sequential, {transport} transport',
+                               {'transport': transport})
+                              for transport in transports if transport != 'requests']:
+        client = make_client(base_url, **options)
+        failures = 0
+        started = time.perf_counter()
+        for index in range(sends):
+            try:
+                response = client.messages.create([f'2246{index:08d}'], 'Nimba', 'Hi')
+                failures += not response.ok
+            except Exception:  # pylint: disable=broad-except
+                failures += 1
+        report(name, sends, time.perf_counter() - started, 'sends', failures)
+
+    for transport in transports:
+        for retries in (False, True):
+            client = make_client(base_url, retries=retries, transport=transport)
+            recipients = (f'2246{index:08d}' for index in range(sends))
+            started = time.perf_counter()
+            failures = sum(
+                1 for result in client.messages.create_many(
+                    recipients, 'Nimba', 'Hi', chunk_size=1, max_workers=16)
+                if result.error or not result.response.ok)
+            report(f'create_many, 16 workers, {transport}'
+                   f'{", retries" if retries else ""}',
+                   sends, time.perf_counter() - started, 'sends', failures)
+
+
+def bench_pagination(base_url, items):
+    """
+    Items per second when exporting the messages.
+    """
+    print('\n== Pagination ==')
+    client = make_client(base_url, retries=True)
+    for name, options in [('iter_all, no prefetch', {'prefetch': False}),
+                          ('iter_all, prefetch', {}),
+                          ('iter_all, parallel=8', {'parallel': 8}),
+                          ('iter_all, parallel=8, typed', {'parallel': 8,
+                                                           'typed': True})]:
+        started = time.perf_counter()
+        count = sum(1 for _ in client.messages.iter_all(limit=100, **options))
+        report(name, count, time.perf_counter() - started, 'items')
+        if count != items:
+            print(f'  expected {items} items, got {count}')
+
+
+def bench_overhead(iterations=2000):
+    """
+    Client overhead per request, without network.
+    """
+    print('\n== Per-request overhead (canned transport) ==')
+    client = request_overhead.build(Client, NimbaHttpClient)
+    create, retrieve = request_overhead.measure(client, iterations)
+    print(f'{"POST /v1/messages":<44}{create:>12.1f} us')
+    print(f'{"GET /v1/messages/{id}":<44}{retrieve:>12.1f} us')
+
+
+def bench_memory(base_url):
+    """
+    Memory to decode a page of 1000 messages, at peak and retained by the
+    items once the page is released.
+    """
+    print('\n== Memory of a 1000 messages page ==')
+    client = make_client(base_url)
+    text = client.messages.list(limit=1000).text
+    for name, decode in [('dicts', lambda page: page.data['results']),
+                         ('typed records', lambda page: page.records(Message))]:
+        tracemalloc.start()
+        page = Response(200, text)
+        items = decode(page)
+        del page
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{name:<44}{peak / 1024:>12.1f} KiB peak, '
+              f'{retained / 1024:.1f} KiB retained ({len(items)} items)')
+
+
+def main():
+    """
+    Run the suite.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='seconds of latency of the fake API')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of requests answered with 503')
+    parser.add_argument('--sends', type=int, default=500)
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--transport', action='append',
+                        choices=('requests', 'urllib3', 'http2'),
+                        help='transports compared, requests and urllib3 by default')
+    args = parser.parse_args()
+
+    with FakeNimbaProcess(latency=args.latency, error_rate=args.error_rate,
+                          counts={'messages': args.items}) as fake:
+        print(f'Fake API {fake.base_url}, latency {args.latency * 1000:.1f} ms, '
+              f'error rate {args.error_rate:.1%}')
+        bench_sends(fake.base_url, args.sends,
+                    args.transport or ('requests', 'urllib3'))
+        bench_pagination(fake.base_url, args.items)
+        bench_memory(fake.base_url)
+    bench_overhead()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,23 +5,26 @@ This module contains Class Client manager services available in API : developers
 
 Dependencies
 -----------
-requests : A library for HTTP Request
+requests : A library for HTTP Request, imported on the first request
+orjson : Optional, a faster JSON decoder used when installed
 
 class
 ---------
 HTTPClient : Abstract class representing HTTP Client
 Response: Response representing data output.
 Client : Manager all services APIs.
+NimbaHttpClient : Default HTTP Client, from nimbasms.http on first access.
 """
 
+import importlib
 import logging
-import platform
-import json
+import sys
+import threading
+from base64 import b64encode
+from functools import lru_cache
 
-from urllib.parse import urlencode
-from requests import Request, Session, hooks
-from requests.adapters import HTTPAdapter
 from nimbasms.execptions import NimbaSMSException
+from nimbasms.rest import DEFAULT_BASE_URL
 
 from nimbasms.rest import Accounts
 from nimbasms.rest import Contacts
@@ -33,6 +36,32 @@ __version__ = '1.0.0'
 
 _logger = logging.getLogger('nimbasms')
 
+@lru_cache(maxsize=None)
+def _user_agent():
+    """
+    User-Agent of the client, computed once per process.
+    """
+    import platform  # pylint: disable=import-outside-toplevel
+    os_name = platform.system()
+    os_arch = platform.machine()
+    python_version = platform.python_version()
+    return (f'nimba-python/{__version__} ({os_name} {os_arch}) '
+            f'Python/{python_version}')
+
+
+@lru_cache(maxsize=None)
+def _json_loads():
+    """
+    Default JSON decoder, orjson when installed, imported on first use.
+    """
+    # pylint: disable=import-outside-toplevel
+    try:
+        from orjson import loads
+    except ImportError:
+        from json import loads
+    return loads
+
+
 class HttpClient:
     """
     An Abstract class representing an HTTP client.
@@ -44,17 +73,39 @@ class HttpClient:
         """
         raise NimbaSMSException('HttpClient is a an abstract class')
 
+    def stream(self, method, url, params=None, headers=None, auth=None,
+               timeout=None):
+        """
+        Make an HTTP request whose body is read while it is parsed.
+        """
+        raise NimbaSMSException(
+            f'{type(self).__name__} does not support streaming')
+
+
+_UNSET = object()
+
 
 class Response:
     """
     Representing data output API calls.
+
+    The body is decoded once, on the first access to data, with the
+    decoder class attribute. It defaults to orjson when installed and to
+    the json module otherwise, imported on the first decoding; assign any
+    callable taking the body text to Response.decoder to plug another
+    decoder. It is read from the class, so a plain function is not bound
+    as a method.
     """
+    decoder = None
+
     def __init__(self, status_code, text, headers=None):
         self.content = text
         self.headers = headers
         self.cached = False
         self.status_code = status_code
         self.ok = self.status_code < 400
+        self._data = _UNSET
+        self._records = None
 
     @property
     def text(self):
@@ -68,131 +119,82 @@ class Response:
         """
         Output data response APIs
         """
-        return json.loads(self.content)
-
-    def __repr__(self):
-        return f'HTTP {self.status_code} {self.content}'
-
-
-class NimbaHttpClient(HttpClient):
-    """
-    General purpose HTTP Client for interacting with Nimba SMS API
-    """
-    def __init__(self, pool_connections=True, request_hooks=None, timeout=None,
-                logger=_logger, proxy=None, max_retries=None):
-        """
-        Constructor for the NimbaHttpClient
-
-        :param bool pool_connections
-        :param request_hooks
-        :param int timeout: Timeout for the requests.
-                            Timeout should never be zero (0) or less.
-        :param logger
-        :param dict proxy: Http proxy for the request session
-        :param int max_retries: Maxium number of retries each request should
-                                attempt
-        """
-        self.session = Session() if pool_connections else None
-        if self.session and max_retries is not None:
-            self.session.mount('https://', HTTPAdapter(max_retries=max_retries))
-        self.last_request = None
-        self.last_response = None
-        self.logger = logger
-        self.request_hooks = request_hooks or hooks.default_hooks()
-
-        if timeout is not None and timeout <= 0:
-            raise ValueError(timeout)
-        self.timeout = timeout
-        self.proxy = proxy if proxy else {}
+        if self._data is _UNSET:
+            self._data = self._decode()
+        return self._data
 
-    def request(self, method, url, params=None, data=None, headers=None,
-                auth=None, timeout=None):
-        """
-        Make an HTTP Request with paramters provided.
-
-        :param str mtehod: The HTTP method to use
-        :param str url: The URL to request
-        :param dict params: Query parameters to append to the URL
-        :param dict data: Paramters to go in the body of the HTTP request
-        :param dict headers: HTTP Headers to send with the request
-        :param tuple auth: Basic Auth arguments
-        :param float timeout: Socket/Read timeout for the request
+    def _decode(self):
+        decoder = type(self).decoder or _json_loads()
+        return decoder(self.content)
 
-        :return: An http response
+    def records(self, record_class):
         """
-        if timeout is not None and timeout <= 0:
-            raise ValueError(timeout)
-        kwargs = {
-            'method': method.upper(),
-            'url': url,
-            'params': params,
-            'data': data,
-            'headers': headers,
-            'auth': auth,
-            'hooks': self.request_hooks
-        }
-        self._log_request(kwargs)
-
-        self.last_response = None
-        session = self.session or Session()
-        request = Request(**kwargs)
-        self.last_request = None
+        Output data as typed records, built on first call.
 
-        prepped_request = session.prepare_request(request)
-        settings = session.merge_environment_settings(prepped_request.url,
-                                self.proxy, None, None, None)
-        settings['timeout'] = timeout if timeout is not None else self.timeout
+        The results of a list page give a list of records, any other
+        response gives a single record. When data was not read before,
+        the decoded dicts are not kept once the records are built and a
+        later access to data decodes the body again.
 
-        response = session.send(prepped_request, **settings)
-
-        self._log_response(response)
-        self.last_response = Response(int(response.status_code),
-                                    response.text, response.headers)
-        return self.last_response
-
-    def _log_request(self, kwargs):
+        :param type record_class: Record class from nimbasms.records
         """
-        Logger request APIs
-        """
-        self.logger.info('-- BEGIN Nimba SMS API Request --')
-
-        if kwargs['params']:
-            self.logger.info(
-                f"{kwargs['method']} Request: {kwargs['url']}?{urlencode(kwargs['params'])}")
-            self.logger.info(f"Query Params: {kwargs['params']}")
-        else:
-            self.logger.info(f"{kwargs['method']} Request: {kwargs['url']}")
+        if self._records is None or self._records[0] is not record_class:
+            owned = self._data is _UNSET
+            data = self._decode() if owned else self._data
+            if isinstance(data, dict) and 'results' in data:
+                results = data['results']
+                if owned:
+                    # Nothing else refers to the dicts: each one is freed
+                    # as soon as its record replaces it.
+                    for index, item in enumerate(results):
+                        results[index] = record_class.from_dict(item)
+                    value = results
+                else:
+                    value = [record_class.from_dict(item) for item in results]
+            else:
+                value = record_class.from_dict(data)
+            self._records = (record_class, value)
+        return self._records[1]
 
-        if kwargs['headers']:
-            self.logger.info('Headers:')
-            for key, value in kwargs['headers'].items():
-                #Do not log authorization headers
-                if 'authorization' not in key.lower():
-                    self.logger.info(f'{key} : {value}')
-
-        self.logger.info('-- END Nimba SMS API Request --')
-
-    def _log_response(self, response):
-        self.logger.info(f'Response Status Code: {response.status_code}')
-        self.logger.info(f'Response Headers: {response.headers}')
+    def __repr__(self):
+        return f'HTTP {self.status_code} {self.content}'
 
 
-class Client:
+class Client:  # pylint: disable=too-many-instance-attributes
     """A client for accessing the Nimba SMS API."""
 
-    def __init__(self, account_sid=None, access_token=None):
+    def __init__(self, account_sid=None, access_token=None, retry=None,
+                 rate_limiter=None, cache=None, base_url=DEFAULT_BASE_URL,
+                 http_client=None):
         """
         Initializes the Nimba SMS Client
 
         :param str account_sid: Account SID
         :param str access_token: Token authenticate
+        :param Retry retry: Retry engine, requests are not retried by default
+        :param RateLimiter rate_limiter: Limiter applied before every attempt
+        :param ResponseCache cache: Cache of the GET responses
+        :param str base_url: Root url of the API, for tests and sandboxes
+        :param HttpClient http_client: Transport of the requests,
+                                       NimbaHttpClient by default
         """
         if not account_sid or not access_token:
             raise NimbaSMSException("Credentials are required"
                     " to create a NimbaClient")
         self.auth = (account_sid, access_token)
+        credentials = b64encode(f'{account_sid}:{access_token}'.encode('latin1'))
+        self._authorization = f"Basic {credentials.decode('ascii')}"
+        self._static_headers = {
+            'User-Agent': _user_agent(),
+            'X-Nimba-Client': 'utf-8',
+        }
 
-        self.http_client = NimbaHttpClient()
+        self.base_url = base_url.rstrip('/')
+        self._http_client = http_client
+        self._http_client_lock = threading.Lock()
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.cache = cache
 
         self._messages = None
         self._accounts = None
@@ -200,8 +202,25 @@ class Client:
         self._groups = None
         self._sendernames = None
 
+    @property
+    def http_client(self):
+        """
+        Transport of the requests, a NimbaHttpClient built on first use
+
+        :returns HttpClient
+        """
+        if self._http_client is None:
+            with self._http_client_lock:
+                if self._http_client is None:
+                    self._http_client = _load('NimbaHttpClient')()
+        return self._http_client
+
+    @http_client.setter
+    def http_client(self, value):
+        self._http_client = value
+
     def request(self, method, uri, params=None, data=None,
-                    auth=None, headers=None, timeout=None):
+                    auth=None, headers=None, timeout=None, stream=False):
         """
         Makes a request to the Nimba API using the configured http client
         Authentication information is automatically added if none is provided
@@ -213,35 +232,68 @@ class Client:
         :param dict[str, str] headers: HTTP Headers
         :param tuple(str, str) auth: Authentication
         :param int timeout: Timeout in seconds
+        :param bool stream: Read the body while it is parsed, the response
+                            of a success is then a StreamedResponse and is
+                            never cached
 
         :returns: Response from the Nimba API
         """
-        auth = auth or self.auth
-        headers = headers or {}
-
-        pkg_version = __version__
-        os_name = platform.system()
-        os_arch = platform.machine()
-        python_version = platform.python_version()
-        headers['User-Agent'] = (
-            f'nimba-python/{pkg_version} ({os_name} {os_arch}) Python/{python_version}')
-        headers['X-Nimba-Client'] = 'utf-8'
-
-        if method == 'POST' and 'Content-Type' not in headers:
-            headers['Content-Type'] = 'application/x-www-form-urlencoded'
-
-        if 'Accept' not in headers:
-            headers['Accept'] = 'application/json'
-
-        return self.http_client.request(
-            method,
-            uri,
-            params=params,
-            data=data,
-            headers=headers,
-            auth=auth,
-            timeout=timeout,
-        )
+        headers = self._prepare_headers(method, headers)
+        if auth is None and 'Authorization' not in headers:
+            headers['Authorization'] = self._authorization
+
+        def send(headers):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(method, uri)
+            if stream:
+                return self.http_client.stream(
+                    method, uri, params=params, headers=headers, auth=auth,
+                    timeout=timeout)
+            return self.http_client.request(
+                method,
+                uri,
+                params=params,
+                data=data,
+                headers=headers,
+                auth=auth,
+                timeout=timeout,
+            )
+
+        def dispatch(headers):
+            if self.retry is None:
+                return send(headers)
+            return self.retry.call(send, method, uri, headers,
+                                   on_retry=self._notify_retry)
+
+        if self.cache is not None and method.upper() == 'GET' and not stream:
+            return self.cache.call(dispatch, uri, params, headers, auth)
+        return dispatch(headers)
+
+    def _notify_retry(self, method, uri, attempt, delay):
+        """
+        Tell the instruments of the http client that a call is retried.
+        """
+        for instrument in getattr(self.http_client, 'instruments', ()):
+            instrument.on_retry(method, uri, attempt, delay)
+
+    def _prepare_headers(self, method, headers=None):
+        """
+        Add the default Nimba SMS headers to the provided headers.
+
+        :param str method: HTTP Method
+        :param dict[str, str] headers: HTTP Headers
+
+        :returns: Headers to send with the request
+        """
+        prepared = {'Accept': 'application/json'}
+        if headers:
+            prepared.update(headers)
+        prepared.update(self._static_headers)
+
+        if method == 'POST' and 'Content-Type' not in prepared:
+            prepared['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        return prepared
 
     @property
     def accounts(self):
@@ -297,3 +349,36 @@ class Client:
         if self._sendernames is None:
             self._sendernames = SenderNames(self)
         return self._sendernames
+
+
+_LAZY = {
+    'NimbaHTTPAdapter': 'nimbasms.http',
+    'NimbaHttpClient': 'nimbasms.http',
+    '_TrackingHTTPConnectionPool': 'nimbasms.transports',
+    '_TrackingHTTPSConnectionPool': 'nimbasms.transports',
+}
+
+
+def _load(name):
+    """
+    Import a lazy attribute of the package and keep it in the namespace.
+    """
+    value = getattr(importlib.import_module(_LAZY[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __getattr__(name):
+    """
+    Import the requests transport on first access, PEP 562.
+    """
+    if name not in _LAZY:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    return _load(name)
+
+
+if sys.version_info < (3, 7):
+    # Module __getattr__ is ignored before Python 3.7, the lazy attributes
+    # are then imported with the package.
+    for _name in _LAZY:
+        _load(_name)
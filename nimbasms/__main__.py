@@ -0,0 +1,9 @@
+"""
+Run the nimbasms command with python -m nimbasms.
+"""
+
+import sys
+
+from nimbasms.cli import main
+
+sys.exit(main())
@@ -0,0 +1,372 @@
+"""
+A Nimba SMS asyncio Client API.
+
+This module contains the asyncio counterpart of the Client manager services.
+
+Dependencies
+-----------
+aiohttp : An asyncio library for HTTP Request (pip install nimbasms[async])
+
+class
+---------
+AsyncHttpClient : Abstract class representing an asyncio HTTP Client
+AiohttpClient : Pooled non-blocking HTTP Client backed by aiohttp.
+AsyncClient : Manager all services APIs with awaitable calls.
+"""
+
+from nimbasms import Client, Response, _logger
+from nimbasms.execptions import NimbaSMSException
+
+from nimbasms.rest import DEFAULT_BASE_URL
+from nimbasms.rest import Accounts
+from nimbasms.rest import Contacts
+from nimbasms.rest import Groups
+from nimbasms.rest import Messages
+from nimbasms.rest import SenderNames
+
+
+class AsyncHttpClient:
+    """
+    An Abstract class representing an asyncio HTTP client.
+    """
+    async def request(self, method, url, params=None, data=None, headers=None,
+                auth=None, timeout=None):
+        """
+        Make an HTTP request.
+        """
+        raise NimbaSMSException('AsyncHttpClient is a an abstract class')
+
+    async def close(self):
+        """
+        Release the resources held by the HTTP client.
+        """
+
+
+class AiohttpClient(AsyncHttpClient):
+    """
+    Non-blocking HTTP Client for interacting with Nimba SMS API.
+
+    A single aiohttp session is shared by every request, so connections
+    are kept alive and reused by all the coroutines of the event loop.
+    """
+    def __init__(self, pool_maxsize=100, timeout=None, logger=_logger):
+        """
+        Constructor for the AiohttpClient
+
+        :param int pool_maxsize: Maximum number of simultaneous connections.
+                                 0 means no limit.
+        :param int timeout: Timeout for the requests.
+                            Timeout should never be zero (0) or less.
+        :param logger
+        """
+        if timeout is not None and timeout <= 0:
+            raise ValueError(timeout)
+        if pool_maxsize < 0:
+            raise ValueError(pool_maxsize)
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.logger = logger
+        self.session = None
+
+    def _get_session(self):
+        """
+        Create the aiohttp session on first use, inside the running loop.
+        """
+        if self.session is None or self.session.closed:
+            try:
+                import aiohttp  # pylint: disable=import-outside-toplevel
+            except ImportError as exc:
+                raise NimbaSMSException(
+                    'aiohttp is required to use AsyncClient, '
+                    'install it with: pip install nimbasms[async]') from exc
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_maxsize))
+        return self.session
+
+    async def request(self, method, url, params=None, data=None, headers=None,
+                auth=None, timeout=None):
+        """
+        Make an HTTP Request with paramters provided.
+
+        :param str method: The HTTP method to use
+        :param str url: The URL to request
+        :param dict params: Query parameters to append to the URL
+        :param dict data: Paramters to go in the body of the HTTP request
+        :param dict headers: HTTP Headers to send with the request
+        :param tuple auth: Basic Auth arguments
+        :param float timeout: Socket/Read timeout for the request
+
+        :return: An http response
+        """
+        import aiohttp  # pylint: disable=import-outside-toplevel
+
+        if timeout is not None and timeout <= 0:
+            raise ValueError(timeout)
+        timeout = timeout if timeout is not None else self.timeout
+        session = self._get_session()
+
+        self.logger.info('%s Request: %s', method.upper(), url)
+        async with session.request(
+            method.upper(),
+            url,
+            params=_encode_pairs(params),
+            data=_encode_pairs(data),
+            headers=headers,
+            auth=aiohttp.BasicAuth(*auth) if auth else None,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as response:
+            text = await response.text()
+        self.logger.info('Response Status Code: %s', response.status)
+        return Response(int(response.status), text, response.headers)
+
+    async def close(self):
+        """
+        Close the aiohttp session and its connection pool.
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+def _encode_pairs(values):
+    """
+    Flatten a dict into key/value pairs, repeating the key for list values
+    the same way requests form-encodes them.
+    """
+    if not values:
+        return None
+    pairs = []
+    for key, value in values.items():
+        if isinstance(value, (list, tuple)):
+            pairs.extend((key, str(item)) for item in value)
+        else:
+            pairs.append((key, str(value)))
+    return pairs
+
+
+def _sync_only(name):
+    """
+    Method of the blocking services which has no awaitable counterpart,
+    raising instead of returning coroutines which are never awaited.
+    """
+    def method(self, *args, **kwargs):  # pylint: disable=unused-argument
+        raise NimbaSMSException(
+            f'{type(self).__name__}.{name} is not supported by AsyncClient, '
+            'use Client instead')
+    method.__name__ = name
+    method.__doc__ = f'Not supported by AsyncClient, use Client.{name}.'
+    return method
+
+
+class _AsyncPagination:
+    """
+    Awaitable pagination for the list services.
+    """
+    iter_pages = _sync_only('iter_pages')
+    iter_all = _sync_only('iter_all')
+    stream_page = _sync_only('stream_page')
+
+    # pylint: disable=no-member,attribute-defined-outside-init
+    async def request_message(self, uri, params=None):
+        """
+        Make HTTP request with Client.
+        """
+        response = await self.client.request(
+            method='GET',
+            uri=uri,
+            params=params or {}
+        )
+        if response.ok:
+            self._next = response.data['next']
+            self._previous =  response.data['previous']
+            self._count = response.data['count']
+        return response
+
+    async def next(self):
+        """
+        Paginate next data
+        """
+        if self._next is None:
+            return None
+        return await self.request_message(self._next)
+
+    async def previous(self):
+        """
+        Paginate previous data
+        """
+        if self._previous is None:
+            return None
+        return await self.request_message(self._previous)
+
+
+class AsyncAccounts(Accounts):
+    """
+    Manage Account Service with awaitable calls.
+    """
+
+
+class AsyncGroups(_AsyncPagination, Groups):
+    """
+    Manage Group Service with awaitable calls.
+    """
+
+
+class AsyncSenderNames(_AsyncPagination, SenderNames):
+    """
+    Manage SenderName Service with awaitable calls.
+    """
+
+
+class AsyncContacts(_AsyncPagination, Contacts):
+    """
+    Manage Contact Service with awaitable calls.
+    """
+    import_stream = _sync_only('import_stream')
+
+
+class AsyncMessages(_AsyncPagination, Messages):
+    """
+    Manage Message Service with awaitable calls.
+    """
+    create_many = _sync_only('create_many')
+    create_campaign = _sync_only('create_campaign')
+
+
+class AsyncClient(Client):
+    """
+    An asyncio client for accessing the Nimba SMS API.
+
+    Every service method returns an awaitable, for instance
+    ``await client.messages.create(...)``.
+
+    The retry engine, the rate limiter and the response cache of Client
+    are blocking and are not supported.
+    """
+
+    def __init__(self, account_sid=None, access_token=None, http_client=None,
+                 base_url=DEFAULT_BASE_URL, retry=None, rate_limiter=None,
+                 cache=None):
+        """
+        Initializes the Nimba SMS asyncio Client
+
+        :param str account_sid: Account SID
+        :param str access_token: Token authenticate
+        :param AsyncHttpClient http_client: Transport, AiohttpClient by default
+        :param str base_url: Root url of the API, for tests and sandboxes
+        :param retry: Not supported, must be None
+        :param rate_limiter: Not supported, must be None
+        :param cache: Not supported, must be None
+        """
+        super().__init__(account_sid, access_token, retry=retry,
+                         rate_limiter=rate_limiter, cache=cache,
+                         base_url=base_url,
+                         http_client=http_client or AiohttpClient())
+        self._check_options()
+
+    def _check_options(self):
+        """
+        Reject the blocking options of Client, which would be ignored.
+        """
+        for name in ('retry', 'rate_limiter', 'cache'):
+            if getattr(self, name) is not None:
+                raise NimbaSMSException(f'AsyncClient does not support {name}')
+
+    async def request(self, method, uri, params=None, data=None,  # pylint: disable=invalid-overridden-method
+                    auth=None, headers=None, timeout=None, stream=False):
+        """
+        Makes a request to the Nimba API using the configured http client
+        Authentication information is automatically added if none is provided
+
+        :param str method: HTTP Method
+        :param str uri: Fully qualified url
+        :param dict[str, str] params: Query string parameters
+        :param dict[str, str] data: POST body data
+        :param dict[str, str] headers: HTTP Headers
+        :param tuple(str, str) auth: Authentication
+        :param int timeout: Timeout in seconds
+        :param bool stream: Not supported by the asyncio client
+
+        :returns: Response from the Nimba API
+        """
+        if stream:
+            raise NimbaSMSException('AsyncClient does not support streaming')
+        self._check_options()
+        headers = self._prepare_headers(method, headers)
+        if auth is None and 'Authorization' not in headers:
+            headers['Authorization'] = self._authorization
+        return await self.http_client.request(
+            method,
+            uri,
+            params=params,
+            data=data,
+            headers=headers,
+            auth=auth,
+            timeout=timeout,
+        )
+
+    async def close(self):
+        """
+        Close the underlying http client.
+        """
+        await self.http_client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def accounts(self):
+        """
+        Access the Accounts Nimba SMS
+
+        :returns AsyncAccounts
+        """
+        if self._accounts is None:
+            self._accounts = AsyncAccounts(self)
+        return self._accounts
+
+    @property
+    def messages(self):
+        """
+        Message Accounts
+
+        :returns AsyncMessages NimbaAPI
+        """
+        if self._messages is None:
+            self._messages = AsyncMessages(self)
+        return self._messages
+
+    @property
+    def contacts(self):
+        """
+        Contacts Contacts
+
+        :returns AsyncContacts NimbaAPI
+        """
+        if self._contacts is None:
+            self._contacts = AsyncContacts(self)
+        return self._contacts
+
+    @property
+    def groups(self):
+        """
+        Group Accounts.
+
+        :returns AsyncGroups NimbaAPI
+        """
+        if self._groups is None:
+            self._groups = AsyncGroups(self)
+        return self._groups
+
+    @property
+    def sendernames(self):
+        """
+        Sendername Accounts.
+
+        :returns AsyncSenderNames NimbaAPI
+        """
+        if self._sendernames is None:
+            self._sendernames = AsyncSenderNames(self)
+        return self._sendernames
@@ -0,0 +1,95 @@
+"""
+A Nimba SMS bulk helpers.
+
+This module contains the helpers used to send large volume of requests.
+
+Dependencies
+-----------
+concurrent.futures : Default library thread pool
+
+class
+---------
+BulkResult : Result of one chunk sent.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+
+
+BulkResult = namedtuple('BulkResult', ['index', 'to', 'response', 'error'])
+BulkResult.__doc__ = """
+Result of one chunk sent by a bulk operation.
+
+:param int index: Position of the chunk in the recipients stream
+:param list to: Recipients of the chunk
+:param Response response: API response, None when the request failed
+:param Exception error: Exception raised while sending the chunk
+"""
+
+
+def chunked(iterable, size):
+    """
+    Split an iterable in lists of at most size items, lazily.
+
+    :param iterable: Any iterable, it is consumed only once
+    :param int size: Maximum size of a chunk
+    """
+    if not size or size < 0:
+        raise ValueError('Chunk size must be positive Integer')
+    return _chunks(iter(iterable), size)
+
+
+def _chunks(iterator, size):
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def imap_bounded(func, iterable, max_workers=8, max_pending=None,
+                 executor=None):
+    """
+    Apply func to every item with a thread pool, yielding results as they
+    complete.
+
+    The iterable is consumed lazily: at most max_pending items are
+    submitted and not yet consumed at any time, so memory stays bounded
+    whatever the size of the iterable.
+
+    :param func: Callable applied to each item
+    :param iterable: Items to process
+    :param int max_workers: Number of threads
+    :param int max_pending: Maximum items in flight, 2 * max_workers by default
+    :param Executor executor: Executor to submit to instead of a new thread
+                              pool, such as a process pool; it is not shut
+                              down
+    """
+    if not max_workers or max_workers < 0:
+        raise ValueError('max_workers must be positive Integer')
+    if max_pending is not None and max_pending < 1:
+        raise ValueError('max_pending must be positive Integer')
+    return _imap(func, iterable, max_workers, max_pending or max_workers * 2,
+                 executor)
+
+
+def _imap(func, iterable, max_workers, max_pending, executor):
+    if executor is not None:
+        yield from _imap_submit(executor, func, iterable, max_pending)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        yield from _imap_submit(pool, func, iterable, max_pending)
+
+
+def _imap_submit(executor, func, iterable, max_pending):
+    pending = set()
+    for item in iterable:
+        pending.add(executor.submit(func, item))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
@@ -0,0 +1,151 @@
+"""
+A Nimba SMS response cache.
+
+This module contains the read cache applied by Client to idempotent GET
+requests, such as the account balance or the sender names.
+
+class
+---------
+ResponseCache : TTL and LRU cache with ETag revalidation.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+DEFAULT_TTLS = {
+    '/v1/accounts': 30,
+    '/v1/sendernames': 300,
+    '/v1/groups': 300,
+}
+
+
+class ResponseCache:
+    """
+    Cache successful GET responses for a time to live per endpoint.
+
+    Only the endpoints listed in ttls are cached, a path also matches its
+    sub paths. The least recently used entry is evicted when maxsize is
+    reached. An expired entry with an ETag is revalidated with
+    If-None-Match, a 304 answer renews it without transferring the body.
+    Responses served from the cache have cached set to True.
+
+    Entries are keyed by the credentials of the request too, a cache
+    shared by the clients of several accounts never serves the response
+    of an account to another one.
+    """
+    def __init__(self, maxsize=256, ttls=None, clock=time.monotonic):
+        """
+        Initialize the cache
+
+        :param int maxsize: Maximum number of responses kept
+        :param dict ttls: Time to live in seconds by path
+        :param clock: Function returning the current time in seconds
+        """
+        if maxsize < 1:
+            raise ValueError('maxsize must be positive Integer')
+        self.maxsize = maxsize
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl_for(self, path):
+        """
+        Time to live of an endpoint, None when it is not cached.
+
+        :param str path: Path of the url
+        """
+        path = path.rstrip('/')
+        while path:
+            ttl = self.ttls.get(path)
+            if ttl is not None:
+                return ttl
+            path = path.rpartition('/')[0]
+        return None
+
+    def clear(self):
+        """
+        Drop every entry.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _hit(response):
+        """
+        Copy of a cached response flagged as cached.
+        """
+        hit = type(response)(response.status_code, response.content,
+                             response.headers)
+        hit.cached = True
+        return hit
+
+    def call(self, send, uri, params, headers, auth=None):
+        """
+        Serve a GET request from the cache or send it.
+
+        :param send: Callable sending the request with the headers given
+        :param str uri: Fully qualified url
+        :param dict params: Query string parameters
+        :param dict headers: HTTP Headers
+        :param tuple auth: Basic Auth arguments, when not in the headers
+
+        :returns: Response from the cache or from the Nimba API
+        """
+        ttl = self.ttl_for(urlsplit(uri).path)
+        if ttl is None:
+            return send(headers)
+
+        key = (uri, _frozen(params), _credentials(headers, auth))
+        entry = self._get(key)
+        now = self.clock()
+        if entry is not None:
+            expires, cached_response, etag = entry
+            if now < expires:
+                return self._hit(cached_response)
+            if etag:
+                headers['If-None-Match'] = etag
+
+        response = send(headers)
+        if response.status_code == 304 and entry is not None:
+            self._set(key, (self.clock() + ttl, entry[1], entry[2]))
+            return self._hit(entry[1])
+        if response.ok:
+            etag = response.headers.get('ETag') if response.headers else None
+            self._set(key, (self.clock() + ttl, response, etag))
+        return response
+
+
+def _frozen(params):
+    """
+    Hashable form of the query parameters, a list value giving a tuple.
+    """
+    return tuple(sorted(
+        (name, tuple(value) if isinstance(value, list) else value)
+        for name, value in (params or {}).items()))
+
+
+def _credentials(headers, auth):
+    """
+    Digest of the credentials of a request, the secret itself is not kept
+    in the keys of the cache.
+    """
+    value = headers.get('Authorization') or (repr(tuple(auth)) if auth else '')
+    return hashlib.sha256(value.encode('utf-8')).digest()
@@ -0,0 +1,259 @@
+"""
+A Nimba SMS personalized campaigns.
+
+This module contains the sending of a templated message to a stream of
+recipients: the recipients receiving the same text are merged in the
+to list of a single request.
+
+Dependencies
+-----------
+string : Default library format strings
+
+class
+---------
+Template : Compiled message template.
+CampaignResult : Result of one request of a campaign.
+Campaign : Sender of a templated message.
+"""
+
+from collections import namedtuple
+from operator import itemgetter
+from string import Formatter
+
+from nimbasms.bulk import imap_bounded
+from nimbasms.recipients import normalizer_for
+from nimbasms.results import compact_results
+
+CampaignResult = namedtuple('CampaignResult',
+                            ['index', 'to', 'message', 'response', 'error'])
+CampaignResult.__doc__ = """
+Result of one request of a campaign.
+
+:param int index: Position of the request in the campaign
+:param list to: Recipients of the request
+:param str message: Text sent
+:param Response response: API response, None when the request failed
+:param Exception error: Exception raised while sending the request
+"""
+
+
+class Template:
+    """
+    Message template in the str.format syntax, such as
+    'Hello {name}, your code is {code}'.
+
+    The template is parsed once. Two recipients with the same values of the
+    fields used get the same text, so the text is rendered once per
+    distinct values. When a field reads an attribute or an index, such as
+    {user[city]}, the values may not be hashable and the text itself is
+    the key.
+    """
+    def __init__(self, text):
+        """
+        Compile the template
+
+        :param str text: Template in the str.format syntax
+        """
+        self.text = text
+        names = []
+        nested = False
+        for _, name, _, _ in Formatter().parse(text):
+            if name is None:
+                continue
+            if not name or name.isdigit():
+                raise ValueError('Template fields must be named')
+            root = name.split('.', 1)[0].split('[', 1)[0]
+            nested = nested or root != name
+            if root not in names:
+                names.append(root)
+        self.fields = tuple(names)
+        self._render = text.format_map
+        if nested:
+            self._key = lambda variables: (self._render(variables),)
+        elif not names:
+            self._key = lambda variables: ()
+        elif len(names) == 1:
+            getter = itemgetter(names[0])
+            self._key = lambda variables: (getter(variables),)
+        else:
+            self._key = itemgetter(*names)
+
+    def __repr__(self):
+        return f'<Nimba.Template {self.text!r}>'
+
+    def key(self, variables):
+        """
+        Values of the fields used by the template.
+
+        :param dict variables: Variables of a recipient
+        """
+        return self._key(variables)
+
+    def missing(self, variables):
+        """
+        Fields used by the template which a recipient does not have.
+
+        :param dict variables: Variables of a recipient
+
+        :returns: Tuple of field names, empty when none is missing
+        """
+        return tuple(name for name in self.fields if name not in variables)
+
+    def render(self, variables):
+        """
+        Render the text of a recipient.
+
+        :param dict variables: Variables of a recipient
+        """
+        return self._render(variables)
+
+
+class Campaign:  # pylint: disable=too-many-instance-attributes
+    """
+    Send a templated message to a stream of recipients.
+
+    Recipients are grouped by the values of the template fields, the
+    recipients of a group getting the same text, and a request is sent as
+    soon as a group reaches chunk_size recipients. A recipient without the
+    phone number or a field of the template, or whose text cannot be
+    rendered, is given to on_invalid and the campaign goes on. At most max_pending recipients
+    wait in the groups: beyond, the oldest groups are sent with fewer
+    recipients until half of them are sent, so memory stays bounded
+    whatever the number of distinct texts. Requests are sent by a bounded
+    pool of threads.
+    """
+    def __init__(self, client, template, sender_name, chunk_size=100,
+                 max_workers=8, max_pending=100000, to_field='to',
+                 normalize=False, on_invalid=None, compact=False, sink=None):
+        """
+        Initialize the campaign
+
+        :param Client client: Nimba SMS Client
+        :param template: Template or text in the str.format syntax
+        :param str sender_name: Sender Name, is Sensitive Case
+        :param int chunk_size: Maximum recipients per request
+        :param int max_workers: Number of requests in flight
+        :param int max_pending: Maximum recipients waiting in the groups
+        :param str to_field: Variable holding the phone number
+        :param normalize: Normalize and deduplicate the recipients, True or
+                          a RecipientNormalizer
+        :param on_invalid: Callable(entry, reason) of the recipients dropped
+                           for a missing field or by the normalization
+        :param bool compact: Send yields SendResult records instead of
+                             CampaignResult, the responses are not kept
+        :param ResultSink sink: Sink receiving a SendResult per request
+                                while the campaign runs, implies compact
+        """
+        if not chunk_size or chunk_size < 0:
+            raise ValueError('Chunk size must be positive Integer')
+        if not isinstance(template, Template):
+            template = Template(template)
+        self.client = client
+        self.template = template
+        self.sender_name = sender_name
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.to_field = to_field
+        self.normalizer = normalizer_for(normalize)
+        self.on_invalid = on_invalid
+        self.compact = compact
+        self.sink = sink
+
+    def __repr__(self):
+        return f'<Nimba.Campaign {self.template.text!r}>'
+
+    def _reject(self, variables, reason):
+        if self.on_invalid is not None:
+            self.on_invalid(variables, reason)
+
+    def _numbers(self, recipients):
+        """
+        Pairs (number, variables) of the recipients having every field,
+        normalized and deduplicated if asked.
+        """
+        to_field = self.to_field
+        missing = self.template.missing
+        normalize = self.normalizer.normalize if self.normalizer else None
+        seen = set()
+        for variables in recipients:
+            absent = missing(variables)
+            if to_field not in variables:
+                absent = (to_field,) + absent
+            if absent:
+                self._reject(variables, f"missing field {', '.join(absent)}")
+                continue
+            if normalize is None:
+                yield variables[to_field], variables
+                continue
+            number, reason = normalize(variables[to_field])
+            if number is None:
+                self._reject(variables, reason)
+            elif number not in seen:
+                seen.add(number)
+                yield number, variables
+
+    def plan(self, recipients):
+        """
+        Group the recipients by the values of the template fields, without
+        sending.
+
+        :param iterable recipients: Dicts of variables with the phone number
+                                    in to_field, consumed lazily
+
+        :returns: Generator of tuples (text, list of numbers)
+        """
+        key = self.template.key
+        render = self.template.render
+        chunk_size = self.chunk_size
+        groups = {}
+        pending = 0
+        for number, variables in self._numbers(recipients):
+            try:
+                values = key(variables)
+                group = groups.get(values)
+                if group is None:
+                    group = groups[values] = (render(variables), [])
+            except (LookupError, AttributeError, TypeError, ValueError) as exc:
+                # Such as a missing index or attribute of a field, or an
+                # unhashable value.
+                self._reject(variables, f'invalid field: {exc}')
+                continue
+            group[1].append(number)
+            pending += 1
+            if len(group[1]) >= chunk_size:
+                del groups[values]
+                pending -= len(group[1])
+                yield group
+            elif pending > self.max_pending:
+                for oldest in list(groups):
+                    if pending <= self.max_pending // 2:
+                        break
+                    group = groups.pop(oldest)
+                    pending -= len(group[1])
+                    yield group
+        yield from groups.values()
+
+    def send(self, recipients):
+        """
+        Send the campaign.
+
+        :param iterable recipients: Dicts of variables with the phone number
+                                    in to_field, consumed lazily
+
+        :returns: Generator of CampaignResult, or of SendResult when
+                  compact, in completion order
+        """
+        def send(indexed_group):
+            index, (text, to) = indexed_group
+            try:
+                response = self.client.messages.create(to, self.sender_name, text)
+            except Exception as exc:  # pylint: disable=broad-except
+                return CampaignResult(index, to, text, None, exc)
+            return CampaignResult(index, to, text, response, None)
+
+        results = imap_bounded(send, enumerate(self.plan(recipients)),
+                               max_workers=self.max_workers)
+        if self.compact or self.sink is not None:
+            return compact_results(results, self.sink)
+        return results
@@ -0,0 +1,376 @@
+"""
+A Nimba SMS command line.
+
+This module contains the nimbasms command: send a message to a stream of
+recipients read from a file or stdin, and export the messages or the
+contacts of the account to NDJSON.
+
+Dependencies
+-----------
+argparse : Default library command line parser
+orjson : Optional, a faster JSON encoder used when installed
+
+Usage
+-----
+    nimbasms send --sender-name YYYY --message 'Hi Nimba!' recipients.csv
+    nimbasms send --sender-name YYYY --message 'Hi' -o results.ndjson --resume -
+    nimbasms export messages -o messages.ndjson
+
+The credentials are read from $NIMBA_ACCOUNT_SID and $NIMBA_AUTH_TOKEN,
+the token is prompted for when it is not set and stdin is a terminal.
+"""
+
+import argparse
+import csv
+import getpass
+import json
+import os
+import sys
+import time
+
+try:
+    from orjson import dumps as _orjson_dumps
+except ImportError:
+    _orjson_dumps = None
+
+from nimbasms import Client
+from nimbasms.http import NimbaHttpClient
+from nimbasms.ratelimit import RateLimiter, TokenBucket
+from nimbasms.recipients import RecipientNormalizer
+from nimbasms.retry import Retry, RetryPolicy
+from nimbasms.rest import DEFAULT_BASE_URL
+
+
+def dumps(item):
+    """
+    Encode an item as one NDJSON line.
+    """
+    if _orjson_dumps is not None:
+        return _orjson_dumps(item).decode('utf-8') + '\n'
+    return json.dumps(item, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def detect_format(path):
+    """
+    Input format from the file extension: csv, ndjson or lines.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    return 'lines'
+
+
+def read_recipients(source, input_format, column='to'):
+    """
+    Read the recipients of a file, lazily.
+
+    :param file source: Text file
+    :param str input_format: csv, ndjson or lines
+    :param str column: Column or field of the phone number, csv and ndjson
+    """
+    if input_format == 'csv':
+        for row in csv.DictReader(source):
+            if row.get(column):
+                yield row[column].strip()
+        return
+    for line in source:
+        line = line.strip()
+        if not line:
+            continue
+        if input_format == 'ndjson':
+            item = json.loads(line)
+            yield str(item[column] if isinstance(item, dict) else item)
+        else:
+            yield line
+
+
+def load_sent(path):
+    """
+    Recipients already sent according to a results file.
+    """
+    sent = set()
+    if not os.path.exists(path):
+        return sent
+    with open(path, encoding='utf-8') as results:
+        for line in results:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if result.get('status') == 'sent':
+                sent.add(result['to'])
+    return sent
+
+
+class Progress:  # pylint: disable=too-many-instance-attributes
+    """
+    Live counters of a send printed on stderr.
+    """
+    def __init__(self, stream=sys.stderr, interval=0.5, enabled=True):
+        self.stream = stream
+        self.interval = interval
+        self.enabled = enabled
+        self.tty = stream.isatty()
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.requests = 0
+        self.started = time.monotonic()
+        self._printed = self.started
+
+    def line(self):
+        """
+        Text of the counters.
+        """
+        elapsed = time.monotonic() - self.started
+        rate = self.sent / elapsed if elapsed > 0 else 0.0
+        return (f'sent {self.sent}  failed {self.failed}  invalid {self.invalid}  '
+                f'skipped {self.skipped}  requests {self.requests}  '
+                f'{rate:.0f} recipients/s')
+
+    def update(self, force=False):
+        """
+        Print the counters when the interval elapsed.
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        interval = self.interval if self.tty else self.interval * 20
+        if not force and now - self._printed < interval:
+            return
+        self._printed = now
+        if self.tty:
+            self.stream.write('\r' + self.line())
+        else:
+            self.stream.write(self.line() + '\n')
+        self.stream.flush()
+
+    def close(self):
+        """
+        Print the final counters.
+        """
+        self.update(force=True)
+        if self.enabled and self.tty:
+            self.stream.write('\n')
+
+
+def write_results(output, lines):
+    """
+    Write result lines and sync them to the disk.
+
+    A result is on the disk before the next one is sent, so --resume never
+    sends again a recipient whose result was lost in a crash.
+    """
+    output.writelines(lines)
+    output.flush()
+    os.fsync(output.fileno())
+
+
+def auth_token(args):
+    """
+    Token of the options or the environment, prompted for on a terminal.
+    """
+    if args.auth_token:
+        return args.auth_token
+    if sys.stdin.isatty():
+        return getpass.getpass('Nimba auth token: ')
+    return None
+
+
+def make_client(args):
+    """
+    Client of the command line options.
+    """
+    token = auth_token(args) if args.account_sid else None
+    if not args.account_sid or not token:
+        raise SystemExit('nimbasms: set NIMBA_ACCOUNT_SID and NIMBA_AUTH_TOKEN, '
+                         'or --account-sid and --auth-token')
+    retry = None
+    if args.retries:
+        retry = Retry(RetryPolicy(max_attempts=args.retries + 1))
+    rate_limiter = None
+    if getattr(args, 'rate', None):
+        rate_limiter = RateLimiter(TokenBucket(args.rate))
+    client = Client(args.account_sid, token, retry=retry,
+                    rate_limiter=rate_limiter, base_url=args.base_url)
+    client.http_client = NimbaHttpClient(pool_maxsize=max(10, args.workers))
+    return client
+
+
+def _result(to, result):
+    if result.error is not None:
+        return {'to': to, 'status': 'failed', 'error': repr(result.error)}
+    response = result.response
+    if not response.ok:
+        return {'to': to, 'status': 'failed',
+                'status_code': response.status_code, 'error': response.text}
+    data = response.data
+    return {'to': to, 'status': 'sent', 'status_code': response.status_code,
+            'messageid': data.get('messageid') if isinstance(data, dict) else None}
+
+
+def send(args):
+    """
+    Run the send command.
+    """
+    client = make_client(args)
+    if args.message_file:
+        with open(args.message_file, encoding='utf-8') as message_file:
+            message = message_file.read().strip()
+    else:
+        message = args.message
+
+    if args.input == '-':
+        source = sys.stdin
+        input_format = args.format or 'lines'
+    else:
+        source = open(args.input, newline='', encoding='utf-8')  # pylint: disable=consider-using-with
+        input_format = args.format or detect_format(args.input)
+
+    progress = Progress(enabled=not args.quiet)
+    sent = load_sent(args.output) if args.resume and args.output else set()
+    mode = 'a' if args.resume else 'w'
+    output = (open(args.output, mode, encoding='utf-8')  # pylint: disable=consider-using-with
+              if args.output else None)
+
+    def on_invalid(entry, reason):
+        progress.invalid += 1
+        if output is not None:
+            output.write(dumps({'to': entry, 'status': 'invalid', 'error': reason}))
+
+    def recipients():
+        numbers = read_recipients(source, input_format, args.column)
+        if args.normalize:
+            numbers = RecipientNormalizer().iter_valid(numbers, on_invalid)
+        for to in numbers:
+            if to in sent:
+                progress.skipped += 1
+                continue
+            yield to
+
+    try:
+        for result in client.messages.create_many(
+                recipients(), args.sender_name, message,
+                chunk_size=args.chunk_size, max_workers=args.workers):
+            progress.requests += 1
+            ok = result.error is None and result.response.ok
+            if ok:
+                progress.sent += len(result.to)
+            else:
+                progress.failed += len(result.to)
+            if output is not None:
+                write_results(output, [dumps(_result(to, result)) for to in result.to])
+            progress.update()
+    finally:
+        progress.close()
+        if output is not None:
+            output.close()
+        if source is not sys.stdin:
+            source.close()
+    return 1 if progress.failed else 0
+
+
+def export(args):
+    """
+    Run the export command.
+    """
+    client = make_client(args)
+    service = getattr(client, args.resource)
+    output = (open(args.output, 'w', encoding='utf-8')  # pylint: disable=consider-using-with
+              if args.output != '-' else sys.stdout)
+    total = 0
+    started = time.monotonic()
+    try:
+        for page in service.iter_pages(limit=args.limit, parallel=args.workers):
+            items = page.data['results']
+            output.writelines(dumps(item) for item in items)
+            total += len(items)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    if not args.quiet:
+        elapsed = time.monotonic() - started
+        sys.stderr.write(f'exported {total} {args.resource} in {elapsed:.1f}s\n')
+    return 0
+
+
+def build_parser():
+    """
+    Parser of the command line.
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--account-sid', default=os.environ.get('NIMBA_ACCOUNT_SID'),
+                        help='account SID, $NIMBA_ACCOUNT_SID by default')
+    common.add_argument('--auth-token', default=os.environ.get('NIMBA_AUTH_TOKEN'),
+                        help='account token, $NIMBA_AUTH_TOKEN by default; '
+                             'prefer the variable, options are visible in ps')
+    common.add_argument('--base-url', default=os.environ.get('NIMBA_BASE_URL',
+                                                             DEFAULT_BASE_URL))
+    common.add_argument('--retries', type=int, default=3,
+                        help='retries of a failed request, 0 to disable')
+    common.add_argument('-q', '--quiet', action='store_true',
+                        help='do not print progress on stderr')
+    parser = argparse.ArgumentParser(
+        prog='nimbasms', description='Nimba SMS command line')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    send_parser = commands.add_parser(
+        'send', parents=[common],
+        help='send a message to recipients read from a file or stdin')
+    send_parser.add_argument('input', nargs='?', default='-',
+                             help='CSV, NDJSON or one number per line, - for stdin')
+    send_parser.add_argument('--sender-name', required=True)
+    text = send_parser.add_mutually_exclusive_group(required=True)
+    text.add_argument('--message')
+    text.add_argument('--message-file')
+    send_parser.add_argument('--format', choices=('csv', 'ndjson', 'lines'),
+                             help='input format, from the extension by default')
+    send_parser.add_argument('--column', default='to',
+                             help='CSV column or NDJSON field of the number')
+    send_parser.add_argument('--chunk-size', type=int, default=100,
+                             help='recipients per request')
+    send_parser.add_argument('--workers', type=int, default=8,
+                             help='requests in flight')
+    send_parser.add_argument('--rate', type=float,
+                             help='maximum requests per second')
+    send_parser.add_argument('--normalize', action='store_true',
+                             help='normalize and deduplicate the numbers')
+    send_parser.add_argument('-o', '--output',
+                             help='NDJSON file of the result of every recipient')
+    send_parser.add_argument('--resume', action='store_true',
+                             help='skip the recipients sent according to --output')
+    send_parser.set_defaults(func=send)
+
+    export_parser = commands.add_parser(
+        'export', parents=[common],
+        help='export messages or contacts to NDJSON')
+    export_parser.add_argument('resource', choices=('messages', 'contacts'))
+    export_parser.add_argument('-o', '--output', default='-',
+                               help='NDJSON file, - for stdout')
+    export_parser.add_argument('--limit', type=int, default=100,
+                               help='items per page')
+    export_parser.add_argument('--workers', type=int, default=8,
+                               help='pages fetched concurrently')
+    export_parser.set_defaults(func=export)
+    return parser
+
+
+def main(argv=None):
+    """
+    Entry point of the nimbasms command.
+    """
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'resume', False) and not args.output:
+        raise SystemExit('nimbasms: --resume requires --output')
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,3 +6,15 @@ class NimbaSMSException(Exception):
     """
     Module exception for project
     """
+
+
+class NimbaSMSConnectionError(NimbaSMSException, ConnectionError):
+    """
+    The request could not be sent or its response could not be read
+    """
+
+
+class NimbaSMSTimeout(NimbaSMSException, TimeoutError):
+    """
+    The API did not answer within the timeout
+    """
@@ -0,0 +1,329 @@
+"""
+A Nimba SMS HTTP Client on requests.
+
+This module contains the default transport of Client. It is imported on
+the first request, so that importing nimbasms and building a Client does
+not load requests.
+
+Dependencies
+-----------
+requests : A library for HTTP Request
+
+class
+---------
+NimbaHTTPAdapter : HTTPAdapter with TCP keep-alive probes.
+NimbaHttpClient : General purpose HTTP Client on a requests Session.
+"""
+
+import socket
+import threading
+import time
+from itertools import count
+from urllib.parse import urlsplit
+
+from requests import PreparedRequest, Session, hooks
+from requests.adapters import HTTPAdapter
+from requests.sessions import merge_hooks, merge_setting
+from requests.structures import CaseInsensitiveDict
+from urllib3.connection import HTTPConnection
+
+from nimbasms import HttpClient, Response, _logger
+from nimbasms.instrumentation import RequestContext, RequestLogging
+from nimbasms.streaming import CHUNK_SIZE, StreamedResponse
+from nimbasms.transports import (_TrackingHTTPConnectionPool, _TrackingHTTPSConnectionPool,
+                                 _connections)
+
+
+class NimbaHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter with TCP keep-alive probes on the pooled connections.
+
+    Probes keep idle connections alive through NAT and load balancers, so
+    a pooled connection is not silently dropped between two campaigns.
+    """
+    def __init__(self, tcp_keepalive=None, **kwargs):
+        """
+        :param int tcp_keepalive: Idle seconds before sending keep-alive
+                                  probes, None to keep the system defaults
+        """
+        self.tcp_keepalive = tcp_keepalive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.tcp_keepalive is not None:
+            options = list(HTTPConnection.default_socket_options)
+            options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE,
+                                self.tcp_keepalive))
+            if hasattr(socket, 'TCP_KEEPINTVL'):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL,
+                                self.tcp_keepalive))
+            kwargs['socket_options'] = options
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TrackingHTTPConnectionPool,
+            'https': _TrackingHTTPSConnectionPool,
+        }
+
+
+class NimbaHttpClient(RequestLogging, HttpClient):  # pylint: disable=too-many-instance-attributes
+    """
+    General purpose HTTP Client for interacting with Nimba SMS API
+
+    With pool_connections, a single instance can be shared by many threads:
+    the connection pool is thread-safe and last_request / last_response
+    are tracked per thread. Set pool_maxsize to at least the number of
+    threads, for instance 64 for a 64-thread worker pool, so that every
+    thread reuses a kept-alive connection instead of opening a new one.
+    """
+    def __init__(self, pool_connections=True, request_hooks=None, timeout=None,
+                logger=_logger, proxy=None, max_retries=None, pool_maxsize=10,
+                pool_block=False, tcp_keepalive=None, log_sample_rate=None,
+                instruments=None):
+        """
+        Constructor for the NimbaHttpClient
+
+        :param bool pool_connections: Reuse connections with a shared session,
+                                      otherwise every request opens its own
+        :param request_hooks
+        :param int timeout: Timeout for the requests.
+                            Timeout should never be zero (0) or less.
+        :param logger
+        :param dict proxy: Http proxy for the request session
+        :param int max_retries: Maxium number of retries each request should
+                                attempt
+        :param int pool_maxsize: Maximum number of connections kept alive
+        :param bool pool_block: Wait for a free connection when the pool is
+                                exhausted instead of opening an extra one
+        :param int tcp_keepalive: Idle seconds before TCP keep-alive probes
+        :param int log_sample_rate: Log one structured line for 1 in N
+                                    requests, and for every error, instead
+                                    of the verbose request and response logs
+        :param list instruments: Instrument hooks called around every request
+        """
+        if pool_maxsize < 1:
+            raise ValueError(pool_maxsize)
+        if log_sample_rate is not None and log_sample_rate < 1:
+            raise ValueError(log_sample_rate)
+        self.pool_connections = pool_connections
+        self._adapter_options = {
+            'tcp_keepalive': tcp_keepalive,
+            'pool_maxsize': pool_maxsize,
+            'pool_block': pool_block,
+            'max_retries': max_retries if max_retries is not None else 0,
+        }
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._local = threading.local()
+        self.logger = logger
+        self.log_sample_rate = log_sample_rate
+        self._log_counter = count()
+        self.instruments = list(instruments or [])
+        self.request_hooks = request_hooks or hooks.default_hooks()
+
+        if timeout is not None and timeout <= 0:
+            raise ValueError(timeout)
+        self.timeout = timeout
+        self.proxy = proxy if proxy else {}
+        self._settings_cache = {}
+
+    @property
+    def session(self):
+        """
+        Pooled requests Session, built on first use, None without
+        pool_connections
+        """
+        if self._session is None and self.pool_connections:
+            with self._session_lock:
+                if self._session is None:
+                    session = Session()
+                    adapter = NimbaHTTPAdapter(**self._adapter_options)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    @session.setter
+    def session(self, value):
+        self._session = value
+
+    @property
+    def last_request(self):
+        """
+        Last request made by the current thread
+        """
+        return getattr(self._local, 'last_request', None)
+
+    @last_request.setter
+    def last_request(self, value):
+        self._local.last_request = value
+
+    @property
+    def last_response(self):
+        """
+        Last response received by the current thread
+        """
+        return getattr(self._local, 'last_response', None)
+
+    @last_response.setter
+    def last_response(self, value):
+        self._local.last_response = value
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                auth=None, timeout=None):
+        """
+        Make an HTTP Request with paramters provided.
+
+        :param str mtehod: The HTTP method to use
+        :param str url: The URL to request
+        :param dict params: Query parameters to append to the URL
+        :param dict data: Paramters to go in the body of the HTTP request
+        :param dict headers: HTTP Headers to send with the request
+        :param tuple auth: Basic Auth arguments
+        :param float timeout: Socket/Read timeout for the request
+
+        :return: An http response
+        """
+        return self._request(method, url, params, data, headers, auth,
+                             timeout, stream=False)
+
+    def stream(self, method, url, params=None, headers=None, auth=None,
+               timeout=None):
+        """
+        Make an HTTP Request whose body is read while it is parsed.
+
+        :param str method: The HTTP method to use
+        :param str url: The URL to request
+        :param dict params: Query parameters to append to the URL
+        :param dict headers: HTTP Headers to send with the request
+        :param tuple auth: Basic Auth arguments
+        :param float timeout: Socket/Read timeout for the request
+
+        :return: A StreamedResponse, or a Response for an error status
+        """
+        return self._request(method, url, params, None, headers, auth,
+                             timeout, stream=True)
+
+    def _request(self, method, url, params, data, headers, auth, timeout,
+                 stream):
+        if timeout is not None and timeout <= 0:
+            raise ValueError(timeout)
+        kwargs = {
+            'method': method.upper(),
+            'url': url,
+            'params': params,
+            'data': data,
+            'headers': headers,
+            'auth': auth,
+            'hooks': self.request_hooks
+        }
+        if self.log_sample_rate is None:
+            self._log_request(kwargs)
+
+        self.last_response = None
+        session = self.session or Session()
+
+        prepped_request = self._prepare_request(session, kwargs)
+        self.last_request = prepped_request
+        settings = self._environment_settings(session, prepped_request.url)
+        settings['timeout'] = timeout if timeout is not None else self.timeout
+        settings['stream'] = stream
+
+        if self.instruments or self.log_sample_rate is not None:
+            response = self._send_measured(session, prepped_request, settings)
+        else:
+            response = session.send(prepped_request, **settings)
+            self._log_response(response)
+        if stream and response.status_code < 400:
+            self.last_response = StreamedResponse(
+                int(response.status_code), response.iter_content(CHUNK_SIZE),
+                response.headers, response.close)
+        else:
+            self.last_response = Response(int(response.status_code),
+                                        response.text, response.headers)
+        return self.last_response
+
+    @staticmethod
+    def _prepare_request(session, kwargs):
+        """
+        Prepare the request with the session settings.
+
+        Same as Session.prepare_request, without the netrc lookup on every
+        call: the Nimba SMS client always provides its authentication.
+        """
+        request = PreparedRequest()
+        request.prepare(
+            method=kwargs['method'],
+            url=kwargs['url'],
+            data=kwargs['data'],
+            headers=merge_setting(kwargs['headers'], session.headers,
+                                  dict_class=CaseInsensitiveDict),
+            params=merge_setting(kwargs['params'], session.params),
+            auth=merge_setting(kwargs['auth'], session.auth),
+            cookies=session.cookies,
+            hooks=merge_hooks(kwargs['hooks'], session.hooks),
+        )
+        return request
+
+    def _environment_settings(self, session, url):
+        """
+        Resolve the proxies and TLS settings from the environment.
+
+        The resolution reads environment variables and may read files, so
+        it is done once per origin for the pooled session.
+        """
+        if session is not self.session:
+            return session.merge_environment_settings(
+                url, self.proxy, None, None, None)
+        origin = urlsplit(url)[:2]
+        settings = self._settings_cache.get(origin)
+        if settings is None:
+            settings = session.merge_environment_settings(
+                url, self.proxy, None, None, None)
+            self._settings_cache[origin] = settings
+        return dict(settings)
+
+    def _send_measured(self, session, prepped_request, settings):
+        """
+        Send the request, measuring it for the instruments and the sampled log.
+        """
+        context = RequestContext(prepped_request.method, prepped_request.url,
+                                 time.perf_counter())
+        body = prepped_request.body
+        context.bytes_sent = len(body) if body else 0
+        for instrument in self.instruments:
+            instrument.on_request_start(context)
+
+        _connections.opened = False
+        response = None
+        try:
+            response = session.send(prepped_request, **settings)
+            context.status_code = response.status_code
+            if settings['stream'] and response.status_code < 400:
+                # The body is not read yet, only its announced length.
+                context.bytes_received = int(
+                    response.headers.get('Content-Length') or 0)
+            else:
+                context.bytes_received = len(response.content)
+            return response
+        except Exception as exc:
+            context.error = exc
+            raise
+        finally:
+            context.elapsed = time.perf_counter() - context.started
+            context.new_connection = (_connections.opened
+                                      or session is not self.session)
+            for instrument in self.instruments:
+                instrument.on_request_end(context)
+            if self.log_sample_rate is not None:
+                self._log_sample(context)
+            elif response is not None:
+                self._log_response(response)
+
+    def close(self):
+        """
+        Close the pooled connections, if any were opened.
+        """
+        if self._session is not None:
+            self._session.close()
@@ -0,0 +1,337 @@
+"""
+A Nimba SMS contact importer.
+
+This module contains the streaming import of large contact lists: rows
+are read lazily, numbers are normalized and deduplicated, the contacts
+already on the account are skipped and the others are created by a
+bounded pool of threads. A checkpoint file allows to resume an import.
+
+Dependencies
+-----------
+csv : Default library CSV reader
+
+class
+---------
+ImportReport : Counters of an import.
+ContactImporter : Streaming importer of contacts.
+"""
+
+import csv
+import json
+import os
+import time
+import uuid
+from itertools import islice
+
+from nimbasms.bulk import imap_bounded
+from nimbasms.recipients import RecipientNormalizer
+
+_IDEMPOTENCY_NAMESPACE = uuid.UUID('6f1c2a8e-4b0d-4e36-9a57-0c1e5f6b2d41')
+
+
+def read_csv(path, numero_field='numero', name_field='name',
+             groups_field='groups', delimiter=',', encoding='utf-8'):
+    """
+    Read contacts from a CSV file with a header row, lazily.
+
+    :param str path: Path of the CSV file
+    :param str numero_field: Column of the phone number
+    :param str name_field: Column of the name
+    :param str groups_field: Column of the groups, separated by ;
+    :param str delimiter: Column delimiter
+    :param str encoding: Encoding of the file
+
+    :returns: Generator of dict with numero, name and groups
+    """
+    with open(path, newline='', encoding=encoding) as source:
+        for row in csv.DictReader(source, delimiter=delimiter):
+            groups = row.get(groups_field) or ''
+            yield {
+                'numero': row.get(numero_field),
+                'name': row.get(name_field) or None,
+                'groups': [group.strip() for group in groups.split(';')
+                           if group.strip()] or None,
+            }
+
+
+class ImportReport:
+    """
+    Counters of an import, given to the progress callback.
+    """
+    __slots__ = ('read', 'created', 'existing', 'duplicates', 'invalid',
+                 'failed', 'started')
+
+    def __init__(self):
+        self.read = 0
+        self.created = 0
+        self.existing = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    @property
+    def rate(self):
+        """
+        Rows processed per second
+        """
+        elapsed = time.monotonic() - self.started
+        done = self.read - self.pending
+        return done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def pending(self):
+        """
+        Rows read and not processed yet
+        """
+        return self.read - (self.created + self.existing + self.duplicates
+                            + self.invalid + self.failed)
+
+    def as_dict(self):
+        """
+        Convert the counters to a dict.
+        """
+        return {name: getattr(self, name) for name in self.__slots__
+                if name != 'started'}
+
+    def __repr__(self):
+        values = ', '.join(f'{name}={value}' for name, value in self.as_dict().items())
+        return f'<Nimba.ImportReport {values}>'
+
+
+class ContactImporter:  # pylint: disable=too-many-instance-attributes
+    """
+    Import a stream of contacts with a bounded pool of threads.
+
+    The numbers of the contacts on the account are loaded once in a set,
+    and cached in index_path when given: the file is updated with every
+    contact created, so later imports do not list the contacts again.
+
+    With checkpoint, the position of the rows processed is saved every
+    checkpoint_every rows, with the rows whose creation failed, and an
+    import with the same checkpoint resumes after it, trying the failed
+    rows again. Every creation has an idempotency key derived from the
+    import run and the number, so a row sent again after a crash is not
+    created twice, while a later import of the same number is a new
+    request. The run id is saved in the checkpoint, an import without
+    checkpoint gets a new one.
+    """
+    def __init__(self, client, max_workers=8, normalizer=None,
+                 index_path=None, checkpoint=None, checkpoint_every=1000,
+                 progress=None, progress_every=1000, on_failure=None):
+        """
+        Initialize the importer
+
+        :param Client client: Nimba SMS Client
+        :param int max_workers: Number of requests in flight
+        :param RecipientNormalizer normalizer: Normalizer of the numbers,
+                                              Guinea numbers by default
+        :param str index_path: File caching the numbers on the account
+        :param str checkpoint: File saving the position of the import
+        :param int checkpoint_every: Rows between two checkpoints
+        :param progress: Callable taking the ImportReport
+        :param int progress_every: Rows between two progress calls
+        :param on_failure: Callable(contact, response, error) of the failed
+                           creations
+        """
+        self.client = client
+        self.max_workers = max_workers
+        self.normalizer = normalizer or RecipientNormalizer()
+        self.index_path = index_path
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.progress = progress
+        self.progress_every = progress_every
+        self.on_failure = on_failure
+        self._existing = None
+
+    def existing(self, refresh=False):
+        """
+        Numbers of the contacts on the account.
+
+        :param bool refresh: List the contacts again instead of the cache
+        """
+        if self._existing is not None and not refresh:
+            return self._existing
+        if (not refresh and self.index_path is not None
+                and os.path.exists(self.index_path)):
+            with open(self.index_path, encoding='utf-8') as index:
+                self._existing = {line.strip() for line in index if line.strip()}
+            return self._existing
+        existing = set()
+        for contact in self.client.contacts.iter_all(limit=100, parallel=4):
+            numero, _ = self.normalizer.normalize(contact.get('numero') or '')
+            if numero is not None:
+                existing.add(numero)
+        if self.index_path is not None:
+            tmp = f'{self.index_path}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as index:
+                index.writelines(f'{numero}\n' for numero in existing)
+            os.replace(tmp, self.index_path)
+        self._existing = existing
+        return existing
+
+    def _load_checkpoint(self):
+        if self.checkpoint is None or not os.path.exists(self.checkpoint):
+            return _Checkpoint()
+        with open(self.checkpoint, encoding='utf-8') as state:
+            state = json.load(state)
+        return _Checkpoint(state['position'], state.get('failed', ()),
+                           state.get('run_id'))
+
+    def _save_checkpoint(self, checkpoint, report):
+        if self.checkpoint is None:
+            return
+        tmp = f'{self.checkpoint}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as state:
+            json.dump(dict(checkpoint.as_dict(), report=report.as_dict()), state)
+        os.replace(tmp, self.checkpoint)
+
+    def run(self, contacts):
+        """
+        Import the contacts.
+
+        :param iterable contacts: Dicts with numero, name and groups, or
+                                  phone numbers
+
+        :returns: ImportReport
+        """
+        report = ImportReport()
+        existing = self.existing()
+        seen = set()
+        checkpoint = self._load_checkpoint()
+        index = (open(self.index_path, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+                 if self.index_path is not None else None)
+
+        def complete(number, ok=True):
+            previous = checkpoint.position.value
+            checkpoint.complete(number, ok)
+            self._report(previous, checkpoint, report)
+
+        def rows():
+            start = checkpoint.position.value
+            for number, contact in enumerate(islice(contacts, start, None), start):
+                if checkpoint.done(number):
+                    complete(number)
+                    continue
+                if isinstance(contact, str):
+                    contact = {'numero': contact}
+                report.read += 1
+                numero, _ = self.normalizer.normalize(contact.get('numero') or '')
+                if numero is None:
+                    report.invalid += 1
+                elif numero in seen:
+                    report.duplicates += 1
+                elif numero in existing:
+                    report.existing += 1
+                else:
+                    seen.add(numero)
+                    yield number, numero, contact
+                    continue
+                complete(number)
+
+        def create(row):
+            number, numero, contact = row
+            try:
+                response = self.client.contacts.create(
+                    numero, contact.get('name'), contact.get('groups'),
+                    idempotency_key=checkpoint.idempotency_key(numero))
+            except Exception as exc:  # pylint: disable=broad-except
+                return number, numero, contact, None, exc
+            return number, numero, contact, response, None
+
+        try:
+            for number, numero, contact, response, error in imap_bounded(
+                    create, rows(), max_workers=self.max_workers):
+                if error is None and response.ok:
+                    report.created += 1
+                    existing.add(numero)
+                    if index is not None:
+                        index.write(f'{numero}\n')
+                    complete(number)
+                else:
+                    report.failed += 1
+                    if self.on_failure is not None:
+                        self.on_failure(contact, response, error)
+                    complete(number, ok=False)
+        finally:
+            if index is not None:
+                index.close()
+            self._save_checkpoint(checkpoint, report)
+        if self.progress is not None:
+            self.progress(report)
+        return report
+
+    def _report(self, previous, checkpoint, report):
+        """
+        Save the checkpoint and call progress when their period is crossed.
+        """
+        position = checkpoint.position.value
+        if previous // self.checkpoint_every != position // self.checkpoint_every:
+            self._save_checkpoint(checkpoint, report)
+        if (self.progress is not None
+                and previous // self.progress_every != position // self.progress_every):
+            self.progress(report)
+
+
+class _Position:
+    """
+    Position of the first row not processed yet, rows complete in any order.
+    """
+    def __init__(self, start):
+        self.value = start
+        self._done = set()
+
+    def complete(self, number):
+        """
+        Mark a row processed.
+        """
+        if number != self.value:
+            self._done.add(number)
+            return
+        self.value += 1
+        while self.value in self._done:
+            self._done.discard(self.value)
+            self.value += 1
+
+
+class _Checkpoint:
+    """
+    State of an import saved by the checkpoint: the position of the rows
+    processed, the rows whose creation failed and the id of the run.
+    """
+    def __init__(self, position=0, failed=(), run_id=None):
+        self.resume = position
+        self.failed = set(failed)
+        self.run_id = run_id or uuid.uuid4().hex
+        # The failed rows before the saved position are read again.
+        self.position = _Position(min(self.failed | {position}))
+
+    def done(self, number):
+        """
+        Whether a row was processed by the run resumed.
+        """
+        return number < self.resume and number not in self.failed
+
+    def complete(self, number, ok=True):
+        """
+        Mark a row processed, failed when not ok.
+        """
+        if ok:
+            self.failed.discard(number)
+        else:
+            self.failed.add(number)
+        self.position.complete(number)
+
+    def idempotency_key(self, numero):
+        """
+        Idempotency key of the creation of a number in this run.
+        """
+        return uuid.uuid5(_IDEMPOTENCY_NAMESPACE, f'{self.run_id}:{numero}').hex
+
+    def as_dict(self):
+        """
+        Convert the state to a dict.
+        """
+        return {'position': self.position.value, 'failed': sorted(self.failed),
+                'run_id': self.run_id}
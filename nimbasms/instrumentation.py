@@ -0,0 +1,302 @@
+"""
+A Nimba SMS instrumentation hooks.
+
+This module contains the hooks called by NimbaHttpClient around every API
+call, with a metrics registry rendering the Prometheus text format and
+span callbacks for tracing.
+
+class
+---------
+RequestContext : Measures of one API call.
+Instrument : Base class of the hooks.
+MetricsRegistry : In-memory metrics of the API calls.
+SpanHooks : Span start and end callbacks.
+RequestLogging : Verbose or sampled logs of the HTTP Clients.
+"""
+
+import logging
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def endpoint_of(url):
+    """
+    Endpoint template of an url, such as /v1/messages/{id}.
+
+    :param str url: Fully qualified url
+    """
+    parts = urlsplit(url).path.strip('/').split('/')
+    if len(parts) > 2:
+        parts = parts[:2] + ['{id}']
+    return '/' + '/'.join(parts)
+
+
+class RequestContext:  # pylint: disable=too-many-instance-attributes
+    """
+    Measures of one API call, given to the instruments.
+    """
+    __slots__ = ('method', 'url', 'endpoint', 'started', 'elapsed',
+                 'status_code', 'bytes_sent', 'bytes_received',
+                 'new_connection', 'error', 'span')
+
+    def __init__(self, method, url, started):
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint_of(url)
+        self.started = started
+        self.elapsed = None
+        self.status_code = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.new_connection = None
+        self.error = None
+        self.span = None
+
+    @property
+    def status_class(self):
+        """
+        Status class such as 2xx, or error when no response was received
+        """
+        if self.status_code is None:
+            return 'error'
+        return f'{self.status_code // 100}xx'
+
+
+class Instrument:
+    """
+    Hooks called around every API call, they do nothing by default.
+    """
+    def on_request_start(self, context):
+        """
+        Called before the request is sent.
+
+        :param RequestContext context: Measures of the call
+        """
+
+    def on_request_end(self, context):
+        """
+        Called after the response is received or the request failed.
+
+        :param RequestContext context: Measures of the call
+        """
+
+    def on_retry(self, method, url, attempt, delay):
+        """
+        Called before an attempt is retried by the Retry engine.
+
+        :param str method: HTTP Method
+        :param str url: Fully qualified url
+        :param int attempt: Number of the attempt which failed
+        :param float delay: Seconds waited before the next attempt
+        """
+
+
+class MetricsRegistry(Instrument):  # pylint: disable=too-many-instance-attributes
+    """
+    In-memory metrics by endpoint and status class.
+
+    Records request counts, a latency histogram, bytes sent and received,
+    new and reused connections and retries. render_prometheus() returns
+    the Prometheus text exposition format.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Initialize the registry
+
+        :param tuple buckets: Upper bounds of the latency histogram, seconds
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._histograms = {}
+        self._bytes_sent = defaultdict(int)
+        self._bytes_received = defaultdict(int)
+        self._connections = defaultdict(int)
+        self._retries = defaultdict(int)
+
+    def on_request_end(self, context):
+        key = (context.method, context.endpoint, context.status_class)
+        with self._lock:
+            self._requests[key] += 1
+            self._bytes_sent[key[:2]] += context.bytes_sent
+            self._bytes_received[key[:2]] += context.bytes_received
+            if context.new_connection is not None:
+                state = 'new' if context.new_connection else 'reused'
+                self._connections[key[:2] + (state,)] += 1
+            if context.elapsed is not None:
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = [
+                        [0] * (len(self.buckets) + 1), 0.0]
+                histogram[0][bisect_left(self.buckets, context.elapsed)] += 1
+                histogram[1] += context.elapsed
+
+    def on_retry(self, method, url, attempt, delay):
+        with self._lock:
+            self._retries[(method.upper(), endpoint_of(url))] += 1
+
+    def render_prometheus(self):
+        """
+        Render the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            _render_counter(lines, 'nimbasms_requests_total',
+                            'API calls by endpoint and status class',
+                            ('method', 'endpoint', 'status'), self._requests)
+            self._render_histograms(lines)
+            _render_counter(lines, 'nimbasms_request_bytes_total',
+                            'Bytes of request bodies sent',
+                            ('method', 'endpoint'), self._bytes_sent)
+            _render_counter(lines, 'nimbasms_response_bytes_total',
+                            'Bytes of response bodies received',
+                            ('method', 'endpoint'), self._bytes_received)
+            _render_counter(lines, 'nimbasms_connections_total',
+                            'API calls by new or reused connection',
+                            ('method', 'endpoint', 'connection'),
+                            self._connections)
+            _render_counter(lines, 'nimbasms_retries_total',
+                            'API calls retried',
+                            ('method', 'endpoint'), self._retries)
+        return '\n'.join(lines) + '\n'
+
+    def _render_histograms(self, lines):
+        name = 'nimbasms_request_duration_seconds'
+        lines.append(f'# HELP {name} Latency of the API calls')
+        lines.append(f'# TYPE {name} histogram')
+        bounds = [_format_value(bound) for bound in self.buckets] + ['+Inf']
+        for key, (counts, total) in sorted(self._histograms.items()):
+            labels = _labels(('method', 'endpoint', 'status'), key)
+            cumulative = 0
+            for bound, value in zip(bounds, counts):
+                cumulative += value
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{labels}}} {_format_value(total)}')
+            lines.append(f'{name}_count{{{labels}}} {cumulative}')
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"'
+                    for name, value in zip(names, values))
+
+
+def _escape(value):
+    """
+    Escape a label value for the text format: backslash, quote and newline.
+    """
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+def _format_value(value):
+    return repr(float(value))
+
+
+def _render_counter(lines, name, description, label_names, values):
+    lines.append(f'# HELP {name} {description}')
+    lines.append(f'# TYPE {name} counter')
+    for key, value in sorted(values.items()):
+        lines.append(f'{name}{{{_labels(label_names, key)}}} {value}')
+
+
+class SpanHooks(Instrument):
+    """
+    Tracing callbacks around every API call.
+
+    The value returned by start is kept in context.span, so end can close
+    the span opened by start, for instance an OpenTelemetry span.
+    """
+    def __init__(self, start=None, end=None):
+        """
+        Initialize the hooks
+
+        :param start: Callable taking the RequestContext, returning a span
+        :param end: Callable taking the RequestContext
+        """
+        self.start = start
+        self.end = end
+
+    def on_request_start(self, context):
+        if self.start is not None:
+            context.span = self.start(context)
+
+    def on_request_end(self, context):
+        if self.end is not None:
+            self.end(context)
+
+
+class RequestLogging:
+    """
+    Logs of the API calls shared by the HTTP Clients.
+
+    Without log_sample_rate, every request and response is logged at INFO
+    level; with it, one structured line is logged for 1 in log_sample_rate
+    requests and for every error. The client sets logger, log_sample_rate
+    and _log_counter, an itertools.count.
+    """
+    logger = logging.getLogger('nimbasms')
+    log_sample_rate = None
+    _log_counter = None
+    def _log_request(self, kwargs):
+        """
+        Logger request APIs
+        """
+        logger = self.logger
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info('-- BEGIN Nimba SMS API Request --')
+
+        if kwargs['params']:
+            logger.info('%s Request: %s?%s', kwargs['method'], kwargs['url'],
+                        urlencode(kwargs['params']))
+            logger.info('Query Params: %s', kwargs['params'])
+        else:
+            logger.info('%s Request: %s', kwargs['method'], kwargs['url'])
+
+        if kwargs['headers']:
+            logger.info('Headers:')
+            for key, value in kwargs['headers'].items():
+                #Do not log authorization headers
+                if 'authorization' not in key.lower():
+                    logger.info('%s : %s', key, value)
+
+        logger.info('-- END Nimba SMS API Request --')
+
+    def _log_response(self, response):
+        """
+        Logger response APIs
+        """
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        self.logger.info('Response Status Code: %s', response.status_code)
+        self.logger.info('Response Headers: %s', response.headers)
+
+    def _log_sample(self, context):
+        """
+        Log one structured line for a sampled request or an error.
+
+        The fields are also attached to the record as the nimbasms extra
+        attribute, for structured log handlers.
+        """
+        failed = context.status_code is None or context.status_code >= 400
+        if not failed and next(self._log_counter) % self.log_sample_rate:
+            return
+        level = logging.WARNING if failed else logging.INFO
+        if not self.logger.isEnabledFor(level):
+            return
+        fields = {
+            'method': context.method,
+            'url': context.url,
+            'status': context.status_code,
+            'elapsed_ms': round(context.elapsed * 1000, 1),
+            'error': repr(context.error) if context.error is not None else None,
+        }
+        self.logger.log(
+            level,
+            'Nimba SMS API %(method)s %(url)s status=%(status)s '
+            'elapsed_ms=%(elapsed_ms)s error=%(error)s',
+            fields, extra={'nimbasms': fields})
@@ -0,0 +1,352 @@
+"""
+A Nimba SMS local mirror.
+
+This module contains a mirror of the messages and contacts of the account
+in SQLite. A sync only reads the pages newer than the watermark of the
+previous sync, and the local tables are indexed for the reporting queries.
+
+Dependencies
+-----------
+sqlite3 : Default library database
+
+class
+---------
+Mirror : Local copy of the messages and contacts.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from nimbasms.records import Contact, Message
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS messages (
+    messageid TEXT PRIMARY KEY,
+    sender_name TEXT,
+    message TEXT,
+    contact TEXT,
+    numbers INTEGER,
+    status TEXT,
+    sent_at TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_status ON messages (status, sent_at);
+CREATE INDEX IF NOT EXISTS messages_sender_name ON messages (sender_name, sent_at);
+CREATE INDEX IF NOT EXISTS messages_sent_at ON messages (sent_at);
+CREATE TABLE IF NOT EXISTS contacts (
+    contact_id PRIMARY KEY,
+    numero TEXT,
+    name TEXT,
+    groups TEXT,
+    added_at TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS contacts_numero ON contacts (numero);
+CREATE INDEX IF NOT EXISTS contacts_added_at ON contacts (added_at);
+CREATE TABLE IF NOT EXISTS sync_state (
+    resource TEXT PRIMARY KEY,
+    newest TEXT,
+    count INTEGER,
+    synced_at REAL,
+    newest_at TEXT
+);
+'''
+
+# Contacts were first keyed by an INTEGER PRIMARY KEY, which only takes
+# integer ids: copy them to a table taking any id.
+_MIGRATE_CONTACTS = '''
+BEGIN;
+ALTER TABLE contacts RENAME TO contacts_integer;
+DROP INDEX contacts_numero;
+DROP INDEX contacts_added_at;
+''' + _SCHEMA + '''
+INSERT INTO contacts SELECT * FROM contacts_integer;
+DROP TABLE contacts_integer;
+COMMIT;
+'''
+
+# (table, record class, key, date field, columns stored as JSON)
+_RESOURCES = {
+    'messages': ('messages', Message, 'messageid', 'sent_at', ()),
+    'contacts': ('contacts', Contact, 'contact_id', 'added_at', ('groups',)),
+}
+
+
+def _isoformat(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class Mirror:
+    """
+    Local copy of the messages and contacts of the account in SQLite.
+
+    The API lists the newest items first: a sync reads pages from the
+    first one until it meets the newest item of the previous sync, or an
+    item older than it when that one was deleted, after at least refresh
+    items, so that the status of recent messages is updated too. When a
+    resource is listed with newest_first=False, items are appended at the
+    end of the list and a sync starts at the offset reached by the
+    previous one, less refresh items.
+
+    Pages are written with one bulk insert each. Queries never call the API.
+    """
+    def __init__(self, client, path, page_size=100, refresh=100,
+                 newest_first=True):
+        """
+        Open the mirror, creating it if needed.
+
+        :param Client client: Nimba SMS Client
+        :param str path: Path of the SQLite file, ':memory:' for tests
+        :param int page_size: Items per page requested
+        :param int refresh: Recent items read again by every sync
+        :param newest_first: The API lists the newest items first, a bool
+                             for every resource or a dict by resource,
+                             True for the resources it does not name
+        """
+        if isinstance(newest_first, bool):
+            newest_first = dict.fromkeys(_RESOURCES, newest_first)
+        self.client = client
+        self.path = path
+        self.page_size = page_size
+        self.refresh = refresh
+        self.newest_first = {resource: newest_first.get(resource, True)
+                             for resource in _RESOURCES}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """
+        Upgrade a file created by an earlier version.
+        """
+        columns = {row[1] for row in self._db.execute('PRAGMA table_info(sync_state)')}
+        if 'newest_at' not in columns:
+            self._db.execute('ALTER TABLE sync_state ADD COLUMN newest_at TEXT')
+        types = {row[1]: row[2] for row in self._db.execute('PRAGMA table_info(contacts)')}
+        if types['contact_id'] == 'INTEGER':
+            self._db.executescript(_MIGRATE_CONTACTS)
+
+    def close(self):
+        """
+        Close the database.
+        """
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f'<Nimba.Mirror {self.path}>'
+
+    def sync(self):
+        """
+        Sync the messages and the contacts.
+
+        :returns: Sync report by resource
+        """
+        return {resource: self._sync(resource) for resource in _RESOURCES}
+
+    def sync_messages(self):
+        """
+        Fetch the messages added or updated since the last sync.
+
+        :returns: Number of pages and items fetched
+        """
+        return self._sync('messages')
+
+    def sync_contacts(self):
+        """
+        Fetch the contacts added since the last sync.
+
+        :returns: Number of pages and items fetched
+        """
+        return self._sync('contacts')
+
+    def _sync(self, resource):
+        _, _, key, date_field, _ = _RESOURCES[resource]
+        newest_first = self.newest_first[resource]
+        with self._lock:
+            state = self._db.execute(
+                'SELECT newest, count, newest_at FROM sync_state '
+                'WHERE resource = ?', (resource,)).fetchone()
+        offset = 0
+        if state is not None and not newest_first:
+            offset = max(0, (state[1] or 0) - self.refresh)
+        # A full sync walks many pages, fetch the next one in background.
+        pages = getattr(self.client, resource).iter_pages(
+            self.page_size, offset, prefetch=state is None)
+
+        # Key and date of the newest item.
+        watermark = (state[0], state[2]) if state is not None else (None, None)
+        fetched = page_count = 0
+        # The newest item of the last sync may be in an earlier page than
+        # the one completing the refresh window.
+        reached = False
+        for page in pages:
+            results = page.data['results']
+            page_count += 1
+            if not results:
+                break
+            if newest_first and fetched == 0 and offset == 0:
+                watermark = (str(results[0][key]), results[0].get(date_field))
+            self._write(resource, results)
+            fetched += len(results)
+            if newest_first and state is not None:
+                reached = reached or _passed(results, key, date_field,
+                                             state[0], state[2])
+                if reached and fetched >= self.refresh:
+                    break
+
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO sync_state (resource, newest, count, '
+                'synced_at, newest_at) VALUES (?, ?, ?, ?, ?)',
+                (resource, watermark[0], pages.count, time.time(), watermark[1]))
+        return {'pages': page_count, 'items': fetched}
+
+    def _write(self, resource, items):
+        """
+        Insert or update a page of items in a single transaction.
+        """
+        table, record_class, _, _, json_columns = _RESOURCES[resource]
+        fields = record_class.fields
+        known = set(fields)
+        rows = []
+        for item in items:
+            row = [json.dumps(item.get(field)) if field in json_columns
+                   else item.get(field) for field in fields]
+            extra = {name: value for name, value in item.items()
+                     if name not in known}
+            row.append(json.dumps(extra) if extra else None)
+            rows.append(row)
+        columns = ', '.join(fields + ('extra',))
+        marks = ', '.join('?' * (len(fields) + 1))
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                self._db.executemany(
+                    f'INSERT OR REPLACE INTO {table} ({columns}) '
+                    f'VALUES ({marks})', rows)
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def _select(self, resource, conditions, params, limit):
+        table, record_class, _, date_field, json_columns = _RESOURCES[resource]
+        fields = record_class.fields
+        query = f'SELECT {", ".join(fields)}, extra FROM {table}'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += f' ORDER BY {date_field} DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        for row in rows:
+            values = dict(zip(fields, row))
+            for column in json_columns:
+                if values[column] is not None:
+                    values[column] = json.loads(values[column])
+            if row[-1]:
+                values.update(json.loads(row[-1]))
+            yield record_class(**values)
+
+    def messages(self, status=None, sender_name=None, since=None, until=None,
+                 limit=None):
+        """
+        Query the local messages, newest first.
+
+        :param str status: Status of the messages
+        :param str sender_name: Sender Name, is Sensitive Case
+        :param since: Messages sent at or after this date, str or datetime
+        :param until: Messages sent before this date, str or datetime
+        :param int limit: Maximum messages returned
+
+        :returns: Generator of Message
+        """
+        conditions, params = _date_conditions('sent_at', since, until)
+        if status is not None:
+            conditions.append('status = ?')
+            params.append(status)
+        if sender_name is not None:
+            conditions.append('sender_name = ?')
+            params.append(sender_name)
+        return self._select('messages', conditions, params, limit)
+
+    def contacts(self, numero=None, since=None, until=None, limit=None):
+        """
+        Query the local contacts, newest first.
+
+        :param str numero: Phone number of the contact
+        :param since: Contacts added at or after this date, str or datetime
+        :param until: Contacts added before this date, str or datetime
+        :param int limit: Maximum contacts returned
+
+        :returns: Generator of Contact
+        """
+        conditions, params = _date_conditions('added_at', since, until)
+        if numero is not None:
+            conditions.append('numero = ?')
+            params.append(numero)
+        return self._select('contacts', conditions, params, limit)
+
+    def message_counts(self, by='status', since=None, until=None):
+        """
+        Count the local messages by status, sender_name or day.
+
+        :param str by: status, sender_name or day
+        :param since: Messages sent at or after this date, str or datetime
+        :param until: Messages sent before this date, str or datetime
+
+        :returns: Number of messages by value
+        """
+        columns = {'status': 'status', 'sender_name': 'sender_name',
+                   'day': 'substr(sent_at, 1, 10)'}
+        if by not in columns:
+            raise ValueError('by must be status, sender_name or day')
+        conditions, params = _date_conditions('sent_at', since, until)
+        query = f'SELECT {columns[by]}, COUNT(*) FROM messages'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' GROUP BY 1 ORDER BY 1'
+        with self._lock:
+            return dict(self._db.execute(query, params).fetchall())
+
+
+def _passed(items, key, date_field, newest, newest_at):
+    """
+    Whether the items reach the newest item of the last sync, or an item
+    older than it when that one was deleted.
+    """
+    for item in items:
+        if str(item[key]) == newest:
+            return True
+        date = item.get(date_field)
+        if newest_at is not None and date is not None and date < newest_at:
+            return True
+    return False
+
+
+def _date_conditions(column, since, until):
+    conditions, params = [], []
+    if since is not None:
+        conditions.append(f'{column} >= ?')
+        params.append(_isoformat(since))
+    if until is not None:
+        conditions.append(f'{column} < ?')
+        params.append(_isoformat(until))
+    return conditions, params
@@ -0,0 +1,390 @@
+"""
+A Nimba SMS durable outbound queue.
+
+This module contains an outbox stored in SQLite: messages are enqueued
+locally at disk speed and drained through the client by a pool of
+threads, the server message id and status of every entry are recorded.
+
+Dependencies
+-----------
+sqlite3 : Default library database
+
+class
+---------
+Outbox : Durable queue of messages to send.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from nimbasms.bulk import imap_bounded
+from nimbasms.retry import RetryPolicy
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipients TEXT NOT NULL,
+    sender_name TEXT NOT NULL,
+    message TEXT NOT NULL,
+    idempotency_key TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    status_code INTEGER,
+    message_id TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbox_state ON outbox (state, id);
+'''
+
+# Entries which can be claimed: pending and due, or whose lease expired.
+_CLAIMABLE = ('(state = ? AND next_attempt_at <= ?) '
+              'OR (state = ? AND updated_at <= ?)')
+
+
+class Outbox:
+    """
+    Durable queue of messages backed by a SQLite file.
+
+    Every entry gets an idempotency key when it is enqueued. A drain
+    claims the entries it sends for lease seconds, only when a thread is
+    free to send them: the entries left in the sending state by a crashed
+    drain are claimed again once their lease expired, and sent again with
+    the same key, so the API can drop the duplicate of a message which
+    already went out. The lease must be longer than a request with all its
+    retries.
+
+    Any number of processes can open the file to enqueue while another one
+    drains it, opening an outbox never touches the entries being sent.
+    """
+    def __init__(self, path, lease=300.0):
+        """
+        Open the outbox, creating it if needed
+
+        :param str path: Path of the SQLite file, ':memory:' for tests
+        :param float lease: Seconds an entry is claimed by a drain
+        """
+        if lease <= 0:
+            raise ValueError(lease)
+        self.path = path
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+        columns = {row[1] for row in self._db.execute('PRAGMA table_info(outbox)')}
+        if 'next_attempt_at' not in columns:
+            self._db.execute('ALTER TABLE outbox ADD COLUMN '
+                             'next_attempt_at REAL NOT NULL DEFAULT 0')
+
+    def close(self):
+        """
+        Close the database.
+        """
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def recover(self):
+        """
+        Put back in the queue the entries left in the sending state,
+        without waiting for their lease to expire.
+
+        Only call it when no drain is running on the file, after a crash:
+        the entries a running drain is sending would be sent twice.
+
+        :returns: Number of entries recovered
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                'UPDATE outbox SET state = ?, updated_at = ? WHERE state = ?',
+                (PENDING, time.time(), SENDING))
+        return cursor.rowcount
+
+    def enqueue(self, to, sender_name, message):
+        """
+        Add a message to the queue.
+
+        :param list to: List contact receiver
+        :param str sender_name: Sender Name, is Sensitive Case
+        :param str message: Text message
+
+        :returns: Id of the entry
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT INTO outbox (recipients, sender_name, message, '
+                'idempotency_key, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (json.dumps(list(to)), sender_name, message,
+                 uuid.uuid4().hex, now, now))
+        return cursor.lastrowid
+
+    def enqueue_many(self, messages):
+        """
+        Add messages to the queue in a single transaction.
+
+        :param iterable messages: Tuples (to, sender_name, message)
+
+        :returns: Number of entries added
+        """
+        now = time.time()
+        rows = ((json.dumps(list(to)), sender_name, message,
+                 uuid.uuid4().hex, now, now)
+                for to, sender_name, message in messages)
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                cursor = self._db.executemany(
+                    'INSERT INTO outbox (recipients, sender_name, message, '
+                    'idempotency_key, created_at, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', rows)
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+        return cursor.rowcount
+
+    def stats(self):
+        """
+        Number of entries by state.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT state, COUNT(*) FROM outbox GROUP BY state').fetchall()
+        counts = {PENDING: 0, SENDING: 0, SENT: 0, FAILED: 0}
+        counts.update(rows)
+        return counts
+
+    def entries(self, state=None):
+        """
+        Iterate over the entries, optionally filtered by state.
+
+        :param str state: pending, sending, sent or failed
+        """
+        query = ('SELECT id, recipients, sender_name, message, state, attempts, '
+                 'status_code, message_id, error FROM outbox')
+        params = ()
+        if state is not None:
+            query += ' WHERE state = ?'
+            params = (state,)
+        with self._lock:
+            rows = self._db.execute(query + ' ORDER BY id', params).fetchall()
+        for row in rows:
+            yield {
+                'id': row[0], 'to': json.loads(row[1]), 'sender_name': row[2],
+                'message': row[3], 'state': row[4], 'attempts': row[5],
+                'status_code': row[6], 'message_id': row[7], 'error': row[8],
+            }
+
+    def _claim(self, size):
+        """
+        Move up to size entries due, pending or whose lease expired, to the
+        sending state.
+
+        A read checks first that an entry is due, so that polling an idle
+        queue does not take the write lock other processes enqueue with.
+        """
+        if size < 1:
+            return []
+        with self._lock:
+            now = time.time()
+            claimable = (PENDING, now, SENDING, now - self.lease)
+            if self._db.execute(f'SELECT 1 FROM outbox WHERE {_CLAIMABLE} LIMIT 1',
+                                claimable).fetchone() is None:
+                return []
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._db.execute(
+                    'SELECT id, recipients, sender_name, message, '
+                    f'idempotency_key, attempts FROM outbox WHERE {_CLAIMABLE} '
+                    'ORDER BY id LIMIT ?', claimable + (size,)).fetchall()
+                self._db.executemany(
+                    'UPDATE outbox SET state = ?, attempts = attempts + 1, '
+                    'updated_at = ? WHERE id = ?',
+                    [(SENDING, now, row[0]) for row in rows])
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+        return rows
+
+    def _record(self, entry_id, state, status_code=None, message_id=None,
+                error=None):
+        with self._lock:
+            self._db.execute(
+                'UPDATE outbox SET state = ?, status_code = ?, message_id = ?, '
+                'error = ?, updated_at = ? WHERE id = ?',
+                (state, status_code, message_id, error, time.time(), entry_id))
+
+    def _next_attempt(self):
+        """
+        Time of the next attempt of the pending entries, None without any.
+        """
+        with self._lock:
+            return self._db.execute(
+                'SELECT MIN(next_attempt_at) FROM outbox WHERE state = ?',
+                (PENDING,)).fetchone()[0]
+
+    def _pending_entries(self, max_workers, in_flight, wait, poll_interval,
+                         stop):
+        """
+        Claim the pending entries lazily, as many as free threads.
+
+        The queue is only considered empty once no entry is in flight, since
+        an entry being sent may be put back in the queue, and no entry waits
+        for its next attempt. While entries are in flight, the next claim
+        waits for one of them to end, or for the next attempt due.
+        """
+        while stop is None or not stop.is_set():
+            busy = in_flight.count
+            rows = self._claim(max_workers - busy)
+            if rows:
+                for row in rows:
+                    in_flight.acquire()
+                    yield row
+                continue
+            next_attempt = self._next_attempt()
+            if next_attempt is None and not busy and not wait:
+                return
+            delay = poll_interval
+            if next_attempt is not None:
+                delay = min(delay, max(0.0, next_attempt - time.time()))
+            if busy:
+                in_flight.wait_release(busy, delay)
+            elif stop is not None:
+                stop.wait(delay)
+            else:
+                time.sleep(delay)
+
+    def drain(self, client, max_workers=8, max_attempts=5, wait=False,
+              poll_interval=0.5, stop=None, backoff_factor=1.0,
+              backoff_max=300.0):
+        """
+        Send the pending entries with a bounded pool of threads.
+
+        An entry is sent when the API accepts it. A 4xx answer other than 429
+        fails it; errors, 429 and 5xx answers put it back in the queue until
+        max_attempts is reached. The next attempt is delayed with exponential
+        backoff and jitter, or by the Retry-After of a 429 or 503 answer, and
+        the drain waits for the entries delayed before returning.
+
+        :param Client client: Nimba SMS Client
+        :param int max_workers: Number of requests in flight
+        :param int max_attempts: Attempts before an entry is failed
+        :param bool wait: Keep polling for new entries until stop is set
+        :param float poll_interval: Seconds between polls of an empty queue
+        :param threading.Event stop: Event stopping the drain
+        :param float backoff_factor: Delay in seconds before the second attempt
+        :param float backoff_max: Maximum delay between two attempts
+
+        :returns: Number of entries by outcome: sent, failed and retried
+        """
+        in_flight = _Counter()
+        policy = RetryPolicy(backoff_factor=backoff_factor,
+                             backoff_max=backoff_max, retry_exceptions=())
+
+        def send(row):
+            try:
+                return send_entry(row)
+            finally:
+                in_flight.release()
+
+        def send_entry(row):
+            entry_id, recipients, sender_name, message, key, attempts = row
+            attempts += 1
+            try:
+                response = client.messages.create(
+                    json.loads(recipients), sender_name, message,
+                    idempotency_key=key)
+            except Exception as exc:  # pylint: disable=broad-except
+                return self._retry_or_fail(entry_id, attempts, max_attempts,
+                                           None, repr(exc),
+                                           policy.backoff(attempts))
+            if response.ok:
+                data = response.data
+                message_id = data.get('messageid') if isinstance(data, dict) else None
+                self._record(entry_id, SENT, response.status_code, message_id)
+                return SENT
+            if response.status_code == 429 or response.status_code >= 500:
+                return self._retry_or_fail(entry_id, attempts, max_attempts,
+                                           response.status_code, response.text,
+                                           min(policy.backoff(attempts, response),
+                                               backoff_max))
+            self._record(entry_id, FAILED, response.status_code,
+                         error=response.text)
+            return FAILED
+
+        outcomes = {SENT: 0, FAILED: 0, PENDING: 0}
+        # An entry is only claimed when a thread is free to send it, so its
+        # lease does not run out while it waits for a thread.
+        for outcome in imap_bounded(
+                send, self._pending_entries(max_workers, in_flight, wait,
+                                            poll_interval, stop),
+                max_workers=max_workers, max_pending=max_workers):
+            outcomes[outcome] += 1
+        return {'sent': outcomes[SENT], 'failed': outcomes[FAILED],
+                'retried': outcomes[PENDING]}
+
+    def _retry_or_fail(self, entry_id, attempts, max_attempts, status_code,
+                       error, delay):
+        if attempts >= max_attempts:
+            self._record(entry_id, FAILED, status_code, error=error)
+            return FAILED
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'UPDATE outbox SET state = ?, status_code = ?, error = ?, '
+                'updated_at = ?, next_attempt_at = ? WHERE id = ?',
+                (PENDING, status_code, error, now, now + delay, entry_id))
+        return PENDING
+
+
+class _Counter:
+    """
+    Thread-safe count of the entries in flight.
+    """
+    def __init__(self):
+        self.count = 0
+        self._released = threading.Condition()
+
+    def acquire(self):
+        """
+        Count one more entry.
+        """
+        with self._released:
+            self.count += 1
+
+    def release(self):
+        """
+        Count one less entry.
+        """
+        with self._released:
+            self.count -= 1
+            self._released.notify_all()
+
+    def wait_release(self, count, timeout):
+        """
+        Wait until fewer than count entries are in flight, or for timeout
+        seconds.
+        """
+        with self._released:
+            self._released.wait_for(lambda: self.count < count, timeout)
@@ -0,0 +1,232 @@
+"""
+A Nimba SMS pagination helpers.
+
+This module contains the iterators used to walk through list endpoints.
+
+Dependencies
+-----------
+concurrent.futures : Default library thread pool
+
+class
+---------
+PageIterator : Iterator of pages following the next links.
+FanOutPageIterator : Iterator of pages fetched concurrently by offset.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from nimbasms.execptions import NimbaSMSException
+
+
+def fetch_page(client, uri, params=None, stream=False):
+    """
+    Fetch a page of a list endpoint.
+
+    :param Client client: Nimba SMS Client
+    :param str uri: Fully qualified url of the page
+    :param dict params: Query string parameters
+    :param bool stream: Return the page before its body is read
+
+    :returns: Response from the Nimba API, StreamedResponse with stream
+    :raises NimbaSMSException: When the API does not answer with success
+    """
+    options = {'stream': True} if stream else {}
+    response = client.request(
+        method='GET',
+        uri=uri,
+        params=params or {},
+        **options
+    )
+    if not response.ok:
+        raise NimbaSMSException(
+            f'Unable to fetch page {uri}: HTTP {response.status_code}')
+    return response
+
+
+def _close_unread(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class PageIterator:  # pylint: disable=too-many-instance-attributes
+    """
+    Iterate over the pages of a list endpoint.
+
+    Every iterator keeps its own cursor, so several iterators can walk the
+    same service from different threads. The cursor is reset by every new
+    iteration, which starts again from the first page. When prefetch is
+    enabled, the next page is requested in background while the current
+    page is processed. At most two pages are held in memory.
+
+    With stream, the pages are StreamedPage parsed while they are received:
+    at most one item is held in memory. A page is closed when the next one
+    is requested, so it must be consumed before.
+    """
+    def __init__(self, client, uri, params=None, prefetch=True, stream=False):
+        """
+        Initialize the iterator
+
+        :param Client client: Nimba SMS Client
+        :param str uri: Fully qualified url of the first page
+        :param dict params: Query string parameters of the first page
+        :param bool prefetch: Fetch the next page in background
+        :param bool stream: Yield StreamedPage instead of Response
+        """
+        self.client = client
+        self.uri = uri
+        self.start_params = params
+        self.next_uri = uri
+        self.previous_uri = None
+        self.params = params
+        self.prefetch = prefetch
+        self.stream = stream
+        self.count = None
+
+    def _advance(self, response):
+        """
+        Move the cursor after the page received.
+
+        :returns: The page, a StreamedPage with stream
+        """
+        if self.stream:
+            page = response.page()
+            self.count = page.count
+            self.next_uri = page.next
+            self.previous_uri = page.previous
+        else:
+            page = response
+            data = response.data
+            self.count = data['count']
+            self.next_uri = data['next']
+            self.previous_uri = data['previous']
+        self.params = None
+        return page
+
+    def __iter__(self):
+        self.next_uri = self.uri
+        self.previous_uri = None
+        self.params = self.start_params
+        if not self.prefetch:
+            while self.next_uri is not None:
+                response = fetch_page(self.client, self.next_uri, self.params,
+                                      self.stream)
+                page = self._advance(response)
+                yield page
+                self._release(page)
+            return
+
+        if self.next_uri is None:
+            return
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(
+                fetch_page, self.client, self.next_uri, self.params, self.stream)
+            try:
+                while future is not None:
+                    response = future.result()
+                    page = self._advance(response)
+                    future = None
+                    if self.next_uri is not None:
+                        future = executor.submit(
+                            fetch_page, self.client, self.next_uri, None, self.stream)
+                    yield page
+                    self._release(page)
+            finally:
+                if future is not None and self.stream:
+                    # The iteration stopped, the prefetched page is never read.
+                    future.add_done_callback(_close_unread)
+
+    def _release(self, page):
+        """
+        Close a streamed page once the next one is requested.
+        """
+        if self.stream:
+            page.close()
+
+    def items(self, record_class=None):
+        """
+        Iterate over the results of every page.
+
+        :param type record_class: Yield records of this class instead of dicts
+        """
+        for response in self:
+            if self.stream:
+                yield from response.items(record_class)
+            elif record_class is None:
+                yield from response.data['results']
+            else:
+                yield from response.records(record_class)
+
+
+class FanOutPageIterator:
+    """
+    Iterate over the pages of a list endpoint, fetching them concurrently.
+
+    The first page gives the count of items, every remaining page is then
+    planned by offset and fetched by a pool of threads. Pages are yielded
+    in order; at most 2 * parallel pages are held in memory.
+
+    The offsets are a snapshot of the list when the first page is read.
+    If items are added or removed while the pages are fetched, the items
+    shift between pages and some are yielded twice or skipped: use it on
+    a list which does not change, or follow the next links of
+    PageIterator and deduplicate by id.
+    """
+    def __init__(self, client, uri, limit=100, offset=0, parallel=8):
+        """
+        Initialize the iterator
+
+        :param Client client: Nimba SMS Client
+        :param str uri: Fully qualified url of the list endpoint
+        :param int limit: Limit items per page
+        :param int offset: offset of the first page
+        :param int parallel: Number of pages fetched concurrently
+        """
+        if not parallel or parallel < 0:
+            raise ValueError('parallel must be positive Integer')
+        self.client = client
+        self.uri = uri
+        self.limit = limit
+        self.offset = offset
+        self.parallel = parallel
+        self.count = None
+
+    def _fetch(self, offset):
+        """
+        Fetch the page starting at offset.
+        """
+        return fetch_page(self.client, self.uri, {
+            'limit': self.limit,
+            'offset': offset
+        })
+
+    def __iter__(self):
+        first = self._fetch(self.offset)
+        self.count = first.data['count']
+
+        offsets = iter(range(self.offset + self.limit, self.count, self.limit))
+        with ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            pending = deque()
+            for offset in offsets:
+                pending.append(executor.submit(self._fetch, offset))
+                if len(pending) >= self.parallel * 2:
+                    break
+            yield first
+            while pending:
+                response = pending.popleft().result()
+                offset = next(offsets, None)
+                if offset is not None:
+                    pending.append(executor.submit(self._fetch, offset))
+                yield response
+
+    def items(self, record_class=None):
+        """
+        Iterate over the results of every page.
+
+        :param type record_class: Yield records of this class instead of dicts
+        """
+        for response in self:
+            if record_class is None:
+                yield from response.data['results']
+            else:
+                yield from response.records(record_class)
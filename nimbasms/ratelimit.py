@@ -0,0 +1,207 @@
+"""
+A Nimba SMS client-side rate limiter.
+
+This module contains token buckets used by Client to stay under the API
+rate limits instead of bursting into 429 responses.
+
+Dependencies
+-----------
+fcntl : Default library file locks, for FileTokenBucket (POSIX only)
+
+class
+---------
+TokenBucket : Token bucket shared by the threads of a process.
+FileTokenBucket : Token bucket shared by the processes of a host.
+RateLimiter : Account and per-endpoint buckets applied by Client.
+"""
+
+import os
+import struct
+import threading
+import time
+from urllib.parse import urlsplit
+
+from nimbasms.execptions import NimbaSMSException
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate tokens per second, up to capacity.
+
+    Callers reserve their tokens under a lock and sleep outside of it,
+    so waiting threads are served in order and never spin.
+    """
+    def __init__(self, rate, capacity=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        """
+        Initialize the bucket, full.
+
+        :param float rate: Tokens added per second
+        :param float capacity: Maximum burst, rate by default and at least
+                               one token, so that rates below 1 per second
+                               still send one request at a time
+        :param clock: Function returning the current time in seconds
+        :param sleep: Function used to wait
+        """
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None
+                              else max(1.0, rate))
+        if self.capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._last = clock()
+
+    def _reserve(self, tokens, now, state):
+        """
+        Take tokens from state (tokens, last) and return the new state and
+        the delay before the tokens are available.
+        """
+        available, last = state
+        # A clock going back, as a state written before a reboot, adds nothing.
+        elapsed = max(0.0, now - last)
+        available = min(self.capacity, available + elapsed * self.rate)
+        available -= tokens
+        delay = -available / self.rate if available < 0 else 0.0
+        return (available, now), delay
+
+    def reserve(self, tokens=1):
+        """
+        Reserve tokens and return the delay in seconds to wait before using
+        them.
+
+        :param float tokens: Number of tokens
+        """
+        if tokens > self.capacity:
+            raise ValueError('tokens must not exceed the bucket capacity')
+        with self._lock:
+            (self._tokens, self._last), delay = self._reserve(
+                tokens, self.clock(), (self._tokens, self._last))
+        return delay
+
+    def acquire(self, tokens=1):
+        """
+        Wait until tokens are available and take them.
+
+        :param float tokens: Number of tokens
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            self.sleep(delay)
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    Token bucket whose state is stored in a file locked with fcntl.
+
+    Every process of the host opening the same path shares the bucket, so a
+    fleet of workers stays under a single limit. The state is dated with
+    the monotonic clock, which the processes of a host share and which is
+    not moved by wall clock adjustments; a state dated in the future, left
+    before a reboot, is reset to a full bucket.
+
+    fcntl is not available on Windows, use a TokenBucket per process there.
+    """
+    _state = struct.Struct('dd')
+
+    def __init__(self, path, rate, capacity=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        """
+        Initialize the bucket, creating the file if needed.
+
+        :param str path: Path of the file holding the bucket state
+        :param float rate: Tokens added per second
+        :param float capacity: Maximum burst, rate by default and at least 1
+        :param clock: Function returning the current time in seconds,
+                      shared by the processes using the file
+        :param sleep: Function used to wait
+        """
+        if fcntl is None:
+            raise NimbaSMSException(
+                'FileTokenBucket requires fcntl file locks, which are not '
+                'available on this platform; use TokenBucket instead')
+        super().__init__(rate, capacity, clock=clock, sleep=sleep)
+        self.path = path
+
+    def reserve(self, tokens=1):
+        """
+        Reserve tokens and return the delay in seconds to wait before using
+        them.
+
+        :param float tokens: Number of tokens
+        """
+        if tokens > self.capacity:
+            raise ValueError('tokens must not exceed the bucket capacity')
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                now = self.clock()
+                raw = os.pread(fd, self._state.size, 0)
+                state = (self.capacity, now)
+                if len(raw) == self._state.size:
+                    saved = self._state.unpack(raw)
+                    if saved[1] <= now:
+                        state = saved
+                state, delay = self._reserve(tokens, now, state)
+                os.pwrite(fd, self._state.pack(*state), 0)
+            finally:
+                os.close(fd)
+        return delay
+
+
+class RateLimiter:
+    """
+    Rate limiter applied by Client before every request.
+
+    The account bucket applies to every request, endpoint buckets are
+    selected with (method, path) keys, a path also matches its sub paths.
+    """
+    def __init__(self, bucket=None, endpoints=None):
+        """
+        Initialize the rate limiter
+
+        :param TokenBucket bucket: Bucket of the account
+        :param dict endpoints: TokenBucket by (method, path)
+        """
+        self.bucket = bucket
+        self.endpoints = dict(endpoints or {})
+
+    def bucket_for(self, method, path):
+        """
+        Bucket of an endpoint, None when it has no specific limit.
+
+        :param str method: HTTP Method
+        :param str path: Path of the url
+        """
+        method = method.upper()
+        path = path.rstrip('/')
+        while path:
+            bucket = self.endpoints.get((method, path))
+            if bucket is not None:
+                return bucket
+            path = path.rpartition('/')[0]
+        return None
+
+    def acquire(self, method, uri):
+        """
+        Wait until the request is allowed by every bucket applying to it.
+
+        :param str method: HTTP Method
+        :param str uri: Fully qualified url
+        """
+        if self.endpoints:
+            bucket = self.bucket_for(method, urlsplit(uri).path)
+            if bucket is not None:
+                bucket.acquire()
+        if self.bucket is not None:
+            self.bucket.acquire()
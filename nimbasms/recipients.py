@@ -0,0 +1,218 @@
+"""
+A Nimba SMS recipient preprocessor.
+
+This module contains the normalization of phone numbers before they are
+sent: numbers are converted to international format, validated and
+deduplicated, the invalid entries are returned with their reason.
+
+Dependencies
+-----------
+re : Default library regular expressions
+
+class
+---------
+Recipients : Result of a batch normalization.
+RecipientNormalizer : Normalizer of phone numbers.
+"""
+
+import re
+from collections import namedtuple
+
+GUINEA = '224'
+
+EMPTY = 'empty'
+INVALID_CHARACTERS = 'invalid characters'
+INVALID_LENGTH = 'invalid length'
+INVALID_NUMBER = 'invalid number'
+
+_SEPARATORS = str.maketrans('', '', ' \t-.()/')
+_NUMBER = re.compile(r'\+?\d+')
+
+Recipients = namedtuple('Recipients', ['valid', 'invalid', 'duplicates'])
+Recipients.__doc__ = """
+Result of a batch normalization.
+
+:param list valid: Normalized numbers, unique, in the input order
+:param list invalid: Tuples (entry, reason) of the rejected entries
+:param int duplicates: Number of entries dropped as duplicate
+"""
+
+
+class RecipientNormalizer:
+    """
+    Normalize phone numbers to E.164.
+
+    Numbers are accepted with separators, a + or 00 international prefix,
+    or as national numbers of the default country. Numbers of the default
+    country are checked against national_pattern; numbers of the other
+    countries only have their length checked (8 to 15 digits). Guinea has
+    no trunk prefix, so a national number written with a leading 0 is only
+    accepted when trunk_prefix is given; otherwise it is rejected rather
+    than taken for a number of the default country.
+
+    The numbers are returned as digits with the country code, the format
+    expected by the API, or with a leading + when plus is set.
+    """
+    def __init__(self, country_code=GUINEA, national_pattern=r'[36]\d{8}',
+                 national_length=9, plus=False, trunk_prefix=None):
+        """
+        Initialize the normalizer
+
+        :param str country_code: Country code of the national numbers
+        :param str national_pattern: Regular expression of a valid national
+                                     number of the default country
+        :param int national_length: Digits of a national number
+        :param bool plus: Prefix the numbers with +
+        :param str trunk_prefix: Prefix of the national numbers dialled in
+                                 the country, such as 0, None for Guinea
+        """
+        self.country_code = country_code
+        self.national_length = national_length
+        self.plus = plus
+        self.trunk_prefix = trunk_prefix
+        self._national = re.compile(national_pattern)
+        # Numbers already normalized skip the whole parsing.
+        self._canonical = re.compile(
+            rf'{"[+]" if plus else ""}{country_code}(?:{national_pattern})')
+        self._prefix = '+' if plus else ''
+
+    def __repr__(self):
+        return f'<Nimba.RecipientNormalizer +{self.country_code}>'
+
+    def normalize(self, numero):
+        """
+        Normalize one phone number.
+
+        :param str numero: Phone number as written by a human
+
+        :returns: Tuple (number, None) or (None, reason)
+        """
+        if isinstance(numero, str) and self._canonical.fullmatch(numero):
+            return numero, None
+        if numero is None:
+            return None, EMPTY
+        text = str(numero).translate(_SEPARATORS)
+        if not text:
+            return None, EMPTY
+        if not _NUMBER.fullmatch(text):
+            return None, INVALID_CHARACTERS
+
+        international = False
+        if text[0] == '+':
+            text, international = text[1:], True
+        elif text.startswith('00'):
+            text, international = text[2:], True
+        elif len(text) == self.national_length:
+            text = self.country_code + text
+        elif (self.trunk_prefix and text.startswith(self.trunk_prefix)
+              and len(text) == self.national_length + len(self.trunk_prefix)):
+            text = self.country_code + text[len(self.trunk_prefix):]
+        return self._check(text, international)
+
+    def _check(self, digits, international):
+        """
+        Validate the digits of a number with its country code.
+        """
+        country_code = self.country_code
+        if digits.startswith(country_code):
+            national = digits[len(country_code):]
+            if len(national) != self.national_length:
+                return None, INVALID_LENGTH
+            if not self._national.fullmatch(national):
+                return None, INVALID_NUMBER
+        elif not international or not 8 <= len(digits) <= 15:
+            return None, INVALID_LENGTH
+        return self._prefix + digits, None
+
+    def process(self, numbers):
+        """
+        Normalize, validate and deduplicate a batch of numbers.
+
+        :param iterable numbers: Phone numbers
+
+        :returns: Recipients
+        """
+        normalize = self.normalize
+        canonical = self._canonical.fullmatch
+        valid = []
+        invalid = []
+        duplicates = 0
+        seen = set()
+        add = seen.add
+        for numero in numbers:
+            # Numbers already normalized are the common case, keep them
+            # away from the method call.
+            if numero.__class__ is str and canonical(numero):
+                number = numero
+            else:
+                number, reason = normalize(numero)
+                if number is None:
+                    invalid.append((numero, reason))
+                    continue
+            if number in seen:
+                duplicates += 1
+                continue
+            add(number)
+            valid.append(number)
+        return Recipients(valid, invalid, duplicates)
+
+    def iter_valid(self, numbers, on_invalid=None):
+        """
+        Normalize and deduplicate a stream of numbers, lazily.
+
+        The set of numbers already seen grows with the unique numbers.
+
+        :param iterable numbers: Phone numbers
+        :param on_invalid: Callable(entry, reason) of the rejected entries
+
+        :returns: Generator of normalized numbers
+        """
+        normalize = self.normalize
+        canonical = self._canonical.fullmatch
+        seen = set()
+        add = seen.add
+        for numero in numbers:
+            if numero.__class__ is str and canonical(numero):
+                number = numero
+            else:
+                number, reason = normalize(numero)
+                if number is None:
+                    if on_invalid is not None:
+                        on_invalid(numero, reason)
+                    continue
+            if number in seen:
+                continue
+            add(number)
+            yield number
+
+
+_DEFAULT = RecipientNormalizer()
+
+
+def normalizer_for(normalize):
+    """
+    Normalizer selected by the normalize argument of the senders.
+
+    :param normalize: True for the default normalizer, or a
+                      RecipientNormalizer
+
+    :returns: RecipientNormalizer or None
+    """
+    if not normalize:
+        return None
+    if isinstance(normalize, RecipientNormalizer):
+        return normalize
+    return _DEFAULT
+
+
+def normalize_recipients(numbers, **options):
+    """
+    Normalize, validate and deduplicate a batch of numbers.
+
+    :param iterable numbers: Phone numbers
+    :param options: Arguments of RecipientNormalizer, Guinea by default
+
+    :returns: Recipients
+    """
+    normalizer = RecipientNormalizer(**options) if options else _DEFAULT
+    return normalizer.process(numbers)
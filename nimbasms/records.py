@@ -0,0 +1,105 @@
+"""
+A Nimba SMS typed records.
+
+This module contains light records for the items returned by the API.
+A record stores the known fields in slots, which uses less memory than
+a dict on large pages. Unknown fields are kept in the extra mapping.
+
+class
+---------
+Record : Base record.
+Message : A message item.
+Contact : A contact item.
+Group : A group item.
+SenderName : A sender name item.
+"""
+
+
+class Record:
+    """
+    Base record with slots.
+
+    Records compare equal by type and fields. They are mutable, so they
+    are not hashable: key a dict by one of their fields instead.
+    """
+    __slots__ = ('extra',)
+    fields = ()
+
+    def __init__(self, **values):
+        """
+        Initialize the record from keyword values
+        """
+        self._fill(values)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a record from an item decoded from the API.
+
+        Every key which is not a field goes to extra, including names
+        such as extra or self which are not valid keyword values.
+
+        :param dict data: Decoded item
+        """
+        record = cls.__new__(cls)
+        record._fill(dict(data))
+        return record
+
+    def _fill(self, values):
+        for field in self.fields:
+            setattr(self, field, values.pop(field, None))
+        self.extra = values or None
+
+    def to_dict(self):
+        """
+        Convert the record back to a dict.
+        """
+        data = {field: getattr(self, field) for field in self.fields}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __eq__(self, other):
+        if not isinstance(other, Record):
+            return NotImplemented
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        values = ', '.join(f'{field}={getattr(self, field)!r}'
+                           for field in self.fields)
+        return f'<Nimba.{type(self).__name__} {values}>'
+
+
+class Message(Record):
+    """
+    A message sent with Nimba SMS.
+    """
+    fields = ('messageid', 'sender_name', 'message', 'contact', 'numbers',
+              'status', 'sent_at')
+    __slots__ = fields
+
+
+class Contact(Record):
+    """
+    A contact of the account.
+    """
+    fields = ('contact_id', 'numero', 'name', 'groups', 'added_at')
+    __slots__ = fields
+
+
+class Group(Record):
+    """
+    A group of contacts.
+    """
+    fields = ('groupe_id', 'name', 'total_contact', 'added_at')
+    __slots__ = fields
+
+
+class SenderName(Record):
+    """
+    A sender name of the account.
+    """
+    fields = ('name', 'status', 'added_at')
+    __slots__ = fields
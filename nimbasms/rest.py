@@ -10,6 +10,7 @@ List : Default library typing
 class
 ---------
 BaseRest : Abstract class representing rest client
+PaginatedRest : Abstract class representing a list service
 Accounts: Account service.
 Groups : Group Services.
 SenderNames : Sender Name Services.
@@ -17,7 +18,22 @@ Contacts : Contact Services.
 Messages : Messages Services.
 """
 
-from typing import List
+import os
+from typing import Iterable, List
+
+from nimbasms.execptions import NimbaSMSException
+
+DEFAULT_BASE_URL = 'https://api.nimbasms.com'
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def _idempotency_headers(idempotency_key):
+    """
+    Headers carrying the idempotency key, if any.
+    """
+    if idempotency_key is None:
+        return None
+    return {IDEMPOTENCY_HEADER: idempotency_key}
 
 
 class BaseRest:
@@ -28,7 +44,7 @@ class BaseRest:
         """
         Iniatialize client rest with base url
         """
-        self.base_url = 'https://api.nimbasms.com'
+        self.base_url = getattr(client, 'base_url', DEFAULT_BASE_URL)
         self.client = client
 
     def __repr__(self):
@@ -38,6 +54,104 @@ class BaseRest:
         raise NotImplementedError
 
 
+class PaginatedRest(BaseRest):  # pylint: disable=abstract-method
+    """
+    Base Rest client for the services with a paginated list endpoint.
+    """
+    path = None
+    record_name = None
+
+    @property
+    def record_class(self):
+        """
+        Record class of the items, from nimbasms.records
+        """
+        from nimbasms import records  # pylint: disable=import-outside-toplevel
+        return getattr(records, self.record_name)
+
+    def iter_pages(self, limit: int=20, offset: int=0, prefetch: bool=True,
+                   parallel: int=None, stream: bool=False):
+        """
+        Iterate over the pages of the list, following the next links.
+
+        The iterator has its own cursor and does not change the state used
+        by next() and previous(), so it is safe to use from several threads.
+
+        With parallel, the count of the first page is used to plan every
+        page by offset and up to parallel pages are fetched concurrently.
+        Pages are still yielded in order. Items added or removed during the
+        iteration shift the offsets, some items are then repeated or
+        skipped, see FanOutPageIterator.
+
+        :param int limit: Limit items per page
+        :param int offset: offset of the first page
+        :param bool prefetch: Fetch the next page while the current one
+                              is processed
+        :param int parallel: Number of pages fetched concurrently
+        :param bool stream: Parse every page while it is received, the
+                            pages are then StreamedPage
+
+        :returns: PageIterator or FanOutPageIterator of Response
+        """
+        if not limit or limit < 0:
+            raise ValueError('Limit must be positive Integer')
+        if offset < 0:
+            raise ValueError('Offset must be greater than 1')
+        if parallel and stream:
+            raise ValueError('parallel and stream cannot be combined')
+        # pylint: disable=import-outside-toplevel
+        from nimbasms.pagination import FanOutPageIterator, PageIterator
+        if parallel:
+            return FanOutPageIterator(self.client, f'{self.base_url}{self.path}',
+                                      limit, offset, parallel=parallel)
+        return PageIterator(self.client, f'{self.base_url}{self.path}', {
+            'limit': limit,
+            'offset': offset
+        }, prefetch=prefetch, stream=stream)
+
+    def iter_all(self, limit: int=100, offset: int=0, prefetch: bool=True,
+                 parallel: int=None, typed: bool=False, stream: bool=False):
+        """
+        Iterate over every item of the list, page after page.
+
+        :param int limit: Limit items per page
+        :param int offset: offset of the first item
+        :param bool prefetch: Fetch the next page while the current one
+                              is processed
+        :param int parallel: Number of pages fetched concurrently
+        :param bool typed: Yield light records instead of dicts
+        :param bool stream: Decode the items one at a time while the pages
+                            are received, instead of whole pages
+
+        :returns: Generator of items
+        """
+        pages = self.iter_pages(limit, offset, prefetch, parallel, stream)
+        return pages.items(self.record_class if typed else None)
+
+    def stream_page(self, limit: int=20, offset: int=0):
+        """
+        Fetch a page of the list, parsed while it is received.
+
+        The items are decoded one at a time when the page is iterated,
+        count, next and previous are available before. The state used by
+        next() and previous() is not changed.
+
+        :param int limit: Limit items of the page
+        :param int offset: offset of the first item
+
+        :returns: StreamedPage
+        :raises NimbaSMSException: When the API does not answer with success
+        """
+        if not limit or limit < 0:
+            raise ValueError('Limit must be positive Integer')
+        if offset < 0:
+            raise ValueError('Offset must be greater than 1')
+        from nimbasms.pagination import fetch_page  # pylint: disable=import-outside-toplevel
+        response = fetch_page(self.client, f'{self.base_url}{self.path}',
+                              {'limit': limit, 'offset': offset}, stream=True)
+        return response.page()
+
+
 class Accounts(BaseRest):
     """
     Manage Account Service.
@@ -68,10 +182,13 @@ class Accounts(BaseRest):
         )
 
 
-class Groups(BaseRest):
+class Groups(PaginatedRest):
     """
     Manage Group Service.
     """
+    path = '/v1/groups'
+    record_name = 'Group'
+
     def __init__(self, client):
         """
         Initialize Groups
@@ -139,10 +256,13 @@ class Groups(BaseRest):
         })
 
 
-class SenderNames(BaseRest):
+class SenderNames(PaginatedRest):
     """
     Manager SenderName service.
     """
+    path = '/v1/sendernames'
+    record_name = 'SenderName'
+
     def __init__(self, client):
         """
         Initialize SenderName
@@ -210,10 +330,13 @@ class SenderNames(BaseRest):
         })
 
 
-class Contacts(BaseRest):
+class Contacts(PaginatedRest):
     """
     Manage Contact service.
     """
+    path = '/v1/contacts'
+    record_name = 'Contact'
+
     def __init__(self, client):
         """
         Initialize SenderName
@@ -280,13 +403,16 @@ class Contacts(BaseRest):
             'offset': offset
         })
 
-    def create(self, numero: str, name: str=None, groups: List[str]=None):
+    def create(self, numero: str, name: str=None, groups: List[str]=None,
+               idempotency_key: str=None):
         """
         Create message for sending sms
 
         :param str to: List contact receiver
         :param str sender_name: Sender Name, is Sensitive Case
         :param str message: Text message
+        :param str idempotency_key: Key identifying the creation across
+                                    retries, generated when retry is enabled
         """
         data = {'numero': numero}
         if name:
@@ -296,14 +422,45 @@ class Contacts(BaseRest):
         return self.client.request(
             method='POST',
             uri=f'{self.base_url}/v1/contacts',
-            data=data
+            data=data,
+            headers=_idempotency_headers(idempotency_key)
         )
 
+    def import_stream(self, contacts, max_workers: int=8, index_path: str=None,
+                      checkpoint: str=None, progress=None, **options):
+        """
+        Import a large stream of contacts.
+
+        Numbers are normalized and deduplicated, the contacts already on
+        the account are skipped and the others are created by a bounded
+        pool of threads. See ContactImporter for the other options.
 
-class Messages(BaseRest):
+        :param contacts: Path of a CSV file with a numero column, or an
+                         iterable of dicts or phone numbers
+        :param int max_workers: Number of requests in flight
+        :param str index_path: File caching the numbers on the account
+        :param str checkpoint: File saving the position, to resume the import
+        :param progress: Callable taking the ImportReport
+
+        :returns: ImportReport
+        """
+        # pylint: disable=import-outside-toplevel
+        from nimbasms.importer import ContactImporter, read_csv
+        if isinstance(contacts, (str, os.PathLike)):
+            contacts = read_csv(contacts)
+        importer = ContactImporter(self.client, max_workers=max_workers,
+                                   index_path=index_path, checkpoint=checkpoint,
+                                   progress=progress, **options)
+        return importer.run(contacts)
+
+
+class Messages(PaginatedRest):
     """
     Manage Message Service.
     """
+    path = '/v1/messages'
+    record_name = 'Message'
+
     def __init__(self, client):
         """
         Initialize Messages
@@ -322,14 +479,26 @@ class Messages(BaseRest):
         """
         return '<Nimba.Messages>'
 
-    def create(self, to: List[str], sender_name: str, message: str):
+    def create(self, to: List[str], sender_name: str, message: str,
+               idempotency_key: str=None, normalize=False, on_invalid=None):
         """
         Create message for sending sms
 
         :param list to: List contact receiver
         :param str sender_name: Sender Name, is Sensitive Case
         :param str message: Text message
-        """
+        :param str idempotency_key: Key identifying the message across
+                                    retries, generated when retry is enabled
+        :param normalize: Normalize and deduplicate the receivers, True or
+                          a RecipientNormalizer
+        :param on_invalid: Callable(entry, reason) of the receivers dropped
+                           by the normalization
+        """
+        if normalize:
+            from nimbasms.recipients import normalizer_for  # pylint: disable=import-outside-toplevel
+            to = list(normalizer_for(normalize).iter_valid(to, on_invalid))
+            if not to:
+                raise NimbaSMSException('No valid receiver to send the message to')
         return self.client.request(
             method='POST',
             uri=f'{self.base_url}/v1/messages',
@@ -337,9 +506,85 @@ class Messages(BaseRest):
                 'to': to,
                 'sender_name': sender_name,
                 'message': message
-            }
+            },
+            headers=_idempotency_headers(idempotency_key)
         )
 
+    def create_many(self, to: Iterable[str], sender_name: str, message: str,
+                    chunk_size: int=100, max_workers: int=8, normalize=False,
+                    on_invalid=None, compact: bool=False, sink=None):
+        """
+        Send the same message to a large stream of recipients.
+
+        Recipients are split in chunks of chunk_size numbers, every chunk is
+        sent with one request by a bounded pool of threads sharing the
+        client session. Results are yielded as soon as a chunk completes,
+        so they are not in the recipients order.
+
+        :param iterable to: Recipients, consumed lazily
+        :param str sender_name: Sender Name, is Sensitive Case
+        :param str message: Text message
+        :param int chunk_size: Maximum recipients per request
+        :param int max_workers: Number of requests in flight
+        :param normalize: Normalize and deduplicate the recipients, True or
+                          a RecipientNormalizer
+        :param on_invalid: Callable(entry, reason) of the recipients dropped
+                           by the normalization
+        :param bool compact: Yield SendResult records instead of BulkResult,
+                             the responses are not kept
+        :param ResultSink sink: Sink receiving a SendResult per chunk while
+                                the send runs, implies compact
+
+        :returns: Generator of BulkResult, or of SendResult when compact
+        """
+        # pylint: disable=import-outside-toplevel
+        from nimbasms import bulk
+
+        def send(indexed_chunk):
+            index, chunk = indexed_chunk
+            try:
+                response = self.create(chunk, sender_name, message)
+            except Exception as exc:  # pylint: disable=broad-except
+                return bulk.BulkResult(index, chunk, None, exc)
+            return bulk.BulkResult(index, chunk, response, None)
+
+        if normalize:
+            from nimbasms.recipients import normalizer_for
+            to = normalizer_for(normalize).iter_valid(to, on_invalid)
+        results = bulk.imap_bounded(send, enumerate(bulk.chunked(to, chunk_size)),
+                                    max_workers=max_workers)
+        if compact or sink is not None:
+            from nimbasms.results import compact_results
+            return compact_results(results, sink)
+        return results
+
+    send_bulk = create_many
+
+    def create_campaign(self, template: str, recipients: Iterable[dict],
+                        sender_name: str, chunk_size: int=100,
+                        max_workers: int=8, **options):
+        """
+        Send a templated message, merging the recipients of identical texts.
+
+        The template uses the str.format syntax, such as 'Hello {name}'.
+        Recipients receiving the same text are sent with one request of at
+        most chunk_size numbers. See Campaign for the other options.
+
+        :param str template: Template of the message
+        :param iterable recipients: Dicts of variables with the phone number
+                                    in 'to', consumed lazily
+        :param str sender_name: Sender Name, is Sensitive Case
+        :param int chunk_size: Maximum recipients per request
+        :param int max_workers: Number of requests in flight
+
+        :returns: Generator of CampaignResult
+        """
+        from nimbasms.campaign import Campaign  # pylint: disable=import-outside-toplevel
+        campaign = Campaign(self.client, template, sender_name,
+                            chunk_size=chunk_size, max_workers=max_workers,
+                            **options)
+        return campaign.send(recipients)
+
     def request_message(self, uri, params=None):
         """
         Make HTTP request with Client.
@@ -0,0 +1,290 @@
+"""
+A Nimba SMS send results.
+
+This module contains a compact record of the result of one request of a
+bulk send, and sinks streaming the records to a file while the send
+runs, so memory stays flat whatever the size of the campaign.
+
+Dependencies
+-----------
+csv : Default library CSV writer
+sqlite3 : Default library database
+
+class
+---------
+SendResult : Compact result of one request.
+ResultSink : Base sink of results.
+NDJSONSink : Results as JSON lines.
+CSVSink : Results as CSV rows.
+SQLiteSink : Results in a SQLite table.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+
+FIELDS = ('index', 'status_code', 'message_id', 'error_code')
+
+
+class SendResult:
+    """
+    Compact result of one request of a bulk send.
+
+    The Response, with its body and headers, is not kept: a record holds
+    four values, about a tenth of the memory of a BulkResult.
+
+    :param int index: Position of the chunk of recipients in the send
+    :param int status_code: HTTP status, None when no response was received
+    :param str message_id: Id of the message created by the API
+    :param str error_code: None on success, the name of the exception when
+                           no response was received, http_<status> when
+                           the API returned an error
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, index, status_code=None, message_id=None,
+                 error_code=None):
+        self.index = index
+        self.status_code = status_code
+        self.message_id = message_id
+        self.error_code = error_code
+
+    @classmethod
+    def from_result(cls, result):
+        """
+        Compact the result of a bulk send.
+
+        :param result: BulkResult or CampaignResult
+        """
+        if result.error is not None:
+            return cls(result.index, None, None, type(result.error).__name__)
+        response = result.response
+        status_code = response.status_code
+        if not response.ok:
+            return cls(result.index, status_code, None, f'http_{status_code}')
+        data = response.data
+        message_id = data.get('messageid') if isinstance(data, dict) else None
+        return cls(result.index, status_code, message_id, None)
+
+    @property
+    def ok(self):
+        """
+        The request was accepted by the API
+        """
+        return self.error_code is None
+
+    def as_tuple(self):
+        """
+        Values of the record in the FIELDS order.
+        """
+        return (self.index, self.status_code, self.message_id, self.error_code)
+
+    def as_dict(self):
+        """
+        Convert the record to a dict.
+        """
+        return dict(zip(FIELDS, self.as_tuple()))
+
+    def __eq__(self, other):
+        if not isinstance(other, SendResult):
+            return NotImplemented
+        return self.as_tuple() == other.as_tuple()
+
+    def __repr__(self):
+        return (f'<Nimba.SendResult index={self.index} '
+                f'status_code={self.status_code} message_id={self.message_id!r} '
+                f'error_code={self.error_code!r}>')
+
+
+def compact_results(results, sink=None):
+    """
+    Compact a stream of results, lazily, writing them to a sink.
+
+    :param iterable results: BulkResult or CampaignResult
+    :param ResultSink sink: Sink receiving every record
+
+    :returns: Generator of SendResult
+    """
+    from_result = SendResult.from_result
+    for result in results:
+        record = from_result(result)
+        if sink is not None:
+            sink.write(record)
+        yield record
+
+
+class ResultSink:
+    """
+    Base sink receiving the results of a send, one at a time.
+
+    Subclasses implement _write. A sink counts the results written and
+    failed, and is a context manager closing it at the end of the block.
+    """
+    def __init__(self):
+        self.written = 0
+        self.failed = 0
+
+    def write(self, result):
+        """
+        Write one result.
+
+        :param SendResult result: Result of a request
+        """
+        self._write(result)
+        self.written += 1
+        if result.error_code is not None:
+            self.failed += 1
+
+    def _write(self, result):
+        raise NotImplementedError
+
+    def consume(self, results):
+        """
+        Write a whole stream of results.
+
+        :param iterable results: SendResult, BulkResult or CampaignResult
+
+        :returns: The sink
+        """
+        for result in results:
+            if not isinstance(result, SendResult):
+                result = SendResult.from_result(result)
+            self.write(result)
+        return self
+
+    def flush(self):
+        """
+        Write the buffered results.
+        """
+
+    def close(self):
+        """
+        Flush and release the sink.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return (f'<Nimba.{type(self).__name__} written={self.written} '
+                f'failed={self.failed}>')
+
+
+class _FileSink(ResultSink):
+    """
+    Sink writing to a text file, opened from a path or given open.
+    """
+    def __init__(self, target, append=False):
+        """
+        Open the sink
+
+        :param target: Path of the file, or a text file open for writing
+        :param bool append: Append to the file instead of truncating it
+        """
+        super().__init__()
+        if isinstance(target, (str, os.PathLike)):
+            self.file = open(target, 'a' if append else 'w',  # pylint: disable=consider-using-with
+                             newline='', encoding='utf-8')
+            self._owned = True
+        else:
+            self.file = target
+            self._owned = False
+
+    def _write(self, result):
+        raise NotImplementedError
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self._owned:
+            self.file.close()
+        else:
+            self.flush()
+
+
+class NDJSONSink(_FileSink):
+    """
+    Write every result as a JSON line.
+    """
+    def _write(self, result):
+        self.file.write(json.dumps(result.as_dict(), separators=(',', ':')))
+        self.file.write('\n')
+
+
+class CSVSink(_FileSink):
+    """
+    Write every result as a CSV row, with a header row.
+    """
+    def __init__(self, target, append=False):
+        """
+        Open the sink
+
+        :param target: Path of the file, or a text file open for writing
+        :param bool append: Append to the file instead of truncating it,
+                            the header is only written to an empty file
+        """
+        super().__init__(target, append)
+        self._writer = csv.writer(self.file)
+        if not append or self.file.tell() == 0:
+            self._writer.writerow(FIELDS)
+
+    def _write(self, result):
+        self._writer.writerow(result.as_tuple())
+
+
+class SQLiteSink(ResultSink):
+    """
+    Insert every result in a SQLite table.
+
+    Rows are inserted by batches of batch_size in one transaction, the
+    table can then be queried, such as the failures to send again:
+
+        SELECT chunk_index FROM send_results WHERE error_code IS NOT NULL
+    """
+    def __init__(self, path, table='send_results', batch_size=1000):
+        """
+        Open the sink, creating the table if needed
+
+        :param str path: Path of the SQLite file
+        :param str table: Name of the table
+        :param int batch_size: Results inserted per transaction
+        """
+        if not table.isidentifier():
+            raise ValueError(f'Invalid table name: {table!r}')
+        if batch_size < 1:
+            raise ValueError(batch_size)
+        super().__init__()
+        self.path = path
+        self.table = table
+        self.batch_size = batch_size
+        self._batch = []
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} ('
+            'chunk_index INTEGER, status_code INTEGER, message_id TEXT, '
+            'error_code TEXT)')
+        self._db.commit()
+        self._insert = (f'INSERT INTO {table} (chunk_index, status_code, '
+                        'message_id, error_code) VALUES (?, ?, ?, ?)')
+
+    def _write(self, result):
+        self._batch.append(result.as_tuple())
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._batch:
+            with self._db:
+                self._db.executemany(self._insert, self._batch)
+            self._batch = []
+
+    def close(self):
+        self.flush()
+        self._db.close()
@@ -0,0 +1,242 @@
+"""
+A Nimba SMS retry engine.
+
+This module contains the retry policies applied by Client to the API calls.
+
+Dependencies
+-----------
+requests : A library for HTTP Request, its errors are retried once it is
+           loaded
+
+class
+---------
+RetryPolicy : How a request is retried.
+Retry : Retry engine with per-endpoint policies and idempotency keys.
+"""
+
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from nimbasms.execptions import NimbaSMSConnectionError, NimbaSMSTimeout
+from nimbasms.rest import IDEMPOTENCY_HEADER
+
+
+def _transport_errors():
+    """
+    Connection errors and timeouts of the transports.
+
+    The requests exceptions are only added once requests is imported: one
+    of them cannot be raised before, and the lean transports never load it.
+    """
+    errors = (NimbaSMSConnectionError, NimbaSMSTimeout)
+    exceptions = sys.modules.get('requests.exceptions')
+    if exceptions is None:
+        return errors
+    return errors + (exceptions.ConnectionError, exceptions.Timeout)
+
+
+class RetryPolicy:  # pylint: disable=too-many-instance-attributes
+    """
+    Retry a request with exponential backoff and full jitter.
+
+    A request is retried on connection errors, timeouts and the statuses
+    of retry_statuses. Requests which are not idempotent, a POST without
+    idempotency key, are only retried on statuses telling the request was
+    not processed (429 and 503), since a timeout leaves unknown whether the
+    server handled it.
+    """
+    def __init__(self, max_attempts=3, backoff_factor=0.5, backoff_max=30.0,
+                 jitter=True, retry_statuses=(429, 500, 502, 503, 504),
+                 retry_exceptions=None,
+                 respect_retry_after=True):
+        """
+        Initialize the policy
+
+        :param int max_attempts: Maximum number of attempts, 1 disables retry
+        :param float backoff_factor: Delay in seconds before the first retry
+        :param float backoff_max: Maximum delay between two attempts, a
+                                  Retry-After longer than it stops the
+                                  retries
+        :param bool jitter: Draw the delay between 0 and the backoff
+        :param tuple retry_statuses: HTTP statuses to retry
+        :param tuple retry_exceptions: Exceptions of the transport to retry,
+                                       the connection errors and timeouts
+                                       of the transports by default
+        :param bool respect_retry_after: Wait the Retry-After header of 429
+                                         and 503 responses
+        """
+        if max_attempts < 1:
+            raise ValueError('max_attempts must be positive Integer')
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_exceptions = retry_exceptions
+        self.respect_retry_after = respect_retry_after
+
+    @property
+    def retry_exceptions(self):
+        """
+        Exceptions of the transport to retry
+        """
+        if self._retry_exceptions is None:
+            return _transport_errors()
+        return self._retry_exceptions
+
+    @retry_exceptions.setter
+    def retry_exceptions(self, value):
+        self._retry_exceptions = tuple(value) if value is not None else None
+
+    def should_retry(self, attempt, idempotent, response=None, error=None):
+        """
+        Tell whether the attempt should be retried.
+
+        :param int attempt: Number of the attempt done, starting at 1
+        :param bool idempotent: The request can be sent twice safely
+        :param Response response: Response received
+        :param Exception error: Exception raised by the transport
+        """
+        if attempt >= self.max_attempts:
+            return False
+        if error is not None:
+            return idempotent and isinstance(error, self.retry_exceptions)
+        status = response.status_code
+        if status not in self.retry_statuses:
+            return False
+        if not idempotent and status not in (429, 503):
+            return False
+        retry_after = self._retry_after(response)
+        return retry_after is None or retry_after <= self.backoff_max
+
+    def backoff(self, attempt, response=None):
+        """
+        Delay in seconds before the next attempt.
+
+        The Retry-After of a 429 or 503 response is returned as is, even
+        above backoff_max: should_retry stops the retries in that case.
+
+        :param int attempt: Number of the attempt done, starting at 1
+        :param Response response: Response received, if any
+        """
+        retry_after = self._retry_after(response)
+        if retry_after is not None:
+            return retry_after
+        delay = min(self.backoff_max, self.backoff_factor * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def _retry_after(self, response):
+        if (self.respect_retry_after and response is not None
+                and response.status_code in (429, 503)):
+            return parse_retry_after(response.headers)
+        return None
+
+
+def parse_retry_after(headers):
+    """
+    Read the Retry-After header, in seconds or as an HTTP date. A date
+    without timezone is read as UTC.
+
+    :param dict headers: Response headers
+    :returns: Delay in seconds or None
+    """
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+class Retry:
+    """
+    Retry engine used by Client.
+
+    Policies are selected per endpoint with (method, path) keys, a path
+    also matches its sub paths. POST requests to idempotent_endpoints get a
+    client-generated Idempotency-Key header, the same key is sent on every
+    attempt so that the API can drop duplicates.
+    """
+    def __init__(self, default=None, policies=None,
+                 idempotent_endpoints=(('POST', '/v1/messages'),
+                                       ('POST', '/v1/contacts')),
+                 sleep=time.sleep):
+        """
+        Initialize the retry engine
+
+        :param RetryPolicy default: Policy of the endpoints without policy
+        :param dict policies: RetryPolicy by (method, path)
+        :param tuple idempotent_endpoints: (method, path) getting a key
+        :param sleep: Function used to wait between attempts
+        """
+        self.default = default or RetryPolicy()
+        self.policies = dict(policies or {})
+        self.idempotent_endpoints = frozenset(idempotent_endpoints)
+        self.sleep = sleep
+
+    def policy_for(self, method, path):
+        """
+        Policy of an endpoint.
+
+        :param str method: HTTP Method
+        :param str path: Path of the url
+        """
+        method = method.upper()
+        while path:
+            policy = self.policies.get((method, path))
+            if policy is not None:
+                return policy
+            path = path.rpartition('/')[0]
+        return self.default
+
+    def call(self, send, method, uri, headers, on_retry=None):
+        """
+        Send a request, retrying it according to its policy.
+
+        :param send: Callable sending the request with the headers given
+        :param str method: HTTP Method
+        :param str uri: Fully qualified url
+        :param dict headers: HTTP Headers, an idempotency key may be added
+        :param on_retry: Callable(method, uri, attempt, delay) called before
+                         every retry
+
+        :returns: Response from the Nimba API
+        """
+        method = method.upper()
+        path = urlsplit(uri).path.rstrip('/')
+        if (method, path) in self.idempotent_endpoints:
+            headers.setdefault(IDEMPOTENCY_HEADER, uuid.uuid4().hex)
+        idempotent = method in ('GET', 'HEAD') or IDEMPOTENCY_HEADER in headers
+        policy = self.policy_for(method, path)
+
+        attempt = 1
+        while True:
+            try:
+                response = send(headers)
+            except policy.retry_exceptions as exc:  # pylint: disable=catching-non-exception
+                if not policy.should_retry(attempt, idempotent, error=exc):
+                    raise
+                delay = policy.backoff(attempt)
+            else:
+                if not policy.should_retry(attempt, idempotent, response=response):
+                    return response
+                delay = policy.backoff(attempt, response)
+            if on_retry is not None:
+                on_retry(method, uri, attempt, delay)
+            self.sleep(delay)
+            attempt += 1
@@ -0,0 +1,281 @@
+"""
+A Nimba SMS sharded sender.
+
+This module contains the sending of very large campaigns with a pool of
+processes: the recipients are partitioned in batches, every worker process
+normalizes and splits its batches in requests and sends them with its own
+pooled Client and a pool of threads, under a rate limit shared by all the
+workers.
+
+Dependencies
+-----------
+concurrent.futures : Default library process pool
+fcntl : Default library file locks, for the shared rate limit (POSIX only)
+
+class
+---------
+ShardReport : Merged report of a sharded send.
+ShardedSender : Sender using every core of the host.
+"""
+
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from nimbasms import Client
+from nimbasms.bulk import chunked, imap_bounded
+from nimbasms.ratelimit import FileTokenBucket, RateLimiter
+from nimbasms.recipients import normalizer_for
+from nimbasms.rest import DEFAULT_BASE_URL
+
+# State of a worker process, set by _init_worker.
+_worker = {}
+
+
+class ShardReport:
+    """
+    Merged report of a sharded send.
+
+    :param int requests: Requests sent
+    :param int sent: Recipients of the requests accepted by the API
+    :param int failed: Recipients of the requests which failed
+    :param list failures: Tuples (index, to, status_code, error) of the
+                          failed requests, status_code is None when no
+                          response was received
+    :param float elapsed: Duration of the send in seconds
+    """
+    __slots__ = ('requests', 'sent', 'failed', 'failures', 'elapsed')
+
+    def __init__(self):
+        self.requests = 0
+        self.sent = 0
+        self.failed = 0
+        self.failures = []
+        self.elapsed = 0.0
+
+    def merge(self, requests, sent, failures):
+        """
+        Add the result of a batch.
+        """
+        self.requests += requests
+        self.sent += sent
+        self.failed += sum(len(failure[1]) for failure in failures)
+        self.failures.extend(failures)
+
+    @property
+    def rate(self):
+        """
+        Recipients accepted per second
+        """
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f'<Nimba.ShardReport requests={self.requests} sent={self.sent} '
+                f'failed={self.failed} elapsed={self.elapsed:.1f}s>')
+
+
+def _make_client(account_sid, access_token, base_url, retry, rate_limit,
+                 threads):
+    """
+    Client of a worker process.
+    """
+    from nimbasms.http import NimbaHttpClient  # pylint: disable=import-outside-toplevel
+    rate_limiter = None
+    if rate_limit is not None:
+        path, rate, capacity = rate_limit
+        rate_limiter = RateLimiter(FileTokenBucket(path, rate, capacity))
+    client = Client(account_sid, access_token, retry=retry,
+                    rate_limiter=rate_limiter, base_url=base_url)
+    client.http_client = NimbaHttpClient(pool_maxsize=threads)
+    return client
+
+
+def _init_worker(options, sender_name, threads, normalizer=None,
+                 chunk_size=None, report_invalid=False):
+    _worker['client'] = _make_client(**options)
+    _worker['sender_name'] = sender_name
+    _worker['threads'] = threads
+    _worker['normalizer'] = normalizer
+    _worker['chunk_size'] = chunk_size
+    _worker['report_invalid'] = report_invalid
+
+
+def _send_numbers(job):
+    """
+    Normalize a batch of recipients, split it in requests and send them
+    from a worker process.
+
+    :param tuple job: (first index, message, recipients)
+
+    :returns: Tuple (requests, sent, failures, invalid)
+    """
+    start, message, numbers = job
+    invalid = []
+    normalizer = _worker['normalizer']
+    if normalizer is not None:
+        recipients = normalizer.process(numbers)
+        numbers = recipients.valid
+        if _worker['report_invalid']:
+            invalid = recipients.invalid
+    requests = [(index, message, to) for index, to in
+                enumerate(chunked(numbers, _worker['chunk_size']), start)]
+    return _send_batch(requests) + (invalid,)
+
+
+def _send_batch(batch):
+    """
+    Send a batch of (index, message, to) requests from a worker process.
+
+    :returns: Tuple (requests, sent, failures)
+    """
+    client = _worker['client']
+    sender_name = _worker['sender_name']
+
+    def send(request):
+        index, message, to = request
+        try:
+            response = client.messages.create(to, sender_name, message)
+        except Exception as exc:  # pylint: disable=broad-except
+            return index, to, None, repr(exc)
+        if response.ok:
+            return index, to, response.status_code, None
+        return index, to, response.status_code, response.text
+
+    sent = 0
+    failures = []
+    for index, to, status_code, error in imap_bounded(
+            send, batch, max_workers=_worker['threads']):
+        if error is None:
+            sent += len(to)
+        else:
+            failures.append((index, to, status_code, error))
+    return len(batch), sent, failures
+
+
+class ShardedSender:  # pylint: disable=too-many-instance-attributes
+    """
+    Send large campaigns with a pool of processes.
+
+    The recipients are split in batches of batch_size * chunk_size numbers
+    sent to the worker processes, which normalize them and split them in
+    requests of chunk_size numbers: the parent process only reads the
+    stream. Every worker has its own Client, with a pool of threads
+    connections, and sends its batches with threads requests in flight. With rate, every
+    worker takes a token of a FileTokenBucket before each request, so the
+    whole pool stays under rate requests per second.
+
+    At most 2 * processes batches are in flight, the recipients stream is
+    consumed lazily. The workers return counters and the failed requests
+    only, which are merged in a ShardReport.
+    """
+    def __init__(self, account_sid, access_token, processes=None, threads=8,
+                 rate=None, burst=None, chunk_size=100, batch_size=20,
+                 retry=None, base_url=DEFAULT_BASE_URL):
+        """
+        Initialize the sender
+
+        :param str account_sid: Account SID
+        :param str access_token: Account Token
+        :param int processes: Worker processes, the number of cores by default
+        :param int threads: Requests in flight per worker
+        :param float rate: Requests per second of all the workers together
+        :param float burst: Maximum burst of requests, rate by default
+        :param int chunk_size: Maximum recipients per request
+        :param int batch_size: Requests per batch sent to a worker
+        :param Retry retry: Retry engine of the workers
+        :param str base_url: Root url of the API
+        """
+        self.account_sid = account_sid
+        self.access_token = access_token
+        self.processes = processes or os.cpu_count() or 1
+        self.threads = threads
+        self.rate = rate
+        self.burst = burst
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.retry = retry
+        self.base_url = base_url
+
+    def __repr__(self):
+        return f'<Nimba.ShardedSender processes={self.processes}>'
+
+    def send(self, to, sender_name, message, normalize=False, on_invalid=None):
+        """
+        Send the same message to a large stream of recipients.
+
+        The recipients are normalized by the workers, so duplicates are
+        only dropped within a batch of batch_size * chunk_size recipients.
+        The index of a request is batch_size times the index of its batch
+        plus its position in the batch.
+
+        :param iterable to: Recipients, consumed lazily
+        :param str sender_name: Sender Name, is Sensitive Case
+        :param str message: Text message
+        :param normalize: Normalize and deduplicate the recipients, True or
+                          a RecipientNormalizer
+        :param on_invalid: Callable(entry, reason) of the recipients dropped
+                           by the normalization, called by this process
+
+        :returns: ShardReport
+        """
+        jobs = ((index * self.batch_size, message, numbers) for index, numbers in
+                enumerate(chunked(to, self.batch_size * self.chunk_size)))
+        initargs = (sender_name, self.threads, normalizer_for(normalize),
+                    self.chunk_size, on_invalid is not None)
+
+        def merge(report, result):
+            requests, sent, failures, invalid = result
+            report.merge(requests, sent, failures)
+            for entry, reason in invalid:
+                on_invalid(entry, reason)
+
+        return self._run(_send_numbers, jobs, initargs, merge)
+
+    def send_groups(self, groups, sender_name):
+        """
+        Send requests of different texts, such as the plan of a Campaign.
+
+        :param iterable groups: Tuples (message, to), consumed lazily
+        :param str sender_name: Sender Name, is Sensitive Case
+
+        :returns: ShardReport
+        """
+        requests = ((index, message, to)
+                    for index, (message, to) in enumerate(groups))
+        return self._run(_send_batch, chunked(requests, self.batch_size),
+                         (sender_name, self.threads),
+                         lambda report, result: report.merge(*result))
+
+    def _run(self, func, jobs, initargs, merge):
+        """
+        Run func on the jobs in the worker processes, merging the results.
+        """
+        report = ShardReport()
+        started = time.monotonic()
+        rate_limit = None
+        path = None
+        if self.rate is not None:
+            fd, path = tempfile.mkstemp(prefix='nimbasms-', suffix='.bucket')
+            os.close(fd)
+            rate_limit = (path, self.rate, self.burst)
+        options = {
+            'account_sid': self.account_sid,
+            'access_token': self.access_token,
+            'base_url': self.base_url,
+            'retry': self.retry,
+            'rate_limit': rate_limit,
+            'threads': self.threads,
+        }
+        try:
+            with ProcessPoolExecutor(
+                    max_workers=self.processes, initializer=_init_worker,
+                    initargs=(options,) + initargs) as executor:
+                for result in imap_bounded(func, jobs, max_workers=self.processes,
+                                           executor=executor):
+                    merge(report, result)
+        finally:
+            if path is not None:
+                os.remove(path)
+            report.elapsed = time.monotonic() - started
+        return report
@@ -0,0 +1,314 @@
+"""
+A Nimba SMS streaming JSON parser.
+
+This module contains the incremental parsing of list pages: the items of
+the results array are decoded one at a time while the body is received,
+so the whole page is never held in memory.
+
+Dependencies
+-----------
+json : Default library JSON decoder
+
+class
+---------
+StreamedResponse : Response whose body is read while it is parsed.
+StreamedPage : List page parsed incrementally.
+"""
+
+import codecs
+import json
+import json.scanner
+import re
+from collections import deque
+
+from nimbasms.execptions import NimbaSMSException
+
+CHUNK_SIZE = 65536
+
+_SPACES = ' \t\n\r'
+_WHITESPACE = re.compile(f'[{_SPACES}]*')
+_NUMBER_TAIL = re.compile(r'[0-9eE+.\-]*')
+
+
+class _Scanner:
+    """
+    Read JSON tokens and values from a stream of byte chunks.
+
+    Only the text not parsed yet is buffered: a value is decoded as soon
+    as it is complete, the buffer then drops it on the next read.
+    """
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._scan = json.scanner.make_scanner(json.JSONDecoder())
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """
+        Read the next chunk of the body, False when it is exhausted.
+        """
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        try:
+            if chunk is None:
+                self._eof = True
+                text = self._text.decode(b'', final=True)
+            else:
+                text = self._text.decode(chunk)
+        except UnicodeDecodeError as exc:
+            raise NimbaSMSException(f'Invalid JSON body: {exc}') from exc
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """
+        Next character which is not whitespace, not consumed.
+        """
+        buffer, pos = self._buffer, self._pos
+        # Compact JSON has no whitespace between the tokens.
+        if pos < len(buffer) and buffer[pos] not in _SPACES:
+            return buffer[pos]
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise NimbaSMSException('Unexpected end of the JSON body')
+
+    def char(self):
+        """
+        Next character which is not whitespace, consumed.
+        """
+        char = self.peek()
+        self._pos += 1
+        return char
+
+    def value(self):
+        """
+        Decode the next JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._scan(self._buffer, self._pos)
+            except (ValueError, StopIteration) as exc:
+                if not self._fill():
+                    raise NimbaSMSException(
+                        f'Invalid JSON body at character {self._pos}') from exc
+                continue
+            # A number followed by number characters up to the end of the
+            # buffer may go on in the next chunk, such as 12. then 5.
+            if (type(value) not in (int, float)
+                    or _NUMBER_TAIL.match(self._buffer, end).end() < len(self._buffer)
+                    or not self._fill()):
+                self._pos = end
+                return value
+
+
+def _expect(scanner, expected):
+    char = scanner.char()
+    if char not in expected:
+        raise NimbaSMSException(
+            f'Invalid JSON body: expected {expected!r}, got {char!r}')
+    return char
+
+
+def iter_members(chunks, array_key='results'):
+    """
+    Parse a JSON object incrementally.
+
+    :param iterable chunks: Bytes of the body
+    :param str array_key: Member whose array items are yielded one by one
+
+    :returns: Generator of tuples (key, value) for the members of the
+              object, and (None, item) for every item of array_key
+    """
+    scanner = _Scanner(chunks)
+    _expect(scanner, '{')
+    if scanner.peek() == '}':
+        return
+    while True:
+        key = scanner.value()
+        if not isinstance(key, str):
+            raise NimbaSMSException('Invalid JSON body: expected a key')
+        _expect(scanner, ':')
+        if key == array_key and scanner.peek() == '[':
+            scanner.char()
+            if scanner.peek() == ']':
+                scanner.char()
+            else:
+                while True:
+                    yield None, scanner.value()
+                    if _expect(scanner, ',]') == ']':
+                        break
+        else:
+            yield key, scanner.value()
+        if _expect(scanner, ',}') == '}':
+            return
+
+
+class StreamedPage:
+    """
+    A list page parsed while it is received.
+
+    Iterating yields the items of results one at a time, once: a page can
+    only be iterated one time. count, next and previous are members of the
+    page around results. The API sends them first, so they are available
+    before the first item is decoded. A member sent after results is read
+    when it is accessed, the items passed over are then kept until they
+    are iterated.
+
+    The connection is released when the page is exhausted or closed.
+    """
+    def __init__(self, chunks, close=None, array_key='results'):
+        """
+        Initialize the page
+
+        :param iterable chunks: Bytes of the body
+        :param close: Callable releasing the connection
+        :param str array_key: Member holding the items
+        """
+        self._members = iter_members(chunks, array_key)
+        self._close = close
+        self._items = deque()
+        self._done = False
+        self.members = {}
+
+    def _advance(self):
+        """
+        Parse the next member or item, False at the end of the page.
+        """
+        try:
+            key, value = next(self._members)
+        except StopIteration:
+            self.close()
+            return False
+        if key is None:
+            self._items.append(value)
+        else:
+            self.members[key] = value
+        return True
+
+    def member(self, name, default=None):
+        """
+        Value of a member of the page, other than the items.
+
+        :param str name: Key of the member
+        :param default: Value when the page has no such member
+        """
+        while name not in self.members and not self._done:
+            self._advance()
+        return self.members.get(name, default)
+
+    @property
+    def count(self):
+        """
+        Number of items of the whole list
+        """
+        return self.member('count')
+
+    @property
+    def next(self):
+        """
+        Url of the next page, None on the last page
+        """
+        return self.member('next')
+
+    @property
+    def previous(self):
+        """
+        Url of the previous page, None on the first page
+        """
+        return self.member('previous')
+
+    def __iter__(self):
+        items = self._items
+        while True:
+            while items:
+                yield items.popleft()
+            if self._done or not self._advance():
+                return
+
+    def items(self, record_class=None):
+        """
+        Iterate over the items of the page.
+
+        :param type record_class: Yield records of this class instead of dicts
+        """
+        if record_class is None:
+            return iter(self)
+        return (record_class.from_dict(item) for item in self)
+
+    def close(self):
+        """
+        Stop the parsing and release the connection.
+        """
+        if self._done:
+            return
+        self._done = True
+        self._members.close()
+        if self._close is not None:
+            self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f'<Nimba.StreamedPage count={self.members.get("count")}>'
+
+
+class StreamedResponse:
+    """
+    Successful response whose body is read from the connection while it
+    is parsed, returned by the stream method of the transports.
+
+    Error responses are returned as a Response with the whole body, so
+    that they are handled as usual.
+    """
+    cached = False
+
+    def __init__(self, status_code, chunks, headers=None, close=None):
+        """
+        Initialize the response
+
+        :param int status_code: HTTP status
+        :param iterable chunks: Bytes of the body, read lazily
+        :param headers: HTTP headers
+        :param close: Callable releasing the connection
+        """
+        self.status_code = status_code
+        self.headers = headers
+        self.ok = status_code < 400
+        self._chunks = chunks
+        self._close = close
+
+    def page(self, array_key='results'):
+        """
+        Parse the body as a list page.
+
+        :param str array_key: Member holding the items
+
+        :returns: StreamedPage
+        """
+        if self._chunks is None:
+            raise NimbaSMSException('The body of the response was already read')
+        chunks, self._chunks = self._chunks, None
+        return StreamedPage(chunks, self._close, array_key)
+
+    def close(self):
+        """
+        Release the connection without reading the body.
+        """
+        self._chunks = None
+        if self._close is not None:
+            self._close()
+
+    def __repr__(self):
+        return f'HTTP {self.status_code} <streamed>'
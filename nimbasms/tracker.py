@@ -0,0 +1,268 @@
+"""
+A Nimba SMS delivery status tracker.
+
+This module contains a tracker polling the status of many messages with
+a bounded pool of threads, backing off on messages whose status does not
+change and answering many messages with one list page when possible.
+
+Dependencies
+-----------
+concurrent.futures : Default library thread pool
+
+class
+---------
+StatusChange : Status change of one message.
+StatusTracker : Poller of the delivery status of messages.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from nimbasms import _logger
+from nimbasms.bulk import imap_bounded
+from nimbasms.pagination import PageIterator
+
+TERMINAL_STATUSES = frozenset(('received', 'failure'))
+
+StatusChange = namedtuple('StatusChange',
+                          ['messageid', 'previous', 'status', 'message'])
+StatusChange.__doc__ = """
+Status change of one tracked message.
+
+:param str messageid: Id message
+:param str previous: Status known before, None at the first poll
+:param str status: New status
+:param dict message: Message returned by the API
+"""
+
+
+class _Tracked:
+    """
+    Polling state of one message.
+    """
+    __slots__ = ('status', 'interval', 'due')
+
+    def __init__(self, interval, due):
+        self.status = None
+        self.interval = interval
+        self.due = due
+
+
+class StatusTracker:  # pylint: disable=too-many-instance-attributes
+    """
+    Poll the delivery status of messages until they reach a terminal status.
+
+    A message is polled again after min_interval seconds when its status
+    changed, the delay is multiplied by backoff up to max_interval while it
+    stays the same. Messages reaching a terminal status are not polled
+    anymore. A message id tracked twice is polled once.
+
+    When at least scan_threshold messages are due, the first pages of the
+    messages list are read before retrieving messages one by one: recent
+    messages are answered by a page of scan_limit items with one request.
+    Messages not found in the pages are retrieved by the pool of threads.
+
+    Changes are given to on_change and yielded by changes().
+    """
+    def __init__(self, client, on_change=None, terminal_statuses=TERMINAL_STATUSES,
+                 min_interval=2.0, max_interval=60.0, backoff=2.0,
+                 max_workers=8, scan_threshold=20, scan_limit=100,
+                 max_scan_pages=10, clock=time.monotonic):
+        """
+        Initialize the tracker
+
+        :param Client client: Nimba SMS Client
+        :param on_change: Callable taking a StatusChange, called by poll()
+        :param frozenset terminal_statuses: Statuses ending the polling
+        :param float min_interval: Seconds between two polls of a message
+        :param float max_interval: Maximum seconds between two polls
+        :param float backoff: Factor of the delay while a status is unchanged
+        :param int max_workers: Number of retrieve requests in flight
+        :param int scan_threshold: Messages due to read the list pages, 0
+                                   disables the scan
+        :param int scan_limit: Items per list page
+        :param int max_scan_pages: Maximum list pages read by poll
+        :param clock: Monotonic clock
+        """
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError('Intervals must satisfy 0 < min_interval <= max_interval')
+        self.client = client
+        self.on_change = on_change
+        self.terminal_statuses = frozenset(terminal_statuses)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_workers = max_workers
+        self.scan_threshold = scan_threshold
+        self.scan_limit = scan_limit
+        self.max_scan_pages = max_scan_pages
+        self.clock = clock
+        self.statuses = {}
+        self._tracked = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<Nimba.StatusTracker tracked={len(self)}>'
+
+    def __len__(self):
+        """
+        Number of messages still polled
+        """
+        return len(self._tracked)
+
+    def track(self, messageids):
+        """
+        Start polling messages, ids already tracked or final are ignored.
+
+        :param iterable messageids: Ids message
+        """
+        now = self.clock()
+        with self._lock:
+            for messageid in messageids:
+                if messageid not in self._tracked and messageid not in self.statuses:
+                    self._tracked[messageid] = _Tracked(self.min_interval, now)
+
+    def untrack(self, messageid):
+        """
+        Stop polling a message.
+
+        :param str messageid: Id message
+        """
+        with self._lock:
+            self._tracked.pop(messageid, None)
+
+    def next_due(self):
+        """
+        Seconds before a message is due, None when nothing is tracked.
+        """
+        with self._lock:
+            if not self._tracked:
+                return None
+            due = min(state.due for state in self._tracked.values())
+        return max(0.0, due - self.clock())
+
+    def poll(self):
+        """
+        Poll the messages which are due once.
+
+        :returns: List of StatusChange
+        """
+        now = self.clock()
+        with self._lock:
+            due = {messageid for messageid, state in self._tracked.items()
+                   if state.due <= now}
+        if not due:
+            return []
+
+        found = {}
+        if self.scan_threshold and len(due) >= self.scan_threshold:
+            found = self._scan(due)
+
+        def retrieve(messageid):
+            try:
+                response = self.client.messages.retrieve(messageid)
+            except Exception:  # pylint: disable=broad-except
+                return messageid, None
+            if not response.ok or not isinstance(response.data, dict):
+                return messageid, None
+            return messageid, response.data
+
+        missing = due.difference(found)
+        found.update(imap_bounded(retrieve, missing, max_workers=self.max_workers))
+        return self._update(found)
+
+    def _scan(self, due):
+        """
+        Read the first list pages, keeping the messages which are due.
+
+        The scan stops as soon as a page gives nothing new, so the pages
+        are not prefetched. A failed scan is logged and the messages it did
+        not find are retrieved one by one.
+        """
+        found = {}
+        uri = f'{self.client.messages.base_url}/v1/messages'
+        pages = PageIterator(self.client, uri,
+                             {'limit': self.scan_limit, 'offset': 0},
+                             prefetch=False)
+        try:
+            for number, page in enumerate(pages, 1):
+                hits = 0
+                for message in page.data['results']:
+                    if message.get('messageid') in due:
+                        found[message['messageid']] = message
+                        hits += 1
+                if len(found) == len(due) or number >= self.max_scan_pages:
+                    break
+                if not hits and found:
+                    break
+        except Exception:  # pylint: disable=broad-except
+            logger = getattr(self.client.http_client, 'logger', _logger)
+            logger.warning('Status scan of the message list failed',
+                           exc_info=True)
+        return found
+
+    def _update(self, found):
+        """
+        Record the answers of a poll and reschedule the messages.
+        """
+        changes = []
+        now = self.clock()
+        with self._lock:
+            for messageid, message in found.items():
+                state = self._tracked.get(messageid)
+                if state is None:
+                    continue
+                status = message.get('status') if message is not None else None
+                if status is None or status == state.status:
+                    state.interval = min(self.max_interval,
+                                         state.interval * self.backoff)
+                else:
+                    changes.append(StatusChange(messageid, state.status,
+                                                status, message))
+                    state.status = status
+                    state.interval = self.min_interval
+                if status in self.terminal_statuses:
+                    del self._tracked[messageid]
+                    self.statuses[messageid] = status
+                else:
+                    state.due = now + state.interval
+        if self.on_change is not None:
+            for change in changes:
+                self.on_change(change)
+        return changes
+
+    def changes(self, timeout=None, stop=None):
+        """
+        Poll until every message reaches a terminal status, yielding the
+        status changes.
+
+        :param float timeout: Seconds before giving up, None to wait forever
+        :param threading.Event stop: Event stopping the polling
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            yield from self.poll()
+            delay = self.next_due()
+            if delay is None:
+                return
+            if deadline is not None:
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    return
+                delay = min(delay, remaining)
+            stop.wait(delay)
+
+    def run(self, timeout=None, stop=None):
+        """
+        Poll until every message reaches a terminal status.
+
+        :param float timeout: Seconds before giving up, None to wait forever
+        :param threading.Event stop: Event stopping the polling
+
+        :returns: Terminal status by id message
+        """
+        for _ in self.changes(timeout, stop):
+            pass
+        return dict(self.statuses)
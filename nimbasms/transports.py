@@ -0,0 +1,332 @@
+"""
+A Nimba SMS alternative transports.
+
+This module contains HttpClient backends which can be given to Client in
+place of the default NimbaHttpClient:
+
+    client = Client(ACCOUNT_SID, AUTH_TOKEN, http_client=Urllib3HttpClient())
+
+Dependencies
+-----------
+urllib3 : The connection pool used by requests, for Urllib3HttpClient
+httpx : Optional, an HTTP/2 capable library, for Http2Client
+        (pip install nimbasms[http2])
+
+class
+---------
+Urllib3HttpClient : Lean HTTP Client on a urllib3 connection pool.
+Http2Client : HTTP Client multiplexing the requests over HTTP/2.
+"""
+
+import threading
+import time
+from base64 import b64encode
+from itertools import count
+from urllib.parse import urlencode
+
+import urllib3
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from nimbasms import HttpClient, Response, _logger
+from nimbasms.execptions import (NimbaSMSConnectionError, NimbaSMSException,
+                                 NimbaSMSTimeout)
+from nimbasms.instrumentation import RequestContext, RequestLogging
+from nimbasms.streaming import CHUNK_SIZE, StreamedResponse
+
+# Set by the tracking pools when the current thread opens a connection.
+_connections = threading.local()
+
+
+class _TrackingHTTPConnectionPool(HTTPConnectionPool):
+    """
+    Connection pool flagging the thread which opens a new connection.
+    """
+    def _new_conn(self):
+        _connections.opened = True
+        return super()._new_conn()
+
+
+class _TrackingHTTPSConnectionPool(HTTPSConnectionPool):
+    """
+    Connection pool flagging the thread which opens a new connection.
+    """
+    def _new_conn(self):
+        _connections.opened = True
+        return super()._new_conn()
+
+
+def _basic_auth(auth):
+    user, password = auth
+    credentials = b64encode(f'{user}:{password}'.encode('latin1'))
+    return f"Basic {credentials.decode('ascii')}"
+
+
+def _encode(url, params, data, headers, auth):
+    """
+    Encode the url and the form body the way requests does, lists giving
+    repeated keys.
+    """
+    if params:
+        separator = '&' if '?' in url else '?'
+        url = f'{url}{separator}{urlencode(params, doseq=True)}'
+    body = urlencode(data, doseq=True) if data else None
+    headers = dict(headers or {})
+    if body is not None and 'Content-Type' not in headers:
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    if auth is not None:
+        headers['Authorization'] = _basic_auth(auth)
+    return url, body, headers
+
+
+def _closer(response):
+    """
+    Release the connection of a streamed response, closing it first when
+    the body was not read to the end.
+    """
+    def close():
+        if not response.closed:
+            response.close()
+        response.release_conn()
+    return close
+
+
+class _MeasuredClient(RequestLogging, HttpClient):
+    """
+    Instruments and logs shared by the transports of this module.
+    """
+    def __init__(self, timeout, logger, log_sample_rate, instruments):
+        if timeout is not None and timeout <= 0:
+            raise ValueError(timeout)
+        if log_sample_rate is not None and log_sample_rate < 1:
+            raise ValueError(log_sample_rate)
+        self.timeout = timeout
+        self.logger = logger
+        self.log_sample_rate = log_sample_rate
+        self._log_counter = count()
+        self.instruments = list(instruments or [])
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                auth=None, timeout=None):
+        """
+        Make an HTTP Request with paramters provided.
+
+        :param str method: The HTTP method to use
+        :param str url: The URL to request
+        :param dict params: Query parameters to append to the URL
+        :param dict data: Paramters to go in the body of the HTTP request
+        :param dict headers: HTTP Headers to send with the request
+        :param tuple auth: Basic Auth arguments
+        :param float timeout: Socket/Read timeout for the request
+
+        :return: An http response
+        """
+        return self._call(method, url, params, data, headers, auth, timeout,
+                          stream=False)
+
+    def stream(self, method, url, params=None, headers=None, auth=None,
+               timeout=None):
+        """
+        Make an HTTP Request whose body is read while it is parsed.
+
+        :param str method: The HTTP method to use
+        :param str url: The URL to request
+        :param dict params: Query parameters to append to the URL
+        :param dict headers: HTTP Headers to send with the request
+        :param tuple auth: Basic Auth arguments
+        :param float timeout: Socket/Read timeout for the request
+
+        :return: A StreamedResponse, or a Response for an error status
+        """
+        return self._call(method, url, params, None, headers, auth, timeout,
+                          stream=True)
+
+    def _call(self, method, url, params, data, headers, auth, timeout, stream):
+        if timeout is not None and timeout <= 0:
+            raise ValueError(timeout)
+        method = method.upper()
+        if self.log_sample_rate is None:
+            self._log_request({'method': method, 'url': url, 'params': params,
+                               'headers': headers})
+        url, body, headers = _encode(url, params, data, headers, auth)
+        timeout = timeout if timeout is not None else self.timeout
+        if not self.instruments and self.log_sample_rate is None:
+            response = self._send(method, url, body, headers, timeout, stream)
+            self._log_response(response)
+            return response
+
+        context = RequestContext(method, url, time.perf_counter())
+        context.bytes_sent = len(body) if body else 0
+        for instrument in self.instruments:
+            instrument.on_request_start(context)
+        _connections.opened = False
+        response = None
+        try:
+            response = self._send(method, url, body, headers, timeout, stream)
+            context.status_code = response.status_code
+            if isinstance(response, StreamedResponse):
+                # The body is not read yet, only its announced length.
+                context.bytes_received = int(
+                    response.headers.get('Content-Length') or 0)
+            else:
+                context.bytes_received = len(response.content)
+            return response
+        except Exception as exc:
+            context.error = exc
+            raise
+        finally:
+            context.elapsed = time.perf_counter() - context.started
+            context.new_connection = self._new_connection()
+            for instrument in self.instruments:
+                instrument.on_request_end(context)
+            if self.log_sample_rate is not None:
+                self._log_sample(context)
+            elif response is not None:
+                self._log_response(response)
+
+    def _send(self, method, url, body, headers, timeout, stream):
+        raise NotImplementedError
+
+    def _new_connection(self):
+        """
+        Whether the last request of the thread opened a connection.
+        """
+        return getattr(_connections, 'opened', None)
+
+
+class Urllib3HttpClient(_MeasuredClient):
+    """
+    HTTP Client sending the requests directly on a urllib3 connection pool.
+
+    It skips the requests Session machinery: no hooks, cookies, netrc or
+    environment lookups, so the per-request overhead is lower. Proxies
+    from the environment are not applied; pass proxy_url instead.
+    Connection errors and timeouts are raised as NimbaSMSConnectionError
+    and NimbaSMSTimeout, retried by the Retry engine; requests is never
+    imported.
+    """
+    def __init__(self, pool_maxsize=10, pool_block=False, timeout=None,
+                 proxy_url=None, logger=_logger, log_sample_rate=None,
+                 instruments=None):
+        """
+        Constructor for the Urllib3HttpClient
+
+        :param int pool_maxsize: Maximum number of connections kept alive
+        :param bool pool_block: Wait for a free connection when the pool is
+                                exhausted instead of opening an extra one
+        :param int timeout: Timeout for the requests.
+                            Timeout should never be zero (0) or less.
+        :param str proxy_url: Url of an HTTP proxy
+        :param logger
+        :param int log_sample_rate: Log one structured line for 1 in N
+                                    requests, and for every error, instead
+                                    of the verbose request and response logs
+        :param list instruments: Instrument hooks called around every request
+        """
+        if pool_maxsize < 1:
+            raise ValueError(pool_maxsize)
+        super().__init__(timeout, logger, log_sample_rate, instruments)
+        options = {'maxsize': pool_maxsize, 'block': pool_block,
+                   'retries': False}
+        if proxy_url is not None:
+            self.pool = urllib3.ProxyManager(proxy_url, **options)
+        else:
+            self.pool = urllib3.PoolManager(**options)
+            self.pool.pool_classes_by_scheme = {
+                'http': _TrackingHTTPConnectionPool,
+                'https': _TrackingHTTPSConnectionPool,
+            }
+
+    def _send(self, method, url, body, headers, timeout, stream):
+        try:
+            response = self.pool.request(
+                method, url, body=body, headers=headers,
+                timeout=timeout if timeout is not None else urllib3.Timeout.DEFAULT_TIMEOUT,
+                redirect=False, preload_content=not stream)
+        except urllib3.exceptions.NewConnectionError as exc:
+            raise NimbaSMSConnectionError(exc) from exc
+        except urllib3.exceptions.TimeoutError as exc:
+            raise NimbaSMSTimeout(exc) from exc
+        except urllib3.exceptions.HTTPError as exc:
+            raise NimbaSMSConnectionError(exc) from exc
+        if stream and response.status < 400:
+            return StreamedResponse(response.status, response.stream(CHUNK_SIZE),
+                                    response.headers, _closer(response))
+        response_data = response.data
+        response.release_conn()
+        return Response(response.status, response_data.decode('utf-8'),
+                        response.headers)
+
+    def close(self):
+        """
+        Close the pooled connections.
+        """
+        self.pool.clear()
+
+
+class Http2Client(_MeasuredClient):
+    """
+    HTTP Client multiplexing the requests over HTTP/2 with httpx.
+
+    With HTTP/2, the requests of every thread share a single connection to
+    the API, each request being a stream, instead of one connection per
+    thread. The server must support HTTP/2, otherwise HTTP/1.1 is used.
+    Connection errors and timeouts are raised as NimbaSMSConnectionError
+    and NimbaSMSTimeout.
+    """
+    def __init__(self, timeout=None, max_connections=10, http2=True,
+                 logger=_logger, log_sample_rate=None, instruments=None):
+        """
+        Constructor for the Http2Client
+
+        :param int timeout: Timeout for the requests.
+                            Timeout should never be zero (0) or less.
+        :param int max_connections: Maximum number of connections
+        :param bool http2: Negotiate HTTP/2
+        :param logger
+        :param int log_sample_rate: Log one structured line for 1 in N
+                                    requests, and for every error, instead
+                                    of the verbose request and response logs
+        :param list instruments: Instrument hooks called around every request
+        """
+        try:
+            import httpx  # pylint: disable=import-outside-toplevel
+        except ImportError as exc:
+            raise NimbaSMSException(
+                'httpx is required to use Http2Client, '
+                'install it with: pip install nimbasms[http2]') from exc
+        super().__init__(timeout, logger, log_sample_rate, instruments)
+        self._httpx = httpx
+        self.session = httpx.Client(
+            http2=http2,
+            limits=httpx.Limits(max_connections=max_connections),
+            timeout=timeout)
+
+    def _send(self, method, url, body, headers, timeout, stream):
+        httpx = self._httpx
+        try:
+            request = self.session.build_request(
+                method, url, content=body, headers=headers,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT)
+            response = self.session.send(request, stream=stream)
+            if stream and response.status_code < 400:
+                return StreamedResponse(response.status_code,
+                                        response.iter_bytes(CHUNK_SIZE),
+                                        response.headers, response.close)
+            if stream:
+                response.read()
+                response.close()
+        except httpx.TimeoutException as exc:
+            raise NimbaSMSTimeout(exc) from exc
+        except httpx.TransportError as exc:
+            raise NimbaSMSConnectionError(exc) from exc
+        return Response(response.status_code, response.text, response.headers)
+
+    def _new_connection(self):
+        # httpx does not tell whether a connection was opened.
+        return None
+
+    def close(self):
+        """
+        Close the connections.
+        """
+        self.session.close()
@@ -34,7 +34,7 @@ setuptools.setup(
     url='https://github.com/nimbasms/nimbasms-python',
     long_description=long_description,
     long_description_content_type="text/markdown",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(include=['nimbasms', 'nimbasms.*']),
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -42,5 +42,12 @@ setuptools.setup(
     ],
     python_requires='>=3.6',
     py_modules=["nimbasms"],
-    install_requires=['requests']
+    install_requires=['requests'],
+    extras_require={
+        'async': ['aiohttp>=3.8'],
+        'http2': ['httpx[http2]>=0.24'],
+    },
+    entry_points={
+        'console_scripts': ['nimbasms=nimbasms.cli:main'],
+    },
 )
@@ -0,0 +1,51 @@
+"""
+Fixtures shared by the tests.
+"""
+
+import threading
+
+import pytest
+
+from benchmarks.fake_server import FakeNimbaServer
+
+
+class FakeClock:
+    """
+    Clock returning the time set in now.
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """
+    A FakeClock starting at 0, to be given as the clock of the tested object.
+    """
+    return FakeClock()
+
+
+@pytest.fixture
+def fake_api():
+    """
+    Start a FakeNimbaServer in a thread of the test process.
+
+    The fixture is a factory taking the options of FakeNimbaServer, the
+    servers started are shut down at the end of the test.
+    """
+    servers = []
+
+    def start(**options):
+        server = FakeNimbaServer(**options)
+        threading.Thread(target=server.serve_forever, args=(0.01,),
+                         daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,92 @@
+"""
+Tests of the asyncio client.
+"""
+
+import asyncio
+
+import pytest
+
+from nimbasms.aio import AsyncClient
+from nimbasms.cache import ResponseCache
+from nimbasms.execptions import NimbaSMSException
+from nimbasms.retry import Retry
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_concurrent_requests_share_the_client(fake_api):
+    server = fake_api(latency=0.05)
+
+    async def main():
+        async with AsyncClient('ACCOUNT_SID', 'AUTH_TOKEN',
+                               base_url=server.base_url) as client:
+            responses = await asyncio.gather(*[
+                client.messages.create(to=['224000000001', '224000000002'],
+                                       sender_name='Nimba', message='Hi')
+                for _ in range(20)])
+            account = await client.accounts.get()
+            return responses, account
+
+    responses, account = run(main())
+    assert [response.status_code for response in responses] == [201] * 20
+    assert {response.data['numbers'] for response in responses} == {2}
+    assert account.data['balance'] == 1000
+    assert server.created == 20
+
+
+def test_pagination_is_awaitable(fake_api):
+    server = fake_api(counts={'groups': 45})
+
+    async def main():
+        async with AsyncClient('ACCOUNT_SID', 'AUTH_TOKEN',
+                               base_url=server.base_url) as client:
+            groups = client.groups
+            pages = [await groups.list(limit=20)]
+            while True:
+                page = await groups.next()
+                if page is None:
+                    return pages
+                pages.append(page)
+
+    pages = run(main())
+    assert [len(page.data['results']) for page in pages] == [20, 20, 5]
+
+
+def test_errors_are_returned_as_responses(fake_api):
+    server = fake_api(error_rate=1.0)
+
+    async def main():
+        async with AsyncClient('ACCOUNT_SID', 'AUTH_TOKEN',
+                               base_url=server.base_url) as client:
+            return await client.accounts.get()
+
+    response = run(main())
+    assert response.status_code == 503
+    assert not response.ok
+
+
+@pytest.mark.parametrize('option', [
+    {'retry': Retry()}, {'cache': ResponseCache()}, {'rate_limiter': object()}])
+def test_blocking_options_are_rejected(option):
+    with pytest.raises(NimbaSMSException):
+        AsyncClient('ACCOUNT_SID', 'AUTH_TOKEN', **option)
+
+
+def test_blocking_options_set_later_are_rejected():
+    client = AsyncClient('ACCOUNT_SID', 'AUTH_TOKEN')
+    client.retry = Retry()
+    with pytest.raises(NimbaSMSException):
+        run(client.accounts.get())
+
+
+@pytest.mark.parametrize('service, name', [
+    ('messages', 'create_many'), ('messages', 'create_campaign'),
+    ('messages', 'iter_all'), ('contacts', 'import_stream'),
+    ('contacts', 'iter_pages'), ('groups', 'stream_page'),
+    ('sendernames', 'iter_all')])
+def test_thread_helpers_raise_on_the_async_services(service, name):
+    client = AsyncClient('ACCOUNT_SID', 'AUTH_TOKEN')
+    with pytest.raises(NimbaSMSException, match=name):
+        getattr(getattr(client, service), name)(['224000000001'], 'Nimba', 'Hi')
@@ -0,0 +1,136 @@
+"""
+Tests of the bulk helpers and Messages.create_many.
+"""
+
+import threading
+import time
+
+import pytest
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+from nimbasms import Client, HttpClient, Response
+from nimbasms.bulk import BulkResult, chunked, imap_bounded
+
+
+class FailingHttpClient(HttpClient):
+    """
+    Transport raising for the requests sent to a given number and
+    answering 201 otherwise.
+    """
+    def __init__(self, failing):
+        self.failing = failing
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                auth=None, timeout=None):
+        if self.failing in data['to']:
+            raise RequestsConnectionError('reset')
+        if 'bad' in data['to']:
+            return Response(400, '{"detail": "invalid number"}', {})
+        return Response(201, '{"messageid": "m"}', {})
+
+
+def test_chunked():
+    assert list(chunked(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(chunked([], 3)) == []
+    assert list(chunked(iter(range(4)), 2)) == [[0, 1], [2, 3]]
+
+
+@pytest.mark.parametrize('size', [0, -1, None])
+def test_chunked_validates_on_call(size):
+    with pytest.raises(ValueError):
+        chunked(range(3), size)
+
+
+def test_imap_bounded_yields_every_result_as_it_completes():
+    def work(item):
+        time.sleep(0.05 if item == 0 else 0)
+        return item * 2
+
+    results = list(imap_bounded(work, range(20), max_workers=4))
+    assert sorted(results) == [item * 2 for item in range(20)]
+    # The slow first item does not hold back the others.
+    assert results[0] != 0
+
+
+def test_imap_bounded_consumes_the_input_lazily():
+    pulled = []
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def items():
+        for item in range(100):
+            pulled.append(item)
+            yield item
+
+    def work(item):
+        with lock:
+            running.append(item)
+            peak.append(len(running))
+        time.sleep(0.001)
+        with lock:
+            running.remove(item)
+        return item
+
+    results = imap_bounded(work, items(), max_workers=3, max_pending=5)
+    consumed = 0
+    for _ in results:
+        consumed += 1
+        assert len(pulled) - consumed <= 5
+    assert consumed == 100
+    assert max(peak) <= 3
+
+
+@pytest.mark.parametrize('options', [
+    {'max_workers': 0}, {'max_workers': -2}, {'max_pending': 0}])
+def test_imap_bounded_validates_on_call(options):
+    with pytest.raises(ValueError):
+        imap_bounded(str, range(3), **options)
+
+
+def test_imap_bounded_propagates_errors():
+    def work(item):
+        if item == 3:
+            raise KeyError(item)
+        return item
+
+    with pytest.raises(KeyError):
+        list(imap_bounded(work, range(10), max_workers=2))
+
+
+@pytest.mark.parametrize('options', [{'chunk_size': 0}, {'max_workers': 0}])
+def test_create_many_validates_on_call(options):
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', http_client=FailingHttpClient(None))
+    with pytest.raises(ValueError):
+        client.messages.create_many(['224000000001'], 'Nimba', 'Hi', **options)
+
+
+def test_create_many_reports_every_chunk(fake_api):
+    server = fake_api()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    numbers = [f'2246{index:08d}' for index in range(1050)]
+    results = list(client.messages.create_many(numbers, 'Nimba', 'Hi',
+                                               chunk_size=100, max_workers=4))
+    assert sorted(result.index for result in results) == list(range(11))
+    assert all(result.error is None and result.response.status_code == 201
+               for result in results)
+    sent = sorted(number for result in results for number in result.to)
+    assert sent == numbers
+    assert server.created == 11
+
+
+def test_create_many_returns_errors_as_results():
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN',
+                    http_client=FailingHttpClient('224000000003'))
+    numbers = ['224000000001', '224000000002', '224000000003', 'bad']
+    results = sorted(client.messages.create_many(numbers, 'Nimba', 'Hi',
+                                                 chunk_size=1),
+                     key=lambda result: result.index)
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    failed = results[2]
+    assert isinstance(failed, BulkResult)
+    assert failed.to == ['224000000003']
+    assert failed.response is None
+    assert isinstance(failed.error, RequestsConnectionError)
+    assert results[3].error is None
+    assert results[3].response.status_code == 400
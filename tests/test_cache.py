@@ -0,0 +1,117 @@
+"""
+Tests of the response cache.
+"""
+
+from nimbasms import Client, HttpClient, Response
+from nimbasms.cache import ResponseCache
+
+URL = 'https://api.nimbasms.com/v1/accounts'
+
+
+class Scripted:
+    """
+    Send function replaying responses, recording the headers of every
+    request.
+    """
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.headers = []
+
+    def __call__(self, headers):
+        self.headers.append(dict(headers))
+        return self.responses.pop(0)
+
+
+class RecordingHttpClient(HttpClient):
+    """
+    Transport answering every request with the account of its credentials.
+    """
+    def __init__(self):
+        self.requests = 0
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                auth=None, timeout=None):
+        self.requests += 1
+        return Response(200, f'{{"sid": "{headers["Authorization"]}"}}', {})
+
+
+def test_entry_is_served_until_it_expires(clock):
+    cache = ResponseCache(ttls={'/v1/accounts': 30}, clock=clock)
+    send = Scripted(Response(200, '{"balance": 1}', {}),
+                    Response(200, '{"balance": 2}', {}))
+    assert cache.call(send, URL, None, {}).cached is False
+    hit = cache.call(send, URL, None, {})
+    assert hit.cached is True
+    assert hit.data == {'balance': 1}
+    clock.now = 31
+    assert cache.call(send, URL, None, {}).data == {'balance': 2}
+    assert len(send.headers) == 2
+
+
+def test_expired_entry_is_revalidated_with_its_etag(clock):
+    cache = ResponseCache(ttls={'/v1/accounts': 30}, clock=clock)
+    send = Scripted(Response(200, '{"balance": 1}', {'ETag': '"v1"'}),
+                    Response(304, '', {}),
+                    Response(200, '{"balance": 2}', {'ETag': '"v2"'}))
+    cache.call(send, URL, None, {})
+
+    clock.now = 31
+    renewed = cache.call(send, URL, None, {})
+    assert send.headers[1]['If-None-Match'] == '"v1"'
+    assert renewed.cached is True
+    assert renewed.data == {'balance': 1}
+
+    # The 304 renewed the entry for a whole time to live.
+    clock.now = 60
+    assert cache.call(send, URL, None, {}).cached is True
+    assert len(send.headers) == 2
+
+    clock.now = 62
+    assert cache.call(send, URL, None, {}).data == {'balance': 2}
+    assert send.headers[2]['If-None-Match'] == '"v1"'
+
+
+def test_endpoints_without_ttl_are_not_cached():
+    cache = ResponseCache(ttls={'/v1/accounts': 30})
+    send = Scripted(Response(200, '[]', {}), Response(200, '[]', {}))
+    url = 'https://api.nimbasms.com/v1/messages'
+    cache.call(send, url, None, {})
+    assert cache.call(send, url, None, {}).cached is False
+
+
+def test_errors_are_not_cached():
+    cache = ResponseCache(ttls={'/v1/accounts': 30})
+    send = Scripted(Response(503, '{}', {}), Response(200, '{}', {}))
+    assert cache.call(send, URL, None, {}).status_code == 503
+    assert cache.call(send, URL, None, {}).status_code == 200
+
+
+def test_shared_cache_is_keyed_by_credentials():
+    cache = ResponseCache()
+    transport = RecordingHttpClient()
+    first = Client('ACCOUNT_A', 'TOKEN_A', cache=cache, http_client=transport)
+    second = Client('ACCOUNT_B', 'TOKEN_B', cache=cache, http_client=transport)
+
+    account_a = first.accounts.get().data
+    account_b = second.accounts.get().data
+    assert account_a != account_b
+    assert transport.requests == 2
+
+    assert first.accounts.get().data == account_a
+    assert second.accounts.get().data == account_b
+    assert transport.requests == 2
+
+    explicit = Client('ACCOUNT_A', 'TOKEN_A', cache=cache, http_client=transport)
+    assert explicit.accounts.get().cached is True
+
+
+def test_list_params_are_part_of_the_key():
+    cache = ResponseCache(ttls={'/v1/accounts': 30})
+    send = Scripted(Response(200, '{"page": 1}', {}),
+                    Response(200, '{"page": 2}', {}))
+    first = {'status': ['sent', 'received'], 'limit': 10}
+    assert cache.call(send, URL, first, {}).data == {'page': 1}
+    assert cache.call(send, URL, dict(first), {}).cached is True
+    other = {'status': ['sent'], 'limit': 10}
+    assert cache.call(send, URL, other, {}).data == {'page': 2}
+    assert len(send.headers) == 2
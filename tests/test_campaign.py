@@ -0,0 +1,124 @@
+"""
+Tests of the personalized campaigns.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from nimbasms import Client
+from nimbasms.campaign import Campaign, CampaignResult, Template
+from nimbasms.recipients import INVALID_LENGTH
+from nimbasms.results import SendResult
+
+
+def number(index):
+    return f'2246{index:08d}'
+
+
+def test_template_fields():
+    template = Template('Hi {name}, {code} {name}')
+    assert template.fields == ('name', 'code')
+    assert template.key({'name': 'Ama', 'code': 1}) == ('Ama', 1)
+    nested = Template('Hi {user.name}, {codes[0]}')
+    assert nested.fields == ('user', 'codes')
+    # Nested values may not be hashable, the text is the key.
+    assert nested.key({'user': SimpleNamespace(name='Ama'), 'codes': [7]}) == (
+        'Hi Ama, 7',)
+    assert Template('Hi').key({'name': 'Ama'}) == ()
+    assert Template('{name}').missing({'code': 1}) == ('name',)
+    for text in ('Hi {}', 'Hi {0}'):
+        with pytest.raises(ValueError):
+            Template(text)
+
+
+def test_plan_groups_by_field_values_and_splits_at_chunk_size():
+    recipients = [{'to': number(index), 'name': 'AB'[index % 2]}
+                  for index in range(250)]
+    campaign = Campaign(None, 'Hi {name}', 'Nimba', chunk_size=100)
+    groups = list(campaign.plan(recipients))
+    assert sorted((text, len(to)) for text, to in groups) == [
+        ('Hi A', 25), ('Hi A', 100), ('Hi B', 25), ('Hi B', 100)]
+    assert sorted(numero for _, to in groups for numero in to) == [
+        number(index) for index in range(250)]
+
+
+def test_groups_are_keyed_by_values_not_by_text():
+    campaign = Campaign(None, '{a}{b}', 'Nimba')
+    groups = list(campaign.plan([{'to': number(0), 'a': '1', 'b': '23'},
+                                 {'to': number(1), 'a': '12', 'b': '3'}]))
+    assert groups == [('123', [number(0)]), ('123', [number(1)])]
+
+
+def test_plan_keeps_at_most_max_pending_recipients():
+    pulled = []
+
+    def recipients():
+        for index in range(1000):
+            pulled.append(index)
+            yield {'to': number(index), 'name': str(index)}
+
+    campaign = Campaign(None, 'Hi {name}', 'Nimba', max_pending=20)
+    planned = 0
+    for _, to in campaign.plan(recipients()):
+        planned += len(to)
+        assert len(pulled) - planned <= 21
+    assert planned == 1000
+
+
+def test_invalid_recipients_go_to_on_invalid_and_the_campaign_goes_on():
+    invalid = []
+    campaign = Campaign(None, 'Hi {name}, {user[city]}', 'Nimba',
+                        on_invalid=lambda entry, reason: invalid.append(reason))
+    recipients = [
+        {'to': number(0), 'name': 'A', 'user': {'city': 'Conakry'}},
+        {'to': number(1), 'user': {'city': 'Kindia'}},
+        {'name': 'B', 'user': {}},
+        {'to': number(2), 'name': 'C', 'user': {}},
+        {'to': number(3), 'name': 'A', 'user': {'city': 'Conakry'}},
+    ]
+    assert list(campaign.plan(recipients)) == [
+        ('Hi A, Conakry', [number(0), number(3)])]
+    assert invalid == ['missing field name', 'missing field to',
+                       "invalid field: 'city'"]
+
+
+def test_unhashable_values_are_invalid():
+    invalid = []
+    campaign = Campaign(None, 'Hi {name}', 'Nimba',
+                        on_invalid=lambda entry, reason: invalid.append(reason))
+    assert list(campaign.plan([{'to': number(0), 'name': ['A']},
+                               {'to': number(1), 'name': 'B'}])) == [
+        ('Hi B', [number(1)])]
+    assert invalid[0].startswith('invalid field: unhashable')
+
+
+def test_normalized_recipients():
+    invalid = []
+    campaign = Campaign(None, 'Hi', 'Nimba', normalize=True,
+                        on_invalid=lambda entry, reason: invalid.append(
+                            (entry['to'], reason)))
+    recipients = [{'to': '622 12 34 56'}, {'to': '+224622123456'},
+                  {'to': '0612345678'}, {'to': '622000000'}]
+    assert list(campaign.plan(recipients)) == [
+        ('Hi', ['224622123456', '224622000000'])]
+    assert invalid == [('0612345678', INVALID_LENGTH)]
+
+
+def test_send_against_the_fake_api(fake_api):
+    server = fake_api()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    recipients = [{'to': number(index), 'name': 'AB'[index % 2]}
+                  for index in range(30)] + [{'name': 'C'}]
+    results = list(client.messages.create_campaign(
+        'Hi {name}', recipients, 'Nimba', chunk_size=10, max_workers=2))
+    assert all(isinstance(result, CampaignResult) for result in results)
+    assert sorted(result.index for result in results) == [0, 1, 2, 3]
+    assert all(result.response.status_code == 201 for result in results)
+    assert sum(len(result.to) for result in results) == 30
+    assert server.created == 4
+
+    compact = list(client.messages.create_campaign(
+        'Hi {name}', recipients, 'Nimba', chunk_size=10, compact=True))
+    assert all(isinstance(result, SendResult) and result.status_code == 201
+               for result in compact)
@@ -0,0 +1,152 @@
+"""
+Tests of the nimbasms command line.
+"""
+
+import io
+import json
+
+import pytest
+
+from nimbasms import cli
+
+NUMBERS = [f'2246{index:08d}' for index in range(25)]
+
+
+@pytest.fixture
+def credentials(monkeypatch):
+    monkeypatch.setenv('NIMBA_ACCOUNT_SID', 'ACCOUNT_SID')
+    monkeypatch.setenv('NIMBA_AUTH_TOKEN', 'AUTH_TOKEN')
+
+
+def results(path):
+    with open(path, encoding='utf-8') as output:
+        return [json.loads(line) for line in output]
+
+
+def test_parser_reads_the_credentials_from_the_environment(credentials):
+    args = cli.build_parser().parse_args(
+        ['send', '--sender-name', 'Nimba', '--message', 'Hi'])
+    assert (args.account_sid, args.auth_token) == ('ACCOUNT_SID', 'AUTH_TOKEN')
+    assert args.input == '-'
+    assert (args.chunk_size, args.workers, args.retries) == (100, 8, 3)
+    assert args.func is cli.send
+
+
+@pytest.mark.parametrize('argv', [
+    ['send', '--message', 'Hi'],
+    ['send', '--sender-name', 'Nimba'],
+    ['send', '--sender-name', 'Nimba', '--message', 'Hi', '--message-file', 'f'],
+    ['export', 'groups']])
+def test_parser_rejects_invalid_arguments(argv, capsys):
+    with pytest.raises(SystemExit):
+        cli.build_parser().parse_args(argv)
+    capsys.readouterr()
+
+
+def test_resume_requires_an_output(credentials):
+    with pytest.raises(SystemExit, match='--output'):
+        cli.main(['send', '--sender-name', 'Nimba', '--message', 'Hi', '--resume'])
+
+
+def test_missing_token_is_reported(monkeypatch):
+    monkeypatch.setenv('NIMBA_ACCOUNT_SID', 'ACCOUNT_SID')
+    monkeypatch.delenv('NIMBA_AUTH_TOKEN', raising=False)
+    monkeypatch.setattr('sys.stdin', io.StringIO())
+    with pytest.raises(SystemExit, match='NIMBA_AUTH_TOKEN'):
+        cli.main(['send', '--sender-name', 'Nimba', '--message', 'Hi', '-q'])
+
+
+@pytest.mark.parametrize('input_format, text', [
+    ('csv', 'name,to\nA,224600000001\nB,\nC, 224600000002 \n'),
+    ('ndjson', '{"to": "224600000001"}\n\n{"to": 224600000002}\n'),
+    ('lines', '224600000001\n\n 224600000002\n')])
+def test_read_recipients(input_format, text):
+    numbers = cli.read_recipients(io.StringIO(text), input_format)
+    assert list(numbers) == ['224600000001', '224600000002']
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('numbers.CSV', 'csv'), ('numbers.ndjson', 'ndjson'),
+    ('numbers.jsonl', 'ndjson'), ('numbers.txt', 'lines'), ('-', 'lines')])
+def test_detect_format(path, expected):
+    assert cli.detect_format(path) == expected
+
+
+def test_load_sent_keeps_only_the_sent_recipients(tmp_path):
+    path = tmp_path / 'results.ndjson'
+    path.write_text('{"to": "1", "status": "sent"}\n'
+                    '{"to": "2", "status": "failed"}\n'
+                    '{"to": "3", "status": "invalid"}\n'
+                    '{"to": "4", "stat')
+    assert cli.load_sent(str(path)) == {'1'}
+    assert cli.load_sent(str(tmp_path / 'missing')) == set()
+
+
+@pytest.mark.parametrize('name, text', [
+    ('numbers.csv', 'to\n' + '\n'.join(NUMBERS) + '\n'),
+    ('numbers.ndjson', ''.join(f'{{"to": "{to}"}}\n' for to in NUMBERS)),
+    ('numbers.txt', '\n'.join(NUMBERS) + '\n')])
+def test_send_a_file(fake_api, credentials, tmp_path, name, text):
+    server = fake_api()
+    source = tmp_path / name
+    source.write_text(text)
+    output = tmp_path / 'results.ndjson'
+    assert cli.main(['send', '--base-url', server.base_url, '--sender-name',
+                     'Nimba', '--message', 'Hi', '--chunk-size', '10', '-q',
+                     '-o', str(output), str(source)]) == 0
+    written = results(output)
+    assert sorted(result['to'] for result in written) == NUMBERS
+    assert {result['status'] for result in written} == {'sent'}
+    assert server.created == 3
+
+
+def test_send_from_stdin(fake_api, credentials, monkeypatch, tmp_path):
+    server = fake_api()
+    monkeypatch.setattr('sys.stdin', io.StringIO('\n'.join(NUMBERS)))
+    output = tmp_path / 'results.ndjson'
+    assert cli.main(['send', '--base-url', server.base_url, '--sender-name',
+                     'Nimba', '--message', 'Hi', '-q', '-o', str(output), '-']) == 0
+    assert len(results(output)) == len(NUMBERS)
+    assert server.created == 1
+
+
+def test_resume_skips_the_sent_recipients(fake_api, credentials, tmp_path):
+    server = fake_api()
+    source = tmp_path / 'numbers.txt'
+    source.write_text('\n'.join(NUMBERS) + '\n')
+    output = tmp_path / 'results.ndjson'
+    output.write_text(''.join(
+        cli.dumps({'to': to, 'status': 'sent'}) for to in NUMBERS[:20]) +
+        cli.dumps({'to': NUMBERS[20], 'status': 'failed'}))
+    assert cli.main(['send', '--base-url', server.base_url, '--sender-name',
+                     'Nimba', '--message', 'Hi', '-q', '-o', str(output),
+                     '--resume', str(source)]) == 0
+    written = results(output)
+    assert [result['to'] for result in written[21:]] == NUMBERS[20:]
+    assert server.created == 1
+
+
+def test_results_are_synced_after_every_request(fake_api, credentials,
+                                                monkeypatch, tmp_path):
+    server = fake_api()
+    source = tmp_path / 'numbers.txt'
+    source.write_text('\n'.join(NUMBERS) + '\n')
+    output = tmp_path / 'results.ndjson'
+    synced = []
+    monkeypatch.setattr(cli.os, 'fsync',
+                        lambda _: synced.append(len(results(output))))
+    cli.main(['send', '--base-url', server.base_url, '--sender-name', 'Nimba',
+              '--message', 'Hi', '--chunk-size', '10', '--workers', '1', '-q',
+              '-o', str(output), str(source)])
+    assert synced == [10, 20, 25]
+
+
+def test_failed_requests_set_the_exit_status(fake_api, credentials, tmp_path):
+    server = fake_api(error_rate=1.0)
+    source = tmp_path / 'numbers.txt'
+    source.write_text('\n'.join(NUMBERS[:3]) + '\n')
+    output = tmp_path / 'results.ndjson'
+    assert cli.main(['send', '--base-url', server.base_url, '--sender-name',
+                     'Nimba', '--message', 'Hi', '--retries', '0', '-q',
+                     '-o', str(output), str(source)]) == 1
+    assert {result['status'] for result in results(output)} == {'failed'}
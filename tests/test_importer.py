@@ -0,0 +1,156 @@
+"""
+Tests of the streaming contact importer.
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from nimbasms import Response
+from nimbasms.importer import ContactImporter, _Position
+
+
+class ScriptedContacts:
+    """
+    Contacts service listing the contacts given and recording every
+    creation with its idempotency key.
+    """
+    def __init__(self, existing=(), failing=(), slow=()):
+        self.existing = [{'numero': numero} for numero in existing]
+        self.failing = set(failing)
+        self.slow = set(slow)
+        self.calls = []
+        self.listed = 0
+        self._lock = threading.Lock()
+
+    def iter_all(self, limit=100, parallel=4):
+        self.listed += 1
+        return iter(self.existing)
+
+    def create(self, numero, name=None, groups=None, idempotency_key=None):
+        if numero in self.slow:
+            time.sleep(0.05)
+        with self._lock:
+            self.calls.append((numero, name, groups, idempotency_key))
+        if numero in self.failing:
+            return Response(500, '{}', {})
+        return Response(201, '{}', {})
+
+
+class ScriptedClient:
+    def __init__(self, **options):
+        self.contacts = ScriptedContacts(**options)
+
+
+def numbers(count):
+    return [f'62000{index:04d}' for index in range(count)]
+
+
+def created(client):
+    return sorted(call[0] for call in client.contacts.calls)
+
+
+def test_rows_are_normalized_deduplicated_and_skipped():
+    client = ScriptedClient(existing=['+224 620 00 00 02'])
+    rows = ['620 00 00 01', '+224620000001', '224620000002', 'abc',
+            {'numero': '620000003', 'name': 'Ama', 'groups': ['VIP']}]
+    report = ContactImporter(client, max_workers=2).run(rows)
+    assert report.as_dict() == {'read': 5, 'created': 2, 'existing': 1,
+                                'duplicates': 1, 'invalid': 1, 'failed': 0}
+    assert report.pending == 0
+    assert sorted(call[:3] for call in client.contacts.calls) == [
+        ('224620000001', None, None), ('224620000003', 'Ama', ['VIP'])]
+
+
+def test_index_file_replaces_the_listing(tmp_path):
+    index_path = str(tmp_path / 'index')
+    client = ScriptedClient(existing=['620000000'])
+    ContactImporter(client, index_path=index_path).run(numbers(3))
+    with open(index_path, encoding='utf-8') as index:
+        assert sorted(index.read().split()) == [
+            '224620000000', '224620000001', '224620000002']
+
+    again = ScriptedClient()
+    report = ContactImporter(again, index_path=index_path).run(numbers(4))
+    assert again.contacts.listed == 0
+    assert report.existing == 3
+    assert created(again) == ['224620000003']
+
+
+def test_position_advances_over_the_rows_completed_in_order():
+    position = _Position(5)
+    position.complete(7)
+    position.complete(6)
+    assert position.value == 5
+    position.complete(5)
+    assert position.value == 8
+    position.complete(9)
+    assert position.value == 8
+
+
+def test_failed_rows_stay_in_the_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / 'checkpoint')
+    client = ScriptedClient(failing=['224620000001'])
+    failures = []
+    report = ContactImporter(client, checkpoint=checkpoint, checkpoint_every=1,
+                             on_failure=lambda *args: failures.append(args)
+                             ).run(numbers(4))
+    assert report.failed == 1
+    assert failures[0][0] == {'numero': '620000001'}
+    assert failures[0][1].status_code == 500
+    with open(checkpoint, encoding='utf-8') as state:
+        state = json.load(state)
+    assert (state['position'], state['failed']) == (4, [1])
+
+    # The next run with the checkpoint only retries the failed row, with
+    # the idempotency key of the run.
+    client.contacts.failing.clear()
+    first_key = client.contacts.calls[1][3]
+    calls = len(client.contacts.calls)
+    report = ContactImporter(client, checkpoint=checkpoint).run(numbers(6))
+    retried = client.contacts.calls[calls:]
+    assert sorted(call[0] for call in retried) == [
+        '224620000001', '224620000004', '224620000005']
+    assert [call[3] for call in retried if call[0] == '224620000001'] == [first_key]
+    assert report.created == 3
+    with open(checkpoint, encoding='utf-8') as state:
+        state = json.load(state)
+    assert (state['position'], state['failed']) == (6, [])
+
+
+def test_resume_after_a_crash_sends_every_row_with_one_key(tmp_path):
+    checkpoint = str(tmp_path / 'checkpoint')
+    rows = numbers(40)
+    client = ScriptedClient(slow=['224620000002', '224620000011'])
+
+    def crashing():
+        for index, row in enumerate(rows):
+            if index == 25:
+                raise KeyboardInterrupt
+            yield row
+
+    importer = ContactImporter(client, max_workers=4, checkpoint=checkpoint,
+                               checkpoint_every=5)
+    with pytest.raises(KeyboardInterrupt):
+        importer.run(crashing())
+    with open(checkpoint, encoding='utf-8') as state:
+        position = json.load(state)['position']
+    assert position <= 25
+
+    ContactImporter(client, max_workers=4, checkpoint=checkpoint).run(rows)
+    keys = {}
+    for numero, _, _, key in client.contacts.calls:
+        keys.setdefault(numero, set()).add(key)
+    assert sorted(keys) == [f'224{numero}' for numero in rows]
+    assert all(len(sent) == 1 for sent in keys.values())
+
+
+def test_a_new_import_gets_new_idempotency_keys():
+    client = ScriptedClient()
+    ContactImporter(client).run(numbers(1))
+    ContactImporter(client).run(numbers(1))
+    first, second = client.contacts.calls
+    assert first[0] == second[0]
+    assert first[3] != second[3]
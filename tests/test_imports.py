@@ -0,0 +1,31 @@
+"""
+Tests of the lazy imports of the package.
+"""
+
+import subprocess
+import sys
+
+
+def run(code):
+    return subprocess.run([sys.executable, '-c', code], check=True,
+                          capture_output=True, text=True).stdout.split()
+
+
+def test_importing_the_package_loads_only_the_client():
+    modules = run('import sys, nimbasms; '
+                  'print(*sorted(name for name in sys.modules '
+                  'if name.startswith(("nimbasms", "requests"))))')
+    assert modules == ['nimbasms', 'nimbasms.execptions', 'nimbasms.rest']
+
+
+def test_lazy_attributes_are_imported_on_first_access():
+    output = run('import sys, nimbasms; '
+                 'print("requests" in sys.modules, '
+                 'nimbasms.NimbaHttpClient.__module__, "requests" in sys.modules)')
+    assert output == ['False', 'nimbasms.http', 'True']
+
+
+def test_lazy_attributes_are_imported_eagerly_before_python_3_7():
+    output = run('import sys; sys.version_info = (3, 6, 15); import nimbasms; '
+                 'print("NimbaHttpClient" in vars(nimbasms))')
+    assert output == ['True']
@@ -0,0 +1,95 @@
+"""
+Tests of the instrumentation hooks and the metrics registry.
+"""
+
+from nimbasms import Client
+from nimbasms.http import NimbaHttpClient
+from nimbasms.instrumentation import (MetricsRegistry, RequestContext,
+                                      SpanHooks, endpoint_of)
+
+URL = 'https://api.nimbasms.com/v1/messages'
+
+
+def context(elapsed, status_code=201, method='POST', url=URL, **values):
+    request = RequestContext(method, url, 0.0)
+    request.elapsed = elapsed
+    request.status_code = status_code
+    for name, value in values.items():
+        setattr(request, name, value)
+    return request
+
+
+def test_endpoint_of():
+    assert endpoint_of(URL) == '/v1/messages'
+    assert endpoint_of(f'{URL}/0123/?limit=1') == '/v1/messages/{id}'
+    assert endpoint_of('https://api.nimbasms.com/v1/contacts/7/extra') == \
+        '/v1/contacts/{id}'
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    for elapsed in (0.05, 0.1, 0.5, 2.0):
+        registry.on_request_end(context(elapsed))
+    text = registry.render_prometheus()
+    labels = 'method="POST",endpoint="/v1/messages",status="2xx"'
+    name = 'nimbasms_request_duration_seconds'
+    assert f'{name}_bucket{{{labels},le="0.1"}} 2' in text
+    assert f'{name}_bucket{{{labels},le="1.0"}} 3' in text
+    assert f'{name}_bucket{{{labels},le="+Inf"}} 4' in text
+    assert f'{name}_sum{{{labels}}} 2.65' in text
+    assert f'{name}_count{{{labels}}} 4' in text
+
+
+def test_counters_by_endpoint_status_and_connection():
+    registry = MetricsRegistry()
+    registry.on_request_end(context(0.01, bytes_sent=10, bytes_received=20,
+                                    new_connection=True))
+    registry.on_request_end(context(0.01, bytes_sent=5, bytes_received=7,
+                                    new_connection=False))
+    registry.on_request_end(context(None, status_code=None, method='GET',
+                                    url=f'{URL}/0123'))
+    registry.on_retry('get', f'{URL}/0123', 1, 0.5)
+    lines = registry.render_prometheus().splitlines()
+    post = 'method="POST",endpoint="/v1/messages"'
+    get = 'method="GET",endpoint="/v1/messages/{id}"'
+    assert f'nimbasms_requests_total{{{post},status="2xx"}} 2' in lines
+    assert f'nimbasms_requests_total{{{get},status="error"}} 1' in lines
+    assert f'nimbasms_request_bytes_total{{{post}}} 15' in lines
+    assert f'nimbasms_response_bytes_total{{{post}}} 27' in lines
+    assert f'nimbasms_connections_total{{{post},connection="new"}} 1' in lines
+    assert f'nimbasms_connections_total{{{post},connection="reused"}} 1' in lines
+    assert f'nimbasms_retries_total{{{get}}} 1' in lines
+    # A call without elapsed time has no histogram.
+    assert not any(line.startswith('nimbasms_request_duration_seconds_count{'
+                                   'method="GET"') for line in lines)
+    assert '# TYPE nimbasms_requests_total counter' in lines
+    assert '# TYPE nimbasms_request_duration_seconds histogram' in lines
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.on_request_end(context(0.01, method='P"O\\S\nT'))
+    text = registry.render_prometheus()
+    assert 'method="P\\"O\\\\S\\nT"' in text
+    # The newline does not split the sample line.
+    assert all(line.startswith(('#', 'nimbasms_'))
+               for line in text.splitlines())
+
+
+def test_instruments_measure_the_calls_of_the_client(fake_api):
+    server = fake_api()
+    spans = []
+    registry = MetricsRegistry()
+    hooks = SpanHooks(start=lambda request: request.endpoint,
+                      end=lambda request: spans.append(
+                          (request.span, request.status_code)))
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url,
+                    http_client=NimbaHttpClient(instruments=[registry, hooks]))
+    client.messages.create(to=['224000000001'], sender_name='Nimba',
+                           message='Hi')
+    client.accounts.get()
+    assert spans == [('/v1/messages', 201), ('/v1/accounts', 200)]
+    text = registry.render_prometheus()
+    assert ('nimbasms_requests_total{method="POST",endpoint="/v1/messages",'
+            'status="2xx"} 1') in text
+    assert 'connection="new"} 1' in text
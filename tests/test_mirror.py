@@ -0,0 +1,134 @@
+"""
+Tests of the local mirror.
+"""
+
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from nimbasms import Client, Response
+from nimbasms.mirror import Mirror
+
+
+class ListService:
+    """
+    Service listing items from a list the test changes between syncs,
+    counting the pages read.
+    """
+    def __init__(self, items):
+        self.items = items
+        self.pages = 0
+
+    def iter_pages(self, limit, offset=0, prefetch=True):
+        return ListPages(self, limit, offset)
+
+
+class ListPages:
+    def __init__(self, service, limit, offset):
+        self.service = service
+        self.limit = limit
+        self.offset = offset
+        self.count = len(service.items)
+
+    def __iter__(self):
+        items = self.service.items
+        for start in range(self.offset, len(items), self.limit):
+            self.service.pages += 1
+            yield Response(200, json.dumps(
+                {'count': len(items), 'results': items[start:start + self.limit]}))
+
+
+class ListClient:
+    def __init__(self, messages=(), contacts=()):
+        self.messages = ListService(list(messages))
+        self.contacts = ListService(list(contacts))
+
+
+def message(minute):
+    sent_at = datetime(2026, 1, 1) + timedelta(minutes=minute)
+    return {'messageid': f'm{minute}', 'status': 'sent',
+            'sent_at': sent_at.isoformat()}
+
+
+@pytest.mark.parametrize('page_size, refresh, pages', [
+    (100, 100, 1), (50, 100, 2), (50, 120, 3), (200, 100, 1)])
+def test_incremental_sync_stops_after_the_refresh_window(
+        fake_api, tmp_path, page_size, refresh, pages):
+    server = fake_api(counts={'messages': 2000})
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    with Mirror(client, str(tmp_path / 'mirror.db'), page_size=page_size,
+                refresh=refresh) as mirror:
+        assert mirror.sync_messages() == {'pages': -(-2000 // page_size),
+                                          'items': 2000}
+        report = mirror.sync_messages()
+        assert report == {'pages': pages, 'items': pages * page_size}
+        assert len(list(mirror.messages())) == 2000
+
+
+def test_incremental_sync_appended_list(fake_api, tmp_path):
+    server = fake_api(counts={'contacts': 250})
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    with Mirror(client, str(tmp_path / 'mirror.db'), page_size=100, refresh=50,
+                newest_first=False) as mirror:
+        assert mirror.sync_contacts() == {'pages': 3, 'items': 250}
+        # Starts 50 items before the end reached by the previous sync.
+        assert mirror.sync_contacts() == {'pages': 1, 'items': 50}
+
+
+def test_sync_stops_at_an_older_item_when_the_watermark_was_deleted(tmp_path):
+    # Newest first: message m499 is the newest.
+    client = ListClient(messages=[message(minute) for minute in range(499, -1, -1)])
+    with Mirror(client, str(tmp_path / 'mirror.db'), page_size=50,
+                refresh=10) as mirror:
+        mirror.sync_messages()
+        del client.messages.items[0]
+        client.messages.items[:0] = [message(minute) for minute in (502, 501, 500)]
+        client.messages.pages = 0
+        assert mirror.sync_messages() == {'pages': 1, 'items': 50}
+        assert client.messages.pages == 1
+        assert next(mirror.messages()).messageid == 'm502'
+        # The new watermark is used by the next sync.
+        client.messages.pages = 0
+        assert mirror.sync_messages() == {'pages': 1, 'items': 50}
+
+
+def test_contacts_with_any_id(tmp_path):
+    client = ListClient(contacts=[
+        {'contact_id': 'c-2', 'numero': '224000000002', 'added_at': '2026-01-02'},
+        {'contact_id': 1, 'numero': '224000000001', 'added_at': '2026-01-01'}])
+    with Mirror(client, str(tmp_path / 'mirror.db')) as mirror:
+        mirror.sync_contacts()
+        assert [contact.contact_id for contact in mirror.contacts()] == ['c-2', 1]
+
+
+def test_file_with_integer_contact_ids_is_migrated(tmp_path):
+    path = str(tmp_path / 'mirror.db')
+    with sqlite3.connect(path) as db:
+        db.executescript(
+            'CREATE TABLE contacts (contact_id INTEGER PRIMARY KEY, numero TEXT, '
+            'name TEXT, groups TEXT, added_at TEXT, extra TEXT);'
+            'CREATE INDEX contacts_numero ON contacts (numero);'
+            'CREATE INDEX contacts_added_at ON contacts (added_at);'
+            'CREATE TABLE sync_state (resource TEXT PRIMARY KEY, newest TEXT, '
+            'count INTEGER, synced_at REAL);'
+            "INSERT INTO contacts VALUES (7, '224000000007', 'Old', '[]', "
+            "'2026-01-01', NULL);")
+    client = ListClient(contacts=[
+        {'contact_id': 'c-8', 'numero': '224000000008', 'added_at': '2026-01-02'}])
+    with Mirror(client, path) as mirror:
+        mirror.sync_contacts()
+        assert [contact.contact_id for contact in mirror.contacts()] == ['c-8', 7]
+        assert next(mirror.contacts(numero='224000000007')).name == 'Old'
+
+
+def test_newest_first_per_resource(fake_api, tmp_path):
+    server = fake_api(counts={'messages': 1000, 'contacts': 250})
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    with Mirror(client, str(tmp_path / 'mirror.db'), page_size=100, refresh=50,
+                newest_first={'contacts': False}) as mirror:
+        assert mirror.newest_first == {'messages': True, 'contacts': False}
+        mirror.sync()
+        assert mirror.sync() == {'messages': {'pages': 1, 'items': 100},
+                                 'contacts': {'pages': 1, 'items': 50}}
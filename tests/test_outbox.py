@@ -0,0 +1,224 @@
+"""
+Tests of the durable outbox.
+"""
+
+import sqlite3
+import threading
+import time
+
+from nimbasms import Client, HttpClient, Response
+from nimbasms.outbox import Outbox
+from nimbasms.rest import IDEMPOTENCY_HEADER
+
+
+class ScriptedHttpClient(HttpClient):
+    """
+    Transport replaying responses, then answering 201, recording the
+    idempotency key of every request.
+    """
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.keys = []
+        self.times = []
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                auth=None, timeout=None):
+        self.keys.append(headers.get(IDEMPOTENCY_HEADER))
+        self.times.append(time.monotonic())
+        if self.responses:
+            return self.responses.pop(0)
+        return Response(201, f'{{"messageid": "{len(self.keys)}"}}', {})
+
+
+def fill(outbox, count):
+    outbox.enqueue_many(([f'2246{index:08d}'], 'Nimba', 'Hi')
+                        for index in range(count))
+
+
+def stored_keys(path):
+    with sqlite3.connect(path) as db:
+        return [row[0] for row in db.execute(
+            'SELECT idempotency_key FROM outbox ORDER BY id')]
+
+
+def test_drain_sends_every_entry_once(fake_api, tmp_path):
+    server = fake_api()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    with Outbox(str(tmp_path / 'outbox.db')) as outbox:
+        fill(outbox, 20)
+        assert outbox.drain(client, max_workers=4) == {
+            'sent': 20, 'failed': 0, 'retried': 0}
+        assert outbox.stats()['sent'] == 20
+        assert all(entry['message_id'] for entry in outbox.entries('sent'))
+    assert server.created == 20
+
+
+def test_opening_a_second_handle_during_drain_sends_no_duplicate(
+        fake_api, tmp_path):
+    server = fake_api(latency=0.3)
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    path = str(tmp_path / 'outbox.db')
+    outbox = Outbox(path)
+    fill(outbox, 5)
+    outcome = {}
+    drain = threading.Thread(target=lambda: outcome.update(
+        outbox.drain(client, max_workers=8)))
+    drain.start()
+    time.sleep(0.1)
+    with Outbox(path) as producer:
+        assert producer.stats()['sending'] == 5
+        producer.enqueue(['224000000099'], 'Nimba', 'Late')
+    drain.join()
+    outbox.close()
+    assert outcome['sent'] == 6
+    assert server.created == 6
+
+
+def test_two_drains_share_the_queue_without_duplicates(fake_api, tmp_path):
+    server = fake_api(latency=0.01)
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    path = str(tmp_path / 'outbox.db')
+    with Outbox(path) as outbox:
+        fill(outbox, 60)
+    outcomes = []
+
+    def drain():
+        with Outbox(path) as handle:
+            outcomes.append(handle.drain(client, max_workers=4))
+
+    threads = [threading.Thread(target=drain) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(outcome['sent'] for outcome in outcomes) == 60
+    assert server.created == 60
+
+
+def test_expired_lease_is_sent_again_with_the_same_key(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    with Outbox(path) as crashed:
+        fill(crashed, 3)
+        # A drain claimed the entries and died before recording them.
+        crashed._claim(10)  # pylint: disable=protected-access
+
+    transport = ScriptedHttpClient()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', http_client=transport)
+    with Outbox(path, lease=0.2) as outbox:
+        assert outbox.stats()['sending'] == 3
+        time.sleep(0.25)
+        assert outbox.drain(client)['sent'] == 3
+        assert {entry['attempts'] for entry in outbox.entries()} == {2}
+    assert transport.keys == stored_keys(path)
+
+
+def test_recover_puts_the_sending_entries_back(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    with Outbox(path) as outbox:
+        fill(outbox, 3)
+        outbox._claim(10)  # pylint: disable=protected-access
+    with Outbox(path) as outbox:
+        assert outbox.stats()['sending'] == 3
+        assert outbox.recover() == 3
+        assert outbox.stats()['pending'] == 3
+
+
+def test_retried_entry_waits_for_retry_after(tmp_path):
+    transport = ScriptedHttpClient(Response(429, '{}', {'Retry-After': '0.3'}))
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', http_client=transport)
+    with Outbox(str(tmp_path / 'outbox.db')) as outbox:
+        fill(outbox, 1)
+        assert outbox.drain(client, poll_interval=0.05) == {
+            'sent': 1, 'failed': 0, 'retried': 1}
+    first, second = transport.times
+    assert second - first >= 0.29
+    assert transport.keys[0] == transport.keys[1]
+
+
+def test_failing_entries_back_off_before_failing(tmp_path):
+    transport = ScriptedHttpClient(*[Response(500, '{}', {})] * 3)
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', http_client=transport)
+    with Outbox(str(tmp_path / 'outbox.db')) as outbox:
+        fill(outbox, 1)
+        started = time.monotonic()
+        outcome = outbox.drain(client, max_attempts=3, backoff_factor=0.1,
+                               poll_interval=0.01)
+        assert outcome == {'sent': 0, 'failed': 1, 'retried': 2}
+        assert outbox.stats()['failed'] == 1
+    assert len(transport.times) == 3
+    assert transport.times[-1] - started < 1.0
+
+
+def test_entries_not_due_are_not_claimed(tmp_path):
+    with Outbox(str(tmp_path / 'outbox.db')) as outbox:
+        fill(outbox, 1)
+        (row,) = outbox._claim(10)  # pylint: disable=protected-access
+        outbox._retry_or_fail(row[0], 1, 5, 503, 'unavailable', 60)  # pylint: disable=protected-access
+        assert outbox._claim(10) == []  # pylint: disable=protected-access
+        assert outbox.stats()['pending'] == 1
+
+
+class SlowHttpClient(ScriptedHttpClient):
+    """
+    Transport answering 201 after a delay, recording the entries in the
+    sending state of the outbox during every request.
+    """
+    def __init__(self, path, delay):
+        super().__init__()
+        self.path = path
+        self.delay = delay
+        self.sending = []
+
+    def request(self, method, url, params=None, data=None, headers=None,
+                auth=None, timeout=None):
+        with sqlite3.connect(self.path) as db:
+            self.sending.append(db.execute(
+                "SELECT COUNT(*) FROM outbox WHERE state = 'sending'").fetchone()[0])
+        time.sleep(self.delay)
+        return super().request(method, url, params, data, headers, auth, timeout)
+
+
+def test_entries_are_claimed_per_free_thread(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    transport = SlowHttpClient(path, 0.02)
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', http_client=transport)
+    with Outbox(path) as outbox:
+        fill(outbox, 30)
+        assert outbox.drain(client, max_workers=3)['sent'] == 30
+    assert max(transport.sending) <= 3
+
+
+def test_idle_polls_do_not_take_the_write_lock(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    transport = SlowHttpClient(path, 0.3)
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', http_client=transport)
+    with Outbox(path) as outbox:
+        statements = []
+        outbox._db.set_trace_callback(statements.append)  # pylint: disable=protected-access
+        fill(outbox, 2)
+        assert outbox.drain(client, max_workers=4, poll_interval=0.05)['sent'] == 2
+    # A single claim took both entries, the polls while they were in flight
+    # only read the queue.
+    assert statements.count('BEGIN IMMEDIATE') == 1
+
+
+def test_outbox_created_before_the_backoff_column_is_migrated(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    with sqlite3.connect(path) as db:
+        db.execute(
+            'CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'recipients TEXT NOT NULL, sender_name TEXT NOT NULL, '
+            'message TEXT NOT NULL, idempotency_key TEXT NOT NULL, '
+            "state TEXT NOT NULL DEFAULT 'pending', "
+            'attempts INTEGER NOT NULL DEFAULT 0, status_code INTEGER, '
+            'message_id TEXT, error TEXT, created_at REAL NOT NULL, '
+            'updated_at REAL NOT NULL)')
+        db.execute(
+            'INSERT INTO outbox (recipients, sender_name, message, '
+            "idempotency_key, created_at, updated_at) VALUES "
+            "('[\"224000000001\"]', 'Nimba', 'Hi', 'key', 0, 0)")
+    transport = ScriptedHttpClient()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', http_client=transport)
+    with Outbox(path) as outbox:
+        assert outbox.drain(client)['sent'] == 1
+    assert transport.keys == ['key']
@@ -0,0 +1,131 @@
+"""
+Tests of the pagination iterators.
+"""
+
+import pytest
+
+from nimbasms import Client
+from nimbasms.execptions import NimbaSMSException
+from nimbasms.pagination import PageIterator
+from nimbasms.records import Message
+
+LIST = ('GET', '/v1/messages')
+
+
+@pytest.fixture
+def api(fake_api):
+    server = fake_api(counts={'messages': 250})
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    return server, client
+
+
+def ids(items):
+    return [item['messageid'] for item in items]
+
+
+def expected_ids(start, stop):
+    return [f'{index:024x}' for index in range(start, stop)]
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+def test_pages_follow_the_next_links(api, prefetch):
+    server, client = api
+    pages = client.messages.iter_pages(limit=100, prefetch=prefetch)
+    sizes = [len(page.data['results']) for page in pages]
+    assert sizes == [100, 100, 50]
+    assert pages.count == 250
+    assert pages.next_uri is None
+    assert server.requests[LIST] == 3
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+def test_items_from_an_offset(api, prefetch):
+    _, client = api
+    items = client.messages.iter_all(limit=40, offset=30, prefetch=prefetch)
+    assert ids(items) == expected_ids(30, 250)
+
+
+def test_typed_items(api):
+    _, client = api
+    records = list(client.messages.iter_all(limit=100, typed=True))
+    assert all(isinstance(record, Message) for record in records)
+    assert [record.messageid for record in records] == expected_ids(0, 250)
+
+
+def test_a_second_iteration_starts_again(api):
+    server, client = api
+    pages = client.messages.iter_pages(limit=100)
+    assert len(list(pages)) == 3
+    assert len(list(pages)) == 3
+    assert server.requests[LIST] == 6
+
+
+def test_iterators_have_their_own_cursor(api):
+    _, client = api
+    first = iter(client.messages.iter_all(limit=50))
+    second = iter(client.messages.iter_all(limit=50))
+    head = [next(first) for _ in range(60)]
+    assert ids(second) == expected_ids(0, 250)
+    assert ids(head + list(first)) == expected_ids(0, 250)
+
+
+def test_stopping_early_fetches_at_most_one_page_ahead(api):
+    server, client = api
+    for _ in client.messages.iter_pages(limit=10):
+        break
+    assert server.requests[LIST] <= 2
+    for _ in client.messages.iter_pages(limit=10, prefetch=False):
+        break
+    assert server.requests[LIST] <= 3
+
+
+def test_error_page_raises(fake_api):
+    server = fake_api(error_rate=1.0)
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    with pytest.raises(NimbaSMSException):
+        list(PageIterator(client, f'{server.base_url}/v1/messages'))
+
+
+@pytest.mark.parametrize('options', [{'limit': 0}, {'offset': -1}])
+def test_invalid_arguments(api, options):
+    _, client = api
+    with pytest.raises(ValueError):
+        client.messages.iter_pages(**options)
+
+
+@pytest.mark.parametrize('parallel', [1, 3, 8])
+def test_fan_out_yields_the_pages_in_order(api, parallel):
+    server, client = api
+    pages = client.messages.iter_pages(limit=20, offset=10, parallel=parallel)
+    assert ids(item for page in pages for item in page.data['results']) == \
+        expected_ids(10, 250)
+    assert pages.count == 250
+    assert server.requests[LIST] == 12
+
+
+def test_fan_out_typed_items_and_second_iteration(api):
+    _, client = api
+    pages = client.messages.iter_pages(limit=100, parallel=4)
+    records = list(pages.items(Message))
+    assert [record.messageid for record in records] == expected_ids(0, 250)
+    assert ids(pages.items()) == expected_ids(0, 250)
+
+
+def test_fan_out_single_page(api):
+    server, client = api
+    assert ids(client.messages.iter_all(limit=500, parallel=4)) == \
+        expected_ids(0, 250)
+    assert server.requests[LIST] == 1
+
+
+def test_fan_out_error_page_raises(fake_api):
+    server = fake_api(counts={'messages': 250}, error_rate=0.3, seed=3)
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    with pytest.raises(NimbaSMSException):
+        list(client.messages.iter_all(limit=10, parallel=4))
+
+
+def test_fan_out_requires_workers(api):
+    _, client = api
+    with pytest.raises(ValueError):
+        list(client.messages.iter_pages(parallel=-1))
@@ -0,0 +1,96 @@
+"""
+Tests of the client-side rate limiter.
+"""
+
+import pytest
+
+from nimbasms import ratelimit
+from nimbasms.execptions import NimbaSMSException
+from nimbasms.ratelimit import FileTokenBucket, RateLimiter, TokenBucket
+
+URL = 'https://api.nimbasms.com'
+
+
+def test_bucket_serves_the_burst_then_waits(clock):
+    bucket = TokenBucket(2, clock=clock)
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+
+
+def test_rate_below_one_per_second(clock):
+    bucket = TokenBucket(0.5, clock=clock)
+    assert bucket.capacity == 1.0
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 2.0, 4.0]
+    clock.now = 10.0
+    assert bucket.reserve() == 0.0
+
+
+def test_explicit_capacity_below_one_is_rejected():
+    with pytest.raises(ValueError):
+        TokenBucket(0.5, capacity=0.5)
+
+
+def test_clock_going_back_adds_no_token(clock):
+    clock.now = 100.0
+    bucket = TokenBucket(1, clock=clock)
+    assert bucket.reserve() == 0.0
+    clock.now = 50.0
+    assert bucket.reserve() == 1.0
+
+
+def test_file_bucket_is_shared_by_its_instances(tmp_path, clock):
+    path = str(tmp_path / 'bucket')
+    first = FileTokenBucket(path, 2, clock=clock)
+    second = FileTokenBucket(path, 2, clock=clock)
+    assert [first.reserve(), second.reserve()] == [0.0, 0.0]
+    assert [second.reserve(), first.reserve()] == [0.5, 1.0]
+    clock.now = 10.0
+    assert second.reserve() == 0.0
+
+
+def test_file_bucket_resets_a_state_from_the_future(tmp_path, clock):
+    path = str(tmp_path / 'bucket')
+    clock.now = 1000.0
+    bucket = FileTokenBucket(path, 1, clock=clock)
+    assert [bucket.reserve(), bucket.reserve()] == [0.0, 1.0]
+    # After a reboot, the monotonic clock starts again from a lower value.
+    clock.now = 5.0
+    assert [bucket.reserve(), bucket.reserve()] == [0.0, 1.0]
+
+
+def test_file_bucket_without_fcntl(monkeypatch, tmp_path):
+    monkeypatch.setattr(ratelimit, 'fcntl', None)
+    with pytest.raises(NimbaSMSException, match='TokenBucket'):
+        FileTokenBucket(str(tmp_path / 'bucket'), 1)
+
+
+class RecordingBucket:
+    def __init__(self, name, acquired):
+        self.name = name
+        self.acquired = acquired
+
+    def acquire(self):
+        self.acquired.append(self.name)
+
+
+def test_rate_limiter_selects_the_endpoint_bucket():
+    acquired = []
+    messages = RecordingBucket('messages', acquired)
+    limiter = RateLimiter(RecordingBucket('account', acquired), endpoints={
+        ('POST', '/v1/messages'): messages,
+        ('GET', '/v1'): RecordingBucket('read', acquired)})
+    assert limiter.bucket_for('post', '/v1/messages/') is messages
+    assert limiter.bucket_for('POST', '/v1/contacts') is None
+
+    limiter.acquire('POST', f'{URL}/v1/messages')
+    limiter.acquire('GET', f'{URL}/v1/messages/XXXX?limit=10')
+    limiter.acquire('POST', f'{URL}/v1/contacts')
+    assert acquired == ['messages', 'account', 'read', 'account', 'account']
+
+
+def test_rate_limiter_without_account_bucket():
+    acquired = []
+    limiter = RateLimiter(endpoints={
+        ('POST', '/v1/messages'): RecordingBucket('messages', acquired)})
+    limiter.acquire('POST', f'{URL}/v1/messages')
+    limiter.acquire('GET', f'{URL}/v1/accounts')
+    assert acquired == ['messages']
@@ -0,0 +1,79 @@
+"""
+Tests of the recipient normalization.
+"""
+
+import pytest
+
+from nimbasms.recipients import (EMPTY, INVALID_CHARACTERS, INVALID_LENGTH,
+                                 INVALID_NUMBER, RecipientNormalizer,
+                                 normalize_recipients)
+
+
+@pytest.mark.parametrize('entry, expected', [
+    ('224622123456', ('224622123456', None)),
+    ('622123456', ('224622123456', None)),
+    ('622 12 34 56', ('224622123456', None)),
+    ('622-12-34-56', ('224622123456', None)),
+    ('(622) 12.34.56', ('224622123456', None)),
+    ('+224 622 12 34 56', ('224622123456', None)),
+    ('00224622123456', ('224622123456', None)),
+    (622123456, ('224622123456', None)),
+    ('+33612345678', ('33612345678', None)),
+    ('0033612345678', ('33612345678', None)),
+    ('', (None, EMPTY)),
+    ('  ', (None, EMPTY)),
+    (None, (None, EMPTY)),
+    ('n/a', (None, INVALID_CHARACTERS)),
+    ('+224+622123456', (None, INVALID_CHARACTERS)),
+    ('22462212345', (None, INVALID_LENGTH)),
+    ('2246221234567', (None, INVALID_LENGTH)),
+    ('224722123456', (None, INVALID_NUMBER)),
+    ('722123456', (None, INVALID_NUMBER)),
+    # A national number with a trunk prefix, as dialled in France, is not
+    # taken for a Guinea number.
+    ('0612345678', (None, INVALID_LENGTH)),
+    ('0622123456', (None, INVALID_LENGTH)),
+    ('12345678', (None, INVALID_LENGTH)),
+    ('+1234567', (None, INVALID_LENGTH)),
+    ('+1234567890123456', (None, INVALID_LENGTH)),
+])
+def test_normalize(entry, expected):
+    assert RecipientNormalizer().normalize(entry) == expected
+
+
+@pytest.mark.parametrize('entry, expected', [
+    ('0612345678', ('33612345678', None)),
+    ('06 12 34 56 78', ('33612345678', None)),
+    ('612345678', ('33612345678', None)),
+    ('+33612345678', ('33612345678', None)),
+    ('06123456789', (None, INVALID_LENGTH)),
+    ('0712345678', ('33712345678', None)),
+])
+def test_normalize_with_a_trunk_prefix(entry, expected):
+    normalizer = RecipientNormalizer(country_code='33', national_pattern=r'[1-9]\d{8}',
+                                     trunk_prefix='0')
+    assert normalizer.normalize(entry) == expected
+
+
+def test_plus_prefix():
+    normalizer = RecipientNormalizer(plus=True)
+    assert normalizer.normalize('622123456') == ('+224622123456', None)
+    assert normalizer.normalize('+224622123456') == ('+224622123456', None)
+
+
+def test_process_deduplicates_in_order():
+    recipients = normalize_recipients(
+        ['622123456', None, '+224622123456', '224622000000', 'n/a',
+         '622 12 34 56'])
+    assert recipients.valid == ['224622123456', '224622000000']
+    assert recipients.invalid == [(None, EMPTY), ('n/a', INVALID_CHARACTERS)]
+    assert recipients.duplicates == 2
+
+
+def test_iter_valid_reports_the_invalid_entries():
+    invalid = []
+    numbers = RecipientNormalizer().iter_valid(
+        ['622123456', '0612345678', '224622123456', None],
+        on_invalid=lambda entry, reason: invalid.append((entry, reason)))
+    assert list(numbers) == ['224622123456']
+    assert invalid == [('0612345678', INVALID_LENGTH), (None, EMPTY)]
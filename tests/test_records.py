@@ -0,0 +1,75 @@
+"""
+Tests of the typed records.
+"""
+
+import pytest
+
+from nimbasms import Response
+from nimbasms.records import Contact, Message
+
+PAGE = ('{"count": 2, "next": null, "results": ['
+        '{"messageid": "a", "status": "sent", "cost": 1},'
+        '{"messageid": "b", "status": "pending"}]}')
+
+
+class CountingResponse(Response):
+    decoded = 0
+
+    def _decode(self):
+        self.decoded += 1
+        return super()._decode()
+
+
+def test_unknown_fields_go_to_extra():
+    record = Message.from_dict({'messageid': 'a', 'cost': 1})
+    assert record.messageid == 'a'
+    assert record.status is None
+    assert record.extra == {'cost': 1}
+    assert record.to_dict()['cost'] == 1
+
+
+@pytest.mark.parametrize('name', ['extra', 'self', 'fields'])
+def test_reserved_names_go_to_extra(name):
+    record = Contact.from_dict({'contact_id': 1, name: 'value'})
+    assert record.contact_id == 1
+    assert record.extra == {name: 'value'}
+    assert record.to_dict() == {'contact_id': 1, 'numero': None, 'name': None,
+                                'groups': None, 'added_at': None, name: 'value'}
+
+
+def test_from_dict_leaves_the_item_unchanged():
+    item = {'messageid': 'a', 'cost': 1}
+    Message.from_dict(item)
+    assert item == {'messageid': 'a', 'cost': 1}
+
+
+def test_records_are_equal_by_fields_and_unhashable():
+    assert Message.from_dict({'messageid': 'a'}) == Message(messageid='a')
+    assert Message(messageid='a') != Message(messageid='b')
+    assert Message(messageid='a') != Contact()
+    with pytest.raises(TypeError):
+        hash(Message(messageid='a'))
+
+
+def test_records_keep_the_data_already_decoded():
+    response = CountingResponse(200, PAGE)
+    data = response.data
+    records = response.records(Message)
+    assert [record.messageid for record in records] == ['a', 'b']
+    assert response.data is data
+    assert data['results'][0] == {'messageid': 'a', 'status': 'sent', 'cost': 1}
+    assert response.decoded == 1
+
+
+def test_records_without_data_replace_the_dicts():
+    response = CountingResponse(200, PAGE)
+    records = response.records(Message)
+    assert response.records(Message) is records
+    assert records[0].extra == {'cost': 1}
+    assert response.data['results'][1] == {'messageid': 'b', 'status': 'pending'}
+    assert response.decoded == 2
+
+
+def test_single_record():
+    response = Response(200, '{"contact_id": 3, "numero": "224000000001"}')
+    assert response.records(Contact).numero == '224000000001'
@@ -0,0 +1,85 @@
+"""
+Tests of the compact send results and their sinks.
+"""
+
+import csv
+import io
+import json
+import sqlite3
+
+from requests.exceptions import Timeout
+
+from nimbasms import Client, Response
+from nimbasms.bulk import BulkResult
+from nimbasms.results import (CSVSink, FIELDS, NDJSONSink, SQLiteSink,
+                              SendResult, compact_results)
+
+RESULTS = [
+    BulkResult(0, ['224000000001'], Response(201, '{"messageid": "m0"}'), None),
+    BulkResult(1, ['224000000002'], Response(429, '{"detail": "slow down"}'), None),
+    BulkResult(2, ['224000000003'], None, Timeout('read timeout')),
+]
+
+RECORDS = [SendResult(0, 201, 'm0', None), SendResult(1, 429, None, 'http_429'),
+           SendResult(2, None, None, 'Timeout')]
+
+
+def test_from_result_maps_outcomes():
+    assert [SendResult.from_result(result) for result in RESULTS] == RECORDS
+    assert [record.ok for record in RECORDS] == [True, False, False]
+    assert RECORDS[1].as_dict() == dict(zip(FIELDS, (1, 429, None, 'http_429')))
+
+
+def test_compact_results_writes_to_the_sink_lazily():
+    output = io.StringIO()
+    sink = NDJSONSink(output)
+    records = compact_results(iter(RESULTS), sink)
+    assert next(records) == RECORDS[0]
+    assert sink.written == 1
+    assert list(records) == RECORDS[1:]
+    assert (sink.written, sink.failed) == (3, 2)
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert lines == [record.as_dict() for record in RECORDS]
+
+
+def test_csv_sink_writes_the_header_once_when_appending(tmp_path):
+    path = tmp_path / 'results.csv'
+    with CSVSink(str(path)) as sink:
+        sink.consume(RESULTS[:1])
+    with CSVSink(str(path), append=True) as sink:
+        sink.consume(RESULTS[1:])
+    with open(path, newline='', encoding='utf-8') as results:
+        rows = list(csv.reader(results))
+    assert rows[0] == list(FIELDS)
+    assert [row[0] for row in rows[1:]] == ['0', '1', '2']
+
+    with CSVSink(str(tmp_path / 'new.csv'), append=True) as sink:
+        pass
+    assert (tmp_path / 'new.csv').read_text().splitlines() == [','.join(FIELDS)]
+
+
+def test_sqlite_sink_inserts_by_batch(tmp_path):
+    path = str(tmp_path / 'results.db')
+    sink = SQLiteSink(path, batch_size=2)
+    sink.consume(RECORDS)
+    with sqlite3.connect(path) as db:
+        assert db.execute('SELECT COUNT(*) FROM send_results').fetchone() == (2,)
+    sink.close()
+    with sqlite3.connect(path) as db:
+        rows = db.execute('SELECT chunk_index, status_code, message_id, error_code '
+                          'FROM send_results ORDER BY chunk_index').fetchall()
+    assert rows == [record.as_tuple() for record in RECORDS]
+
+
+def test_create_many_compact_with_a_sink(fake_api, tmp_path):
+    server = fake_api()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    path = tmp_path / 'results.ndjson'
+    numbers = [f'2246{index:08d}' for index in range(250)]
+    with NDJSONSink(str(path)) as sink:
+        records = list(client.messages.create_many(
+            numbers, 'Nimba', 'Hi', chunk_size=100, max_workers=3, sink=sink))
+    assert sorted(record.index for record in records) == [0, 1, 2]
+    assert all(record.ok and record.message_id for record in records)
+    assert len(path.read_text().splitlines()) == 3
+    assert server.created == 3
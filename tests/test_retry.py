@@ -0,0 +1,175 @@
+"""
+Tests of the retry engine.
+"""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+from nimbasms import Client, Response
+from nimbasms.retry import Retry, RetryPolicy, parse_retry_after
+from nimbasms.rest import IDEMPOTENCY_HEADER
+
+URL = 'https://api.nimbasms.com/v1/messages'
+
+
+class Scripted:
+    """
+    Send function replaying responses and exceptions, recording the
+    headers of every attempt.
+    """
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.headers = []
+
+    def __call__(self, headers):
+        self.headers.append(dict(headers))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def response(status, headers=None):
+    return Response(status, '{}', headers or {})
+
+
+def test_backoff_is_exponential_and_capped():
+    policy = RetryPolicy(backoff_factor=0.5, backoff_max=3.0, jitter=False)
+    assert [policy.backoff(attempt) for attempt in range(1, 6)] == [
+        0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_backoff_jitter_stays_below_the_delay():
+    policy = RetryPolicy(backoff_factor=1.0, jitter=True)
+    delays = [policy.backoff(3) for _ in range(200)]
+    assert all(0 <= delay <= 4.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_backoff_honours_retry_after(status):
+    policy = RetryPolicy(backoff_factor=0.5, backoff_max=30.0, jitter=False)
+    assert policy.backoff(1, response(status, {'Retry-After': '7'})) == 7.0
+    assert policy.should_retry(1, True, response(status, {'Retry-After': '30'}))
+
+
+def test_retry_after_above_backoff_max_returns_the_response():
+    policy = RetryPolicy(backoff_max=30.0, jitter=False)
+    slow = response(429, {'Retry-After': '120'})
+    assert not policy.should_retry(1, True, slow)
+    # Not capped: the caller sees the delay asked by the server.
+    assert policy.backoff(1, slow) == 120.0
+
+    sleeps = []
+    retry = Retry(policy, sleep=sleeps.append)
+    send = Scripted(slow, response(200))
+    assert retry.call(send, 'GET', URL, {}) is slow
+    assert sleeps == []
+
+
+def test_backoff_ignores_retry_after_when_disabled_or_other_status():
+    disabled = RetryPolicy(backoff_factor=0.5, jitter=False,
+                           respect_retry_after=False)
+    assert disabled.backoff(1, response(429, {'Retry-After': '7'})) == 0.5
+    policy = RetryPolicy(backoff_factor=0.5, jitter=False)
+    assert policy.backoff(1, response(500, {'Retry-After': '7'})) == 0.5
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({'Retry-After': '2.5'}) == 2.5
+    assert parse_retry_after({'Retry-After': '-3'}) == 0.0
+    assert parse_retry_after({'Retry-After': 'soon'}) is None
+    assert parse_retry_after({}) is None
+    assert parse_retry_after(None) is None
+    later = datetime.now(timezone.utc) + timedelta(seconds=60)
+    delay = parse_retry_after({'Retry-After': format_datetime(later, usegmt=True)})
+    assert 55 <= delay <= 60
+
+
+def test_parse_retry_after_reads_a_naive_date_as_utc():
+    later = datetime.now(timezone.utc) + timedelta(seconds=60)
+    value = later.strftime('%a, %d %b %Y %H:%M:%S -0000')
+    assert 55 <= parse_retry_after({'Retry-After': value}) <= 60
+
+
+def test_get_is_retried_on_statuses_and_errors():
+    sleeps = []
+    retry = Retry(RetryPolicy(max_attempts=4, backoff_factor=0.1, jitter=False),
+                  sleep=sleeps.append)
+    send = Scripted(response(503, {'Retry-After': '0'}),
+                    RequestsConnectionError('reset'), response(502), response(200))
+    assert retry.call(send, 'GET', URL, {}).status_code == 200
+    assert sleeps == [0.0, 0.2, 0.4]
+
+
+def test_retries_stop_at_max_attempts():
+    sleeps = []
+    retry = Retry(RetryPolicy(max_attempts=2, jitter=False), sleep=sleeps.append)
+    send = Scripted(response(500), response(500), response(200))
+    assert retry.call(send, 'GET', URL, {}).status_code == 500
+    assert len(send.headers) == 2
+    assert len(sleeps) == 1
+
+
+def test_post_with_idempotency_key_is_retried_on_transport_errors():
+    retry = Retry(RetryPolicy(max_attempts=3, jitter=False), sleep=lambda _: None)
+    send = Scripted(RequestsConnectionError('reset'), response(500), response(201))
+    assert retry.call(send, 'POST', URL, {}).status_code == 201
+    keys = {headers[IDEMPOTENCY_HEADER] for headers in send.headers}
+    assert len(send.headers) == 3
+    assert len(keys) == 1
+
+
+def test_post_keeps_the_key_given_by_the_caller():
+    retry = Retry(sleep=lambda _: None)
+    send = Scripted(response(503), response(201))
+    retry.call(send, 'POST', URL, {IDEMPOTENCY_HEADER: 'mine'})
+    assert [headers[IDEMPOTENCY_HEADER] for headers in send.headers] == [
+        'mine', 'mine']
+
+
+def test_post_without_idempotency_key_is_not_retried_on_transport_errors():
+    retry = Retry(RetryPolicy(max_attempts=3), idempotent_endpoints=(),
+                  sleep=lambda _: None)
+    send = Scripted(RequestsConnectionError('reset'), response(201))
+    with pytest.raises(RequestsConnectionError):
+        retry.call(send, 'POST', URL, {})
+    assert len(send.headers) == 1
+    assert IDEMPOTENCY_HEADER not in send.headers[0]
+
+
+def test_post_without_idempotency_key_is_retried_only_when_not_processed():
+    retry = Retry(RetryPolicy(max_attempts=3), idempotent_endpoints=(),
+                  sleep=lambda _: None)
+    send = Scripted(response(429), response(503), response(201))
+    assert retry.call(send, 'POST', URL, {}).status_code == 201
+
+    send = Scripted(response(500), response(201))
+    assert retry.call(send, 'POST', URL, {}).status_code == 500
+    assert len(send.headers) == 1
+
+
+def test_policy_per_endpoint_matches_sub_paths():
+    strict = RetryPolicy(max_attempts=1)
+    retry = Retry(policies={('GET', '/v1/messages'): strict})
+    assert retry.policy_for('get', '/v1/messages/XXXX') is strict
+    assert retry.policy_for('GET', '/v1/contacts') is retry.default
+
+
+def test_client_retries_against_the_fake_api(fake_api):
+    server = fake_api(error_rate=0.5, seed=1)
+    retries = []
+    retry = Retry(RetryPolicy(max_attempts=10, jitter=False),
+                  sleep=retries.append)
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', retry=retry,
+                    base_url=server.base_url)
+    for _ in range(10):
+        result = client.messages.create(to=['224XXXXXXXX'], sender_name='Nimba',
+                                        message='Hi')
+        assert result.status_code == 201
+    assert server.created == 10
+    # The fake API answers its 503 with Retry-After: 0.
+    assert retries and set(retries) == {0.0}
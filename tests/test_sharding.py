@@ -0,0 +1,66 @@
+"""
+Tests of the sharded sender.
+"""
+
+import os
+import subprocess
+import sys
+
+from nimbasms.campaign import Campaign
+from nimbasms.recipients import INVALID_CHARACTERS
+from nimbasms.sharding import ShardedSender
+
+
+def sender(server, **options):
+    return ShardedSender('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url,
+                         processes=2, threads=2, **options)
+
+
+def test_workers_normalize_and_send_every_batch(fake_api):
+    server = fake_api()
+    invalid = []
+    numbers = [f'62{index:07d}' for index in range(1000)]
+    # A duplicate in the same batch of 200 numbers, and one in another batch.
+    numbers[3:3] = ['+224 620 00 00 02']
+    numbers += ['n/a', '620000001']
+    report = sender(server, chunk_size=50, batch_size=4).send(
+        numbers, 'Nimba', 'Hi', normalize=True,
+        on_invalid=lambda entry, reason: invalid.append((entry, reason)))
+    assert report.sent == 1001
+    assert report.requests == 21
+    assert report.failed == 0
+    assert server.created == 21
+    assert invalid == [('n/a', INVALID_CHARACTERS)]
+    assert report.elapsed > 0
+
+
+def test_failed_requests_are_reported(fake_api):
+    server = fake_api(error_rate=1.0)
+    report = sender(server, chunk_size=10, batch_size=2).send(
+        [f'22462{index:07d}' for index in range(45)], 'Nimba', 'Hi')
+    assert (report.requests, report.sent, report.failed) == (5, 0, 45)
+    assert sorted(failure[0] for failure in report.failures) == [0, 1, 2, 3, 4]
+    assert {failure[2] for failure in report.failures} == {503}
+
+
+def test_send_groups_of_a_campaign_under_a_shared_rate(fake_api, tmp_path,
+                                                       monkeypatch):
+    monkeypatch.setenv('TMPDIR', str(tmp_path))
+    server = fake_api()
+    campaign = Campaign(None, 'Hi {name}', 'Nimba', chunk_size=10)
+    recipients = [{'to': f'22462{index:07d}', 'name': 'AB'[index % 2]}
+                  for index in range(60)]
+    report = sender(server, rate=1000).send_groups(
+        campaign.plan(recipients), 'Nimba')
+    assert (report.requests, report.sent) == (6, 60)
+    assert server.created == 6
+    # The bucket file of the shared rate is removed.
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.bucket')]
+
+
+def test_importing_the_module_does_not_load_requests():
+    code = ('import sys, nimbasms.sharding; '
+            'print("requests" in sys.modules)')
+    output = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True).stdout
+    assert output.strip() == 'False'
@@ -0,0 +1,149 @@
+"""
+Tests of the streaming JSON parser of list pages.
+"""
+
+import json
+import random
+
+import pytest
+
+from nimbasms import Client
+from nimbasms.execptions import NimbaSMSException
+from nimbasms.streaming import StreamedPage, iter_members
+from nimbasms.transports import Urllib3HttpClient
+
+ITEMS = [
+    12.5, 3e7, 100, -0.25E-3, 0, -7, 1.0e+2, 123456789012345678901234567890,
+    True, False, None, '', 'café ☃ \U0001f600', 'quote " \\ / \n \t',
+    '\\u00e9 is not an escape here', [], {}, [1, [2, [3.5]]],
+    {'messageid': 'abc', 'numbers': 1, 'nested': {'price': 0.05, 'list': [1e-9]}},
+]
+
+
+def split(body, size):
+    return [body[index:index + size] for index in range(0, len(body), size)]
+
+
+def random_split(body, rng):
+    cuts = sorted(rng.sample(range(1, len(body)), min(len(body) - 1, 20)))
+    return [body[start:end] for start, end in zip([0] + cuts, cuts + [len(body)])]
+
+
+def parse(chunks):
+    members = {}
+    items = []
+    for key, value in iter_members(chunks):
+        if key is None:
+            items.append(value)
+        else:
+            members[key] = value
+    return members, items
+
+
+def page(results, indent=None, ensure_ascii=True, **members):
+    document = {'count': len(results), 'next': None, **members,
+                'results': results}
+    return json.dumps(document, indent=indent,
+                      ensure_ascii=ensure_ascii).encode('utf-8')
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+@pytest.mark.parametrize('ensure_ascii', [True, False])
+def test_every_chunk_size_gives_the_same_values(indent, ensure_ascii):
+    body = page(ITEMS, indent, ensure_ascii, previous='p')
+    expected = json.loads(body)
+    for size in list(range(1, 40)) + [64, 1000, len(body)]:
+        members, items = parse(split(body, size))
+        assert items == expected['results'], size
+        assert members == {'count': expected['count'], 'next': None,
+                           'previous': 'p'}, size
+
+
+def test_numbers_split_at_every_position():
+    body = b'{"count": 1, "results": [12.5, 3e7, 100, -0.25E-3, 1E+2, 7]}'
+    for cut in range(1, len(body)):
+        _, items = parse([body[:cut], body[cut:]])
+        assert items == [12.5, 3e7, 100, -0.25e-3, 100.0, 7], cut
+
+
+def test_random_documents_and_random_chunk_boundaries():
+    rng = random.Random(25)
+
+    def value(depth):
+        kind = rng.randrange(8 if depth < 3 else 6)
+        if kind == 0:
+            return rng.randint(-10 ** 12, 10 ** 12)
+        if kind == 1:
+            return rng.uniform(-1e6, 1e6) * 10 ** rng.randint(-20, 20)
+        if kind == 2:
+            return ''.join(rng.choice('ab"\\\né☃\U0001f600 ')
+                           for _ in range(rng.randrange(12)))
+        if kind == 3:
+            return rng.choice([True, False, None])
+        if kind in (4, 5):
+            return rng.randrange(10 ** 6) / 1000
+        if kind == 6:
+            return [value(depth + 1) for _ in range(rng.randrange(4))]
+        return {f'k{index}': value(depth + 1) for index in range(rng.randrange(4))}
+
+    for _ in range(200):
+        results = [value(0) for _ in range(rng.randrange(6))]
+        body = page(results, rng.choice([None, 1]), rng.choice([True, False]))
+        for _ in range(5):
+            _, items = parse(random_split(body, rng))
+            assert items == json.loads(body)['results']
+
+
+def test_empty_results_and_members_after_the_results():
+    body = b'{"results": [], "count": 0}'
+    for size in (1, 3, 100):
+        assert parse(split(body, size)) == ({'count': 0}, [])
+
+    streamed = StreamedPage(split(b'{"results": [1, 2, 3], "count": 3}', 4))
+    # count is sent after the items, they are kept until iterated.
+    assert streamed.count == 3
+    assert list(streamed) == [1, 2, 3]
+
+
+@pytest.mark.parametrize('body', [
+    b'', b'[1, 2]', b'{"results": [1, 2', b'{"results": [1 2]}',
+    b'{"results": [1,, 2]}', b'{"count" 1}', b'{1: 2}', b'{"results": [tru]}',
+    b'{"count": 1', b'{"results": ["\xff"]}',
+])
+@pytest.mark.parametrize('size', [1, 7, 1000])
+def test_invalid_bodies_raise(body, size):
+    with pytest.raises(NimbaSMSException):
+        parse(split(body, size))
+
+
+def test_close_stops_the_parsing_and_releases_once():
+    released = []
+    streamed = StreamedPage(split(page(list(range(100))), 10),
+                            close=lambda: released.append(True))
+    items = iter(streamed)
+    assert [next(items) for _ in range(3)] == [0, 1, 2]
+    streamed.close()
+    streamed.close()
+    assert released == [True]
+    assert list(items) == []
+
+
+@pytest.mark.parametrize('transport', [None, Urllib3HttpClient])
+def test_streamed_pages_match_the_decoded_pages(fake_api, transport):
+    server = fake_api(counts={'messages': 1234})
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url,
+                    http_client=transport() if transport else None)
+    expected = list(client.messages.iter_all(limit=100))
+    assert list(client.messages.iter_all(limit=100, stream=True)) == expected
+
+    with client.messages.stream_page(limit=50, offset=100) as streamed:
+        assert streamed.count == 1234
+        assert streamed.next.endswith('offset=150')
+        assert list(streamed) == expected[100:150]
+
+
+def test_stream_cannot_be_combined_with_parallel(fake_api):
+    server = fake_api()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    with pytest.raises(ValueError):
+        list(client.messages.iter_pages(parallel=4, stream=True))
@@ -0,0 +1,168 @@
+"""
+Tests of the delivery status tracker.
+"""
+
+import json
+
+from nimbasms import Client, Response
+from nimbasms.tracker import StatusChange, StatusTracker
+
+
+class ScriptedMessages:
+    """
+    Messages service answering retrieve with the next status of a script
+    per message, None raising a connection error.
+    """
+    base_url = 'https://api.nimbasms.com'
+
+    def __init__(self, scripts):
+        self.scripts = {messageid: list(statuses)
+                        for messageid, statuses in scripts.items()}
+        self.calls = []
+
+    def retrieve(self, messageid):
+        self.calls.append(messageid)
+        status = self.scripts[messageid].pop(0)
+        if status is None:
+            raise ConnectionError('reset')
+        return Response(200, json.dumps({'messageid': messageid,
+                                         'status': status}))
+
+
+class ScriptedClient:
+    def __init__(self, scripts):
+        self.messages = ScriptedMessages(scripts)
+
+
+def message_id(index):
+    """
+    Id of a message of the fake API, whose status is given by index % 4:
+    pending, sent, received, failure.
+    """
+    return f'{index:024x}'
+
+
+def test_changes_are_reported_and_terminal_messages_dropped(fake_api):
+    server = fake_api()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    seen = []
+    tracker = StatusTracker(client, on_change=seen.append, scan_threshold=0)
+    ids = [message_id(index) for index in range(8)]
+    tracker.track(ids + ids[:2])
+
+    changes = tracker.poll()
+    assert seen == changes
+    assert {change.messageid for change in changes} == set(ids)
+    assert all(change.previous is None for change in changes)
+    assert tracker.statuses == {message_id(2): 'received', message_id(3): 'failure',
+                                message_id(6): 'received', message_id(7): 'failure'}
+    assert len(tracker) == 4
+
+    # Messages with a terminal status are not tracked again.
+    tracker.track([message_id(2)])
+    assert len(tracker) == 4
+
+
+def test_unchanged_status_backs_off_and_a_change_resets_the_delay(clock):
+    client = ScriptedClient({'m': ['pending', 'pending', 'pending', 'sent',
+                                   'received']})
+    tracker = StatusTracker(client, min_interval=2, max_interval=6, backoff=2,
+                            scan_threshold=0, clock=clock)
+    tracker.track(['m'])
+
+    assert tracker.poll() == [StatusChange('m', None, 'pending',
+                                           {'messageid': 'm', 'status': 'pending'})]
+    assert tracker.next_due() == 2
+    clock.now = 1
+    assert tracker.poll() == []
+    assert len(client.messages.calls) == 1
+
+    clock.now = 2
+    assert tracker.poll() == []
+    assert tracker.next_due() == 4
+    clock.now = 6
+    tracker.poll()
+    # Capped by max_interval.
+    assert tracker.next_due() == 6
+
+    clock.now = 12
+    (change,) = tracker.poll()
+    assert (change.previous, change.status) == ('pending', 'sent')
+    assert tracker.next_due() == 2
+
+    clock.now = 14
+    (change,) = tracker.poll()
+    assert change.status == 'received'
+    assert len(tracker) == 0
+    assert tracker.next_due() is None
+    assert tracker.statuses == {'m': 'received'}
+    assert len(client.messages.calls) == 5
+
+
+def test_errors_back_off_without_reporting_a_change(clock):
+    client = ScriptedClient({'m': [None, None, 'failure']})
+    tracker = StatusTracker(client, min_interval=1, max_interval=60, backoff=3,
+                            scan_threshold=0, clock=clock)
+    tracker.track(['m'])
+    assert tracker.poll() == []
+    assert tracker.next_due() == 3
+    clock.now = 3
+    assert tracker.poll() == []
+    assert tracker.next_due() == 9
+    clock.now = 12
+    assert [change.status for change in tracker.poll()] == ['failure']
+    assert len(tracker) == 0
+
+
+def test_many_due_messages_are_answered_by_the_list_pages(fake_api):
+    server = fake_api(counts={'messages': 500})
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    retrieved = []
+    retrieve = client.messages.retrieve
+    client.messages.retrieve = lambda messageid: retrieved.append(messageid) or retrieve(messageid)
+
+    tracker = StatusTracker(client, scan_threshold=20, scan_limit=100)
+    ids = [message_id(index) for index in range(150)] + [message_id(10 ** 6)]
+    tracker.track(ids)
+    changes = tracker.poll()
+    assert len(changes) == 151
+    assert retrieved == [message_id(10 ** 6)]
+
+
+def test_scan_reads_no_page_ahead(fake_api):
+    server = fake_api(counts={'messages': 500})
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    tracker = StatusTracker(client, scan_threshold=20, scan_limit=100)
+    tracker.track([message_id(index) for index in range(100)])
+    assert len(tracker.poll()) == 100
+    assert server.requests['GET', '/v1/messages'] == 1
+
+
+def test_failed_scan_is_logged(fake_api, caplog):
+    server = fake_api(error_rate=1.0)
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    tracker = StatusTracker(client, scan_threshold=1)
+    tracker.track([message_id(0), message_id(1)])
+    with caplog.at_level('WARNING', logger='nimbasms'):
+        assert tracker.poll() == []
+    assert 'Status scan of the message list failed' in caplog.text
+    assert server.requests['GET', '/v1/messages'] == 1
+
+
+def test_run_polls_until_every_message_is_terminal(fake_api):
+    server = fake_api()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    tracker = StatusTracker(client, scan_threshold=0)
+    tracker.track([message_id(2), message_id(3)])
+    assert tracker.run(timeout=5) == {message_id(2): 'received',
+                                      message_id(3): 'failure'}
+
+
+def test_run_gives_up_after_the_timeout(fake_api):
+    server = fake_api()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url)
+    tracker = StatusTracker(client, min_interval=0.05, max_interval=0.05,
+                            scan_threshold=0)
+    tracker.track([message_id(0)])
+    assert tracker.run(timeout=0.3) == {}
+    assert len(tracker) == 1
@@ -0,0 +1,103 @@
+"""
+Tests of the alternative transports.
+"""
+
+import logging
+import socket
+import subprocess
+import sys
+
+import pytest
+
+from nimbasms import Client
+from nimbasms.execptions import NimbaSMSConnectionError, NimbaSMSException
+from nimbasms.instrumentation import MetricsRegistry
+from nimbasms.retry import Retry, RetryPolicy
+from nimbasms.transports import Http2Client, Urllib3HttpClient
+
+
+def closed_url():
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+    return f'http://127.0.0.1:{port}'
+
+
+def test_importing_the_module_does_not_load_requests():
+    code = ('import sys, nimbasms.transports, nimbasms.retry; '
+            'print("requests" in sys.modules)')
+    output = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True).stdout
+    assert output.strip() == 'False'
+
+
+def test_connection_errors_are_nimbasms_exceptions():
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=closed_url(),
+                    http_client=Urllib3HttpClient())
+    with pytest.raises(NimbaSMSConnectionError) as error:
+        client.accounts.get()
+    assert isinstance(error.value, NimbaSMSException)
+    assert isinstance(error.value, ConnectionError)
+
+
+def test_connection_errors_are_retried():
+    sleeps = []
+    retry = Retry(RetryPolicy(max_attempts=3, jitter=False), sleep=sleeps.append)
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', retry=retry,
+                    base_url=closed_url(), http_client=Urllib3HttpClient())
+    with pytest.raises(NimbaSMSConnectionError):
+        client.accounts.get()
+    assert len(sleeps) == 2
+
+
+def test_verbose_logs(fake_api, caplog):
+    server = fake_api()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url,
+                    http_client=Urllib3HttpClient())
+    with caplog.at_level(logging.INFO, logger='nimbasms'):
+        client.messages.list(limit=10)
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages[0] == '-- BEGIN Nimba SMS API Request --'
+    assert f'GET Request: {server.base_url}/v1/messages?limit=10&offset=0' in messages
+    assert 'Response Status Code: 200' in messages
+    assert not any('Basic' in message for message in messages)
+
+
+def test_sampled_logs(fake_api, caplog):
+    server = fake_api(error_rate=1.0)
+    registry = MetricsRegistry()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url,
+                    http_client=Urllib3HttpClient(log_sample_rate=100,
+                                                  instruments=[registry]))
+    with caplog.at_level(logging.INFO, logger='nimbasms'):
+        for _ in range(3):
+            client.accounts.get()
+    assert [record.levelno for record in caplog.records] == [logging.WARNING] * 3
+    assert caplog.records[0].nimbasms['status'] == 503
+    assert 'nimbasms_requests_total' in registry.render_prometheus()
+
+
+def test_invalid_log_sample_rate():
+    with pytest.raises(ValueError):
+        Urllib3HttpClient(log_sample_rate=0)
+
+
+def test_http2_client(fake_api, caplog):
+    pytest.importorskip('httpx')
+    pytest.importorskip('h2')
+    server = fake_api(counts={'messages': 120})
+    http_client = Http2Client()
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=server.base_url,
+                    http_client=http_client)
+    with caplog.at_level(logging.INFO, logger='nimbasms'):
+        response = client.messages.create(to=['224000000001'],
+                                          sender_name='Nimba', message='Hi')
+    assert response.status_code == 201
+    assert 'Response Status Code: 201' in caplog.messages
+    assert len(list(client.messages.iter_all(limit=50, stream=True))) == 120
+    http_client.close()
+
+    client = Client('ACCOUNT_SID', 'AUTH_TOKEN', base_url=closed_url(),
+                    http_client=Http2Client())
+    with pytest.raises(NimbaSMSConnectionError):
+        client.accounts.get()